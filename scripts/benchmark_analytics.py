@@ -0,0 +1,86 @@
+"""
+Benchmark of the corpus analytics over a synthetic corpus of lyrics, comparing:
+- pure Python statistics computed from the lyrics with dicts and Counters (tokenizing the lyrics on each run);
+- LyricsCorpus, tokenizing the lyrics once into integer arrays and computing the statistics with NumPy.
+Term frequencies, TF-IDF by album and bigram counts are measured, as well as the time spent building the corpus.
+
+Usage: python scripts/benchmark_analytics.py [SONGS] (default: 5000)
+"""
+import math
+import random
+import sys
+import time
+
+from collections import Counter, defaultdict
+
+from metalparser.libs.analytics import LyricsCorpus
+from metalparser.libs.search import tokenize
+
+
+WORDS = ['word{}'.format(number) for number in range(5000)]
+
+
+def build_songs(count):
+    rng = random.Random(0)
+    songs = []
+    for number in range(count):
+        lines = [' '.join(rng.choice(WORDS[:rng.randint(50, len(WORDS))]) for _ in range(8)) for _ in range(30)]
+        songs.append({
+            'artist': 'Artist {}'.format(number // 100), 'album': 'Album {}'.format(number // 10),
+            'title': 'Song {}'.format(number), 'track_no': number % 10 + 1, 'lyrics': '\n'.join(lines)
+        })
+
+    return songs
+
+
+def python_statistics(songs):
+    term_counts = Counter()
+    album_counts = defaultdict(Counter)
+    bigram_counts = Counter()
+    for song in songs:
+        terms = tokenize(song['lyrics'])
+        term_counts.update(terms)
+        album_counts[(song['artist'], song['album'])].update(terms)
+        bigram_counts.update(zip(terms, terms[1:]))
+
+    document_frequencies = Counter()
+    for counts in album_counts.values():
+        document_frequencies.update(counts.keys())
+    tf_idf = []
+    for counts in album_counts.values():
+        length = sum(counts.values())
+        scores = {
+            term: count / length * math.log(len(album_counts) / document_frequencies[term]) for term, count in counts.items()
+        }
+        tf_idf.append(sorted(scores.items(), key=lambda item: -item[1])[:10])
+
+    return term_counts.most_common(20), tf_idf, bigram_counts.most_common(20)
+
+
+def numpy_statistics(corpus):
+    return corpus.get_term_frequencies(limit=20), corpus.get_tf_idf(by='album'), corpus.get_ngram_counts(n=2)
+
+
+def measure(function):
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+if __name__ == '__main__':
+    songs = build_songs(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
+    corpus = LyricsCorpus()
+    start = time.perf_counter()
+    corpus.add(songs)
+    corpus.get_stats()
+    building = time.perf_counter() - start
+
+    print('Corpus of {songs} songs, {words} words, {vocabulary} distinct terms:'.format(**corpus.get_stats()))
+    print('    {:<28} {:8.3f} s'.format('building the corpus (once)', building))
+    print('    {:<28} {:8.3f} s'.format('pure Python statistics', measure(lambda: python_statistics(songs))))
+    print('    {:<28} {:8.3f} s'.format('NumPy statistics', measure(lambda: numpy_statistics(corpus))))
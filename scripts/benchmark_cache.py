@@ -0,0 +1,97 @@
+"""
+Benchmark of the cached fetch latency of ScrapingAgent with sqlite caches of different sizes, comparing:
+- the former path (has_url() check, then CachedSession.get(), restoring a Response object);
+- the direct cache read (get_cached_content(), a single lookup);
+- the direct cache read with the memory tier in front of sqlite (warm).
+
+Usage: python scripts/benchmark_cache.py [SIZE ...] (default sizes: 10000 100000 1000000)
+"""
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+from datetime import datetime
+
+import requests
+import requests_cache
+
+from requests.models import Response
+from urllib3.response import HTTPResponse
+
+from metalparser.common.scraping import ScrapingAgent
+
+
+LOOKUPS = 2000
+PAGE = b'<html><head><title>Album lyrics</title></head><body>' + b'<br/>Lyrics line' * 2000 + b'</body></html>'
+
+
+def get_url(number):
+    return 'http://www.darklyrics.com/lyrics/artist{}/album{}.html'.format(number // 10, number)
+
+
+def create_response(url):
+    request = requests.PreparedRequest()
+    request.prepare(method='GET', url=url)
+    response = Response()
+    response.status_code = 200
+    response.url = url
+    response.request = request
+    response.encoding = 'utf-8'
+    response.headers['Content-Type'] = 'text/html; charset=utf-8'
+    response.raw = HTTPResponse(body=io.BytesIO(PAGE), preload_content=False, status=200)
+
+    return response
+
+
+def fill_cache(cached_session, size):
+    cache = cached_session.cache
+    now = datetime.utcnow()
+    with cache.responses.bulk_commit():
+        for number in range(size):
+            response = create_response(get_url(number))
+            cache.responses[cache.create_key(response.request)] = (cache.reduce_response(response), now)
+
+
+def measure(function, urls):
+    start = time.perf_counter()
+    for url in urls:
+        function(url)
+
+    return (time.perf_counter() - start) / len(urls) * 1e6
+
+
+def run_benchmark(size, directory):
+    cache_path = os.path.join(directory, 'cache_{}'.format(size))
+    cached_session = requests_cache.CachedSession(cache_path, backend='sqlite', expire_after=7200)
+    print('Filling a cache of {} entries ...'.format(size))
+    fill_cache(cached_session, size)
+    urls = [get_url(random.randrange(size)) for _ in range(LOOKUPS)]
+
+    def former_path(url):
+        assert cached_session.cache.has_url(url)
+        return cached_session.get(url).content
+
+    agent = ScrapingAgent()
+    agent.cached_session = cached_session
+    memory_agent = ScrapingAgent(memory_cache_size=LOOKUPS)
+    memory_agent.cached_session = cached_session
+    for url in urls:
+        memory_agent.get_cached_content(url)
+
+    results = {
+        'has_url + get': measure(former_path, urls),
+        'direct read': measure(agent.get_cached_content, urls),
+        'direct read + memory tier': measure(memory_agent.get_cached_content, urls)
+    }
+    for name, latency in results.items():
+        print('{:>10} entries | {:<26} | {:8.1f} us/fetch'.format(size, name, latency))
+
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in sys.argv[1:]] or [10000, 100000, 1000000]
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            run_benchmark(size, directory)
@@ -0,0 +1,101 @@
+"""
+Benchmark of the size on disk and of the read latency of the sqlite cache, comparing:
+- the former format (pickled responses stored uncompressed);
+- compressed responses (zstd when the zstandard package is installed, zlib otherwise);
+- compressed responses with a dictionary trained on the cached pages (i.e. after migrate_cache()).
+Pages are synthetic album pages sharing the same template, with different lyrics.
+
+Usage: python scripts/benchmark_compression.py [PAGES] (default: 5000)
+"""
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from datetime import datetime
+
+from requests_cache.backends.storage.dbdict import DbPickleDict
+
+from metalparser.common.compression import CompressedPickleDict, get_default_codec, migrate_cache
+
+
+LOOKUPS = 2000
+WORDS = ('fire', 'steel', 'night', 'blood', 'king', 'dragon', 'darkness', 'storm', 'sword', 'eternal', 'throne', 'beast',
+         'iron', 'wings', 'thunder', 'grave', 'ride', 'burn', 'forever', 'souls', 'chains', 'moon', 'winter', 'war')
+TEMPLATE_HEAD = (
+    '<!DOCTYPE html>\n<html>\n<head>\n<meta http-equiv="Content-Type" content="text/html; charset=utf-8" />\n'
+    '<title>{artist} LYRICS - {album}</title>\n<link rel="stylesheet" href="../../style.css" type="text/css" />\n'
+    '<script type="text/javascript" src="../../scripts/darklyrics.js"></script>\n</head>\n<body>\n'
+    '<div class="header"><a href="../../index.html"><img src="../../images/logo.png" alt="DarkLyrics.com" /></a></div>\n'
+    + ''.join('<a href="../../{0}.html">{1}</a>\n'.format(letter, letter.upper()) for letter in 'abcdefghijklmnopqrstuvwxyz')
+    + '<div class="cont">\n<div class="albumlyrics"><h2>album: "{album}" ({year})</h2>\n'
+)
+TEMPLATE_TAIL = (
+    '<div class="thanks">Thanks to the submitters for sending these lyrics.</div>\n'
+    '<div class="note">Submits, comments, corrections are welcomed at darklyrics.com/submit.html</div>\n</div>\n'
+    '<div class="footer">DarkLyrics.com - Heavy Metal Lyrics - <a href="../../privacy.html">Privacy Policy</a> - '
+    '<a href="../../contact.html">Contact</a></div>\n</body>\n</html>\n'
+)
+
+
+def get_page(number):
+    rng = random.Random(number)
+    songs = []
+    for track_no in range(1, rng.randint(8, 12)):
+        lines = ['{}<br />'.format(' '.join(rng.choice(WORDS) for _ in range(rng.randint(4, 9))).capitalize())
+                 for _ in range(rng.randint(16, 32))]
+        songs.append('<h3><a name="{0}">{0}. {1}</a></h3><br />\n{2}\n'.format(
+            track_no, rng.choice(WORDS).title(), '\n'.join(lines)
+        ))
+    head = TEMPLATE_HEAD.format(artist='ARTIST {}'.format(number // 10), album='Album {}'.format(number), year=1980 + number % 40)
+
+    return (head + '<div class="lyrics">\n' + ''.join(songs) + '</div>\n' + TEMPLATE_TAIL).encode('utf-8')
+
+
+def get_entry(number):
+    # The same fields stored by requests_cache, in a plain dict
+    return ({'_content': get_page(number), 'status_code': 200, 'url': 'http://www.darklyrics.com/lyrics/{}.html'.format(number),
+             'headers': {'Content-Type': 'text/html; charset=utf-8', 'Server': 'Apache'}, 'encoding': 'utf-8'},
+            datetime.utcnow())
+
+
+def fill(responses, pages):
+    with responses.bulk_commit():
+        for number in range(pages):
+            responses[str(number)] = get_entry(number)
+
+
+def measure(responses, pages):
+    keys = [str(random.randrange(pages)) for _ in range(LOOKUPS)]
+    start = time.perf_counter()
+    for key in keys:
+        responses[key]
+
+    return (time.perf_counter() - start) / LOOKUPS * 1e6
+
+
+if __name__ == '__main__':
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print('Codec: {}'.format('zstd' if get_default_codec() == b's' else 'zlib'))
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {name: os.path.join(directory, name + '.sqlite') for name in ('uncompressed', 'compressed', 'dictionary')}
+        fill(DbPickleDict(paths['uncompressed'], 'responses'), pages)
+        fill(CompressedPickleDict(paths['compressed'], 'responses'), pages)
+        shutil.copy(paths['uncompressed'], paths['dictionary'])
+        migrate_cache(paths['dictionary'])
+
+        results = {
+            'uncompressed': DbPickleDict(paths['uncompressed'], 'responses'),
+            'compressed': CompressedPickleDict(paths['compressed'], 'responses'),
+            'compressed + dictionary': CompressedPickleDict(paths['dictionary'], 'responses')
+        }
+        for name, responses in results.items():
+            path = paths[name.split(' + ')[-1]]
+            with sqlite3.connect(path) as connection:
+                entry_size = connection.execute('select avg(length(value)) from responses').fetchone()[0]
+            print('{:>8} pages | {:<24} | {:8.2f} MB | {:8.0f} bytes/entry | {:8.1f} us/read'.format(
+                pages, name, os.path.getsize(path) / 2 ** 20, entry_size, measure(responses, pages)
+            ))
@@ -0,0 +1,51 @@
+"""
+Benchmark of the time spent decoding an album page, comparing:
+- the encoding detection of BeautifulSoup (UnicodeDammit), run whenever raw bytes are parsed;
+- the decoding with the encoding declared by the Content-Type header (the fast path of ScrapingAgent.get_text_from_url()).
+The parsing time of the decoded page is printed as well, for reference.
+Pages with and without a <meta> charset are measured, since the detection is slower when nothing is declared in the page.
+
+Usage: python scripts/benchmark_decoding.py [REPETITIONS] (default: 50)
+"""
+import sys
+import time
+
+from bs4 import BeautifulSoup, UnicodeDammit
+
+from metalparser.common.scraping import decode_content
+
+
+SONG = '<h3><a name="{0}">{0}. Song {0}</a></h3><br/>\n' + 'Through the frozen lands of Ragnarök, the wölves are howling<br/>\n' * 60
+BODY = '<div class="lyrics">' + ''.join(SONG.format(number) for number in range(1, 15)) + '</div></body></html>'
+HEADERS = {'Content-Type': 'text/html; charset=utf-8'}
+PAGES = {
+    'declared by <meta>': '<html><head><meta charset="utf-8"><title>Album</title></head><body>' + BODY,
+    'not declared': '<html><head><title>Album</title></head><body>' + BODY
+}
+
+
+def measure(function, repetitions):
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repetitions):
+            function()
+        elapsed = (time.perf_counter() - start) / repetitions * 1000
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+if __name__ == '__main__':
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    for name, page in PAGES.items():
+        content = page.encode('utf-8')
+        text = decode_content(content, HEADERS)
+        results = {
+            'encoding detection': measure(lambda: UnicodeDammit(content, is_html=True).unicode_markup, repetitions),
+            'declared encoding': measure(lambda: decode_content(content, HEADERS), repetitions),
+            'parsing (reference)': measure(lambda: BeautifulSoup(text, 'html.parser'), repetitions)
+        }
+        print('Encoding {} ({} KB):'.format(name, len(content) // 1024))
+        for method, elapsed in results.items():
+            print('    {:<20} {:7.2f} ms/page'.format(method, elapsed))
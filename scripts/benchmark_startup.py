@@ -0,0 +1,54 @@
+"""
+Benchmark of the cold start of a lyrics lookup, each run in a fresh interpreter, comparing:
+- importing metalparser.darklyrics, whose heavy dependencies (bs4, requests, requests_cache, sqlite3) are imported lazily;
+- importing the heavy dependencies eagerly beforehand, as done before they were made lazy.
+The creation of DarkLyricsApi() and the first call (a cache lookup, which creates the cached session) are measured too.
+The best run of each is printed.
+
+Usage: python scripts/benchmark_startup.py [RUNS] (default: 10)
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+
+STARTUP_SCRIPT = """
+import json, sys, time
+
+start = time.perf_counter()
+if {eager}:
+    import bs4, requests, requests_cache, sqlite3
+from metalparser.darklyrics import DarkLyricsApi
+import_time = time.perf_counter() - start
+
+start = time.perf_counter()
+api = DarkLyricsApi(cache_path={cache_path!r})
+init_time = time.perf_counter() - start
+
+start = time.perf_counter()
+api.helper.scraping_agent.get_cached_content('http://www.darklyrics.com/v/venom.html')
+first_call_time = time.perf_counter() - start
+
+print(json.dumps({{'import': import_time, 'DarkLyricsApi()': init_time, 'first call': first_call_time}}))
+"""
+
+
+def run(eager, cache_path):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    script = STARTUP_SCRIPT.format(eager=eager, cache_path=cache_path)
+
+    return json.loads(subprocess.check_output([sys.executable, '-c', script], env=env).decode())
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    with tempfile.TemporaryDirectory() as directory:
+        cache_path = os.path.join(directory, 'metalparser_cache')
+        for name, eager in (('lazy imports', False), ('eager imports', True)):
+            results = [run(eager, cache_path) for _ in range(runs)]
+            print('{} (best of {} runs):'.format(name.capitalize(), runs))
+            for step in results[0]:
+                print('    {:<16} {:8.1f} ms'.format(step, min(result[step] for result in results) * 1000))
+            print('    {:<16} {:8.1f} ms'.format('total', min(sum(result.values()) for result in results) * 1000))
@@ -0,0 +1,21 @@
+"""
+Compresses the entries of an existing cache with a dictionary trained on its pages, reclaiming the space on disk.
+New entries are compressed anyway: the migration shrinks the entries saved by previous versions, and trains the dictionary.
+The cache must not be used while migrating it.
+
+Usage: python scripts/migrate_cache.py [CACHE_PATH] (default: the cache of the installed package)
+"""
+import os
+import sys
+
+import metalparser
+
+from metalparser.common.compression import migrate_cache
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(metalparser.__file__), 'metalparser_cache.sqlite')
+    result = migrate_cache(path)
+    print('Migrated {} entries of {}: {:.1f} MB -> {:.1f} MB'.format(
+        result['entries'], path, result['size_before'] / 2 ** 20, result['size_after'] / 2 ** 20
+    ))
@@ -0,0 +1,378 @@
+"""
+Load test of DarkLyricsApi with many concurrent callers, against a local stand-in of DarkLyrics.com.
+The stand-in serves a synthetic catalog (or the pages recorded in a web archive, with --archive) with configurable
+latency and error injection, so that the sqlite cache, the rate controller, the request scheduler and the coalescing
+of concurrent requests are exercised without any request to DarkLyrics.com.
+Callers run a weighted mix of the public APIs from many threads, optionally in many processes sharing the same cache,
+and the latency percentiles, the throughput and the error rate of each API are reported.
+
+Usage: python scripts/run_load_test.py [--threads 50] [--processes 1] [--duration 30] [--latency 50] [--error-rate 0.01]
+                                   [--mix get_song_info_and_lyrics=4,get_albums_info=1] [--archive PAGES.warc.gz]
+                                   [--base-url URL] (see --help)
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+
+from bisect import bisect
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit
+
+from metalparser.common.archives import read_archive
+from metalparser.darklyrics import DarkLyricsApi
+from metalparser.libs.darklyrics_utils import DarkLyricsHelper
+
+
+DEFAULT_MIX = {
+    'get_song_info_and_lyrics': 40,
+    'get_album_info_and_lyrics': 20,
+    'get_albums_info': 15,
+    'get_songs_info': 10,
+    'get_albums_info_and_lyrics_by_artist': 10,
+    'get_artists_list': 5
+}
+
+WORDS = ['Ashes', 'Blood', 'Crypt', 'Doom', 'Ember', 'Frost', 'Grave', 'Hammer', 'Iron', 'Night', 'Raven', 'Storm', 'Thorn',
+         'Void', 'Winter']
+
+LYRICS_LINE = 'Through the frozen lands the wolves are howling<br/>\n'
+
+
+# -------------------------------- Catalog -------------------------------- #
+
+
+def build_catalog(artists=50, albums=5, songs=10):
+    """
+    Returns a synthetic catalog, i.e. a dict (path and query) -> page content, along with the list of its
+    (artist, album, song) tuples, with artist, album, search and artist index pages in the format of DarkLyrics.com.
+    """
+
+    helper = DarkLyricsHelper(use_cache=False, base_url='/')
+    pages = {}
+    tracks = []
+    index_pages = {}
+
+    for artist_no in range(artists):
+        artist = '{} {}'.format(WORDS[artist_no % len(WORDS)], artist_no)
+        artist_path = helper.get_artist_url(artist)
+        artist_key = artist_path.rsplit('/', 1)[1][:-len('.html')]
+        index_pages.setdefault(artist_path.split('/')[1], []).append('<a href="{}">{}</a><br/>'.format(artist_path[1:], artist.upper()))
+        albums_tags = []
+        for album_no in range(1, albums + 1):
+            album = 'Album {}'.format(album_no)
+            album_path = '/lyrics/{}/album{}.html'.format(artist_key, album_no)
+            headline = 'album: "{}" ({})'.format(album, 1980 + album_no)
+            links = []
+            lyrics = []
+            for track_no in range(1, songs + 1):
+                song = 'Song {} {}'.format(album_no, track_no)
+                tracks.append((artist, album, song))
+                links.append('<a href="..{}#{}">{}</a><br/>'.format(album_path, track_no, song))
+                lyrics.append('<h3><a name="{0}">{0}. {1}</a></h3><br/>\n{2}'.format(track_no, song, LYRICS_LINE * 20))
+                pages[helper.get_search_url(song, artist)] = (
+                    '<html><head><title>Search</title></head><body><div class="sen"><h2>Songs:</h2>'
+                    '<a href="{}#{}">{} - {}</a></div></body></html>'.format(album_path[1:], track_no, artist.upper(), song)
+                ).encode('utf-8')
+            albums_tags.append('<div class="album"><h2>album: <strong>"{}"</strong> ({})</h2>\n{}</div>'.format(
+                album, 1980 + album_no, '\n'.join(links)
+            ))
+            pages[album_path] = (
+                '<html><head><title>{} - {}</title></head><body><div class="albumlyrics"><h2>{}</h2></div>'
+                '<div class="lyrics">{}<br/><div class="thanks">Thanks</div></div></body></html>'.format(
+                    artist.upper(), album, headline, ''.join(lyrics)
+                )
+            ).encode('utf-8')
+        pages[artist_path] = '<html><head><title>{} lyrics</title></head><body>{}</body></html>'.format(
+            artist.upper(), '\n'.join(albums_tags)
+        ).encode('utf-8')
+
+    for index in 'abcdefghijklmnopqrstuvwxyz' + '19':
+        pages['/{}.html'.format(index)] = '<html><head><title>Artists</title></head><body><div class="artists">{}</div></body></html>'.format(
+            ''.join(index_pages.get(index, []))
+        ).encode('utf-8')
+
+    return pages, tracks
+
+
+def load_archive(path):
+    """Returns the pages recorded in a web archive as a dict (path and query) -> page content, along with the list of its tracks."""
+
+    from metalparser.libs.darklyrics_utils import parse_artist_page
+
+    pages = {}
+    tracks = []
+    for url, status_code, _, content in read_archive(path):
+        if status_code != 200:
+            continue
+        parts = urlsplit(url)
+        path_and_query = parts.path + ('?' + parts.query if parts.query else '')
+        pages[path_and_query] = content
+        if parts.path.count('/') == 2 and not parts.path.startswith('/lyrics/'):
+            artist_albums = parse_artist_page(content) or []
+            title_tag = content.split(b'<title>', 1)[-1].split(b' lyrics', 1)[0]
+            artist = title_tag.decode('utf-8', 'replace').strip().title()
+            for album in artist_albums:
+                tracks += [(artist, album['title'], song) for song, _ in album['songs']]
+
+    return pages, tracks
+
+
+# -------------------------------- Stand-in server -------------------------------- #
+
+
+class StandInServer(socketserver.ThreadingMixIn, HTTPServer):
+    """A local HTTP server serving recorded pages, with injected latency and server errors."""
+
+    daemon_threads = True
+
+    def __init__(self, pages, latency=0.0, jitter=0.0, error_rate=0.0):
+        super().__init__(('127.0.0.1', 0), StandInRequestHandler)
+        self.pages = pages
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+
+    def get_base_url(self):
+        return 'http://127.0.0.1:{}/'.format(self.server_address[1])
+
+
+class StandInRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(max(0.0, random.gauss(server.latency, server.jitter)) if server.jitter else server.latency)
+        content = server.pages.get(self.path)
+        if random.random() < server.error_rate:
+            status, content, stat = 503, b'<html><body>Service Unavailable</body></html>', 'injected_errors'
+        elif content is None:
+            status, content, stat = 404, b'<html><head><title>Page not Found</title></head><body></body></html>', 'not_found'
+        else:
+            status, stat = 200, 'pages'
+        with server.stats_lock:
+            server.stats['requests'] += 1
+            server.stats[stat] += 1
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# -------------------------------- Callers -------------------------------- #
+
+
+def call_api(api, name, track, rng):
+    """Calls an API with the arguments taken from a track of the catalog."""
+
+    artist, album, song = track
+    if name == 'get_artists_list':
+        return api.get_artists_list(initial_letter=artist[0])
+    if name == 'get_albums_info':
+        return api.get_albums_info(artist)
+    if name == 'get_songs_info':
+        return api.get_songs_info(artist, album=album, title_only=rng.random() < 0.5)
+    if name == 'get_album_info_and_lyrics':
+        return api.get_album_info_and_lyrics(album, artist)
+    if name == 'get_albums_info_and_lyrics_by_artist':
+        return api.get_albums_info_and_lyrics_by_artist(artist)
+
+    return api.get_song_info_and_lyrics(song, artist)
+
+
+def run_callers(config, worker_no):
+    """
+    Runs the callers of a process on a shared DarkLyricsApi until the end of the test.
+    Returns the (API, seconds, error class name or None) samples and the amount of failures (errors handled by the APIs).
+    """
+
+    api = DarkLyricsApi(
+        use_cache=config['use_cache'],
+        requests_per_minute=config['requests_per_minute'],
+        wait_time=0,
+        timeout=(5, 30),
+        max_retries=config['max_retries'],
+        memory_cache_size=config['memory_cache_size'],
+        cache_path=config['cache_path'],
+        base_url=config['base_url']
+    )
+    # Failures are counted, not logged
+    api.logger.setLevel(logging.CRITICAL)
+    names = list(config['mix'])
+    cumulative_weights = []
+    for name in names:
+        cumulative_weights.append((cumulative_weights[-1] if cumulative_weights else 0) + config['mix'][name])
+    tracks = config['tracks']
+    samples = []
+    samples_lock = threading.Lock()
+    start_barrier = threading.Barrier(config['threads'])
+
+    def call(thread_no):
+        rng = random.Random(config['seed'] * 1000003 + worker_no * 1009 + thread_no)
+        thread_samples = []
+        start_barrier.wait()
+        ends_at = time.monotonic() + config['duration']
+        while time.monotonic() < ends_at:
+            name = names[bisect(cumulative_weights, rng.random() * cumulative_weights[-1])]
+            # The first tracks are requested more often, as popular songs in real traffic
+            track = tracks[int(len(tracks) * rng.random() ** 3)] if config['skewed'] else rng.choice(tracks)
+            start = time.perf_counter()
+            error = None
+            try:
+                call_api(api, name, track, rng)
+            except Exception as e:
+                error = type(e).__name__
+            thread_samples.append((name, time.perf_counter() - start, error))
+        with samples_lock:
+            samples.extend(thread_samples)
+
+    threads = [threading.Thread(target=call, args=(thread_no,)) for thread_no in range(config['threads'])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return samples, len(api.get_failures())
+
+
+def _run_process(args):
+    """Entry point of the worker processes."""
+
+    return run_callers(*args)
+
+
+# -------------------------------- Report -------------------------------- #
+
+
+def percentile(sorted_values, percent):
+    """Returns the percentile of sorted values (nearest rank)."""
+
+    if not sorted_values:
+        return float('nan')
+
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(percent / 100 * len(sorted_values))) - 1))]
+
+
+def print_report(samples, failures, elapsed, server_stats):
+    print('{:<40} {:>8} {:>9} {:>8} {:>9} {:>9} {:>9}'.format('API', 'calls', 'calls/s', 'errors', 'p50 ms', 'p95 ms', 'p99 ms'))
+    by_api = {}
+    for name, seconds, error in samples:
+        by_api.setdefault(name, []).append((seconds, error))
+    for name in sorted(by_api) + ['total']:
+        api_samples = by_api.get(name, []) if name != 'total' else [(seconds, error) for _, seconds, error in samples]
+        latencies = sorted(seconds * 1000 for seconds, _ in api_samples)
+        errors = sum(1 for _, error in api_samples if error is not None)
+        print('{:<40} {:>8} {:>9.1f} {:>7.1%} {:>9.1f} {:>9.1f} {:>9.1f}'.format(
+            name, len(api_samples), len(api_samples) / elapsed, errors / len(api_samples) if api_samples else 0,
+            percentile(latencies, 50), percentile(latencies, 95), percentile(latencies, 99)
+        ))
+
+    errors_by_type = Counter(error for _, _, error in samples if error is not None)
+    print('Errors raised: {}'.format(dict(errors_by_type) or 'none'))
+    print('Failures handled by the APIs (skipped songs and albums): {}'.format(failures))
+    if server_stats is not None:
+        print('Stand-in server: {} requests, {} pages, {} injected errors, {} not found'.format(
+            server_stats['requests'], server_stats['pages'], server_stats['injected_errors'], server_stats['not_found']
+        ))
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError('Unknown API "{}", expected one of: {}'.format(name, ', '.join(sorted(DEFAULT_MIX))))
+        mix[name.strip()] = float(weight or 1)
+
+    return mix
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description='Load test of DarkLyricsApi against a local stand-in of DarkLyrics.com.')
+    parser.add_argument('--threads', type=int, default=50, help='Concurrent callers per process (default: 50)')
+    parser.add_argument('--processes', type=int, default=1, help='Processes sharing the cache (default: 1)')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of load (default: 30)')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='Weights of the APIs, e.g. get_song_info_and_lyrics=4,get_albums_info=1 (default: a mix of all of them)')
+    parser.add_argument('--uniform', action='store_true', help='Pick tracks uniformly instead of favouring popular ones')
+    parser.add_argument('--latency', type=float, default=50, help='Milliseconds of latency of the stand-in server (default: 50)')
+    parser.add_argument('--jitter', type=float, default=0, help='Standard deviation of the latency, in milliseconds (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0, help='Fraction of responses failing with HTTP 503 (default: 0)')
+    parser.add_argument('--artists', type=int, default=50, help='Artists of the synthetic catalog (default: 50)')
+    parser.add_argument('--archive', default=None, help='Serve the pages recorded in a web archive instead of a synthetic catalog')
+    parser.add_argument('--base-url', default=None, help='Drive a stand-in already running at this URL instead of starting one')
+    parser.add_argument('--requests-per-minute', type=int, default=600000, help='Rate limit of uncached requests (default: 600000)')
+    parser.add_argument('--max-retries', type=int, default=3, help='Retries of failed requests (default: 3)')
+    parser.add_argument('--memory-cache-size', type=int, default=0, help='Pages kept in the memory tier (default: 0)')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use the sqlite cache')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the callers (default: 0)')
+
+    return parser
+
+
+if __name__ == '__main__':
+    args = get_parser().parse_args()
+    pages, tracks = load_archive(args.archive) if args.archive else build_catalog(artists=args.artists)
+    if not tracks:
+        sys.exit('No songs found in the recorded pages')
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = StandInServer(pages, latency=args.latency / 1000, jitter=args.jitter / 1000, error_rate=args.error_rate)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = server.get_base_url()
+
+    cache_dir = tempfile.mkdtemp(prefix='metalparser_load_test_')
+    config = {
+        'threads': args.threads,
+        'duration': args.duration,
+        'mix': args.mix,
+        'skewed': not args.uniform,
+        'tracks': tracks,
+        'seed': args.seed,
+        'use_cache': not args.no_cache,
+        'cache_path': os.path.join(cache_dir, 'metalparser_cache'),
+        'base_url': base_url,
+        'requests_per_minute': args.requests_per_minute,
+        'max_retries': args.max_retries,
+        'memory_cache_size': args.memory_cache_size
+    }
+    print('Running {} callers in {} process(es) for {:.0f} seconds against {} ...'.format(
+        args.threads * args.processes, args.processes, args.duration, base_url
+    ), file=sys.stderr)
+
+    start = time.monotonic()
+    try:
+        if args.processes > 1:
+            with multiprocessing.Pool(args.processes) as pool:
+                results = pool.map(_run_process, [(config, worker_no) for worker_no in range(args.processes)])
+        else:
+            results = [run_callers(config, 0)]
+        elapsed = time.monotonic() - start
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        if server is not None:
+            server.shutdown()
+
+    print_report(
+        [sample for samples, _ in results for sample in samples],
+        sum(failures for _, failures in results),
+        elapsed,
+        None if server is None else server.stats
+    )
@@ -33,6 +33,15 @@ setup(
     include_package_data=True,
     python_requires='>=3.4.*, <=3.8',
     master_doc='index',
-    install_requires=['beautifulsoup4', 'ratelimit', 'requests', 'requests_cache'],
+    install_requires=['beautifulsoup4', 'requests', 'requests_cache>=0.5.2,<0.6'],
+    extras_require={
+        'analytics': ['numpy'],
+        'brotli': ['brotli'],
+        'parquet': ['pyarrow'],
+        'zstd': ['zstandard']
+    },
+    entry_points={
+        'console_scripts': ['metalparser=metalparser.cli:main']
+    },
     keywords='heavy metal darklyrics lyrics song api'
 )
@@ -0,0 +1,231 @@
+# coding: utf-8
+import argparse
+import os
+import queue
+import sys
+import threading
+
+from metalparser.common.archives import read_archive
+from metalparser.darklyrics import DarkLyricsApi
+from metalparser.libs.exporters import EXPORTERS, get_exporter
+
+
+_ARTIST_DONE = object()
+_WORKER_DONE = object()
+
+
+def read_artists(source):
+    """
+    Lazily yields the artists listed in a file object, one per line.
+    Blank lines and lines starting with '#' are skipped.
+
+    Arguments:
+        source {file} -- A text file object (e.g. sys.stdin)
+    """
+
+    for line in source:
+        artist = line.strip()
+        if artist and not artist.startswith('#'):
+            yield artist
+
+
+def read_checkpoint(path):
+    """
+    Returns the set of artists already exported according to the checkpoint file.
+
+    Arguments:
+        path {str} -- The checkpoint file path
+
+    Returns:
+        [set] -- A set of str containing the exported artists
+    """
+
+    if path is None or not os.path.exists(path):
+        return set()
+
+    with open(path, 'r', encoding='utf-8') as f:
+        return set(read_artists(f))
+
+
+def export_artists(api, artists, exporter, workers=1, checkpoint=None, logger=None):
+    """
+    Streams the songs info and lyrics of the artists to the exporter, artist by artist.
+    The records of an artist are passed to the exporter only once the artist is complete, so that chunks never contain
+    part of an artist: memory usage is bounded by the exporter chunk size and the artists in progress, not by the catalog size.
+    An artist is written to the checkpoint file only once all its records have been flushed to the output,
+    so that an interrupted export can be resumed without losing or duplicating records.
+
+    Arguments:
+        api {DarkLyricsApi} -- The API object used for scraping (shared by all the workers)
+        artists {iterable} -- The artists to export
+        exporter {RecordsExporter} -- The exporter the records are written to
+
+    Keyword Arguments:
+        workers {int} -- Amount of artists processed concurrently (default: {1})
+        checkpoint {str} -- Path of the checkpoint file (optional) (default: {None})
+        logger {Logger} -- Logger for progress (default: {None}, meaning the API logger); errors are added to the API failures
+
+    Returns:
+        [int] -- The amount of exported artists
+    """
+
+    logger = logger or api.logger
+    artists_queue = queue.Queue(maxsize=workers * 2)
+    records_queue = queue.Queue(maxsize=workers * 4)
+
+    def feed():
+        for artist in artists:
+            artists_queue.put(artist)
+        for _ in range(workers):
+            artists_queue.put(None)
+
+    def work():
+        try:
+            artist = artists_queue.get()
+            while artist is not None:
+                _export_artist(api, artist, records_queue, logger)
+                records_queue.put((artist, _ARTIST_DONE))
+                artist = artists_queue.get()
+        finally:
+            records_queue.put((None, _WORKER_DONE))
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    threads += [threading.Thread(target=work, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    checkpoint_file = open(checkpoint, 'a', encoding='utf-8') if checkpoint else None
+    exported_artists = 0
+    # Records of the artists in progress, and artists passed to the exporter but not flushed yet
+    artists_records = {}
+    pending_artists = []
+    running_workers = workers
+
+    try:
+        while running_workers:
+            artist, records = records_queue.get()
+            if records is _WORKER_DONE:
+                running_workers -= 1
+            elif records is not _ARTIST_DONE:
+                artists_records.setdefault(artist, []).extend(records)
+            else:
+                flushed = exporter.write(artists_records.pop(artist, []))
+                pending_artists.append(artist)
+                if flushed:
+                    _commit_checkpoint(checkpoint_file, pending_artists)
+                    exported_artists += len(pending_artists)
+                    pending_artists = []
+    finally:
+        # Even when interrupted, the exporter only buffers complete artists
+        try:
+            exporter.flush()
+            _commit_checkpoint(checkpoint_file, pending_artists)
+            exported_artists += len(pending_artists)
+        finally:
+            if checkpoint_file is not None:
+                checkpoint_file.close()
+
+    return exported_artists
+
+
+def _export_artist(api, artist, records_queue, logger):
+    """Puts the records of every album of an artist in the queue, one album at a time."""
+
+    logger.info('Processing artist "{}" ...'.format(artist))
+    try:
+        albums = api.get_albums_info(artist, title_only=True)
+    except Exception as e:
+        api.add_failure(e, artist=artist)
+        return
+
+    for album in albums:
+        # Don't break the entire job because of a single album
+        try:
+            records_queue.put((artist, api.get_album_info_and_lyrics(album, artist)))
+        except Exception as e:
+            api.add_failure(e, artist=artist, album=album)
+
+
+def _commit_checkpoint(checkpoint_file, artists):
+    """Appends the artists whose records have been completely written to the checkpoint file."""
+
+    if checkpoint_file is None or not artists:
+        return
+
+    checkpoint_file.write(''.join(artist + '\n' for artist in artists))
+    checkpoint_file.flush()
+
+
+def get_parser():
+    """Returns the argument parser of the metalparser command."""
+
+    parser = argparse.ArgumentParser(
+        prog='metalparser',
+        description='Export songs info and lyrics of a list of artists from DarkLyrics.com.'
+    )
+    parser.add_argument('-i', '--input', default='-',
+                        help='File with one artist per line, "-" for stdin (default: stdin)')
+    parser.add_argument('-o', '--output', required=True, help='Output file path')
+    parser.add_argument('-f', '--format', choices=sorted(EXPORTERS), default=None,
+                        help='Output format (default: guessed from the output file extension, jsonl otherwise)')
+    parser.add_argument('--chunk-size', type=int, default=1000,
+                        help='Records written at once, i.e. the Parquet row group size (default: 1000)')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Artists processed concurrently (default: 1)')
+    parser.add_argument('--requests-per-minute', type=int, default=40,
+                        help='Maximum amount of uncached requests per minute (default: 40)')
+    parser.add_argument('--wait-time', type=float, default=3, help='Initial seconds between uncached requests, adapted to the server responses (default: 3)')
+    parser.add_argument('--checkpoint', default=None,
+                        help='Checkpoint file listing the exported artists (default: <output>.checkpoint)')
+    parser.add_argument('--resume', action='store_true', help='Skip the artists listed in the checkpoint file')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use the requests cache')
+    parser.add_argument('--import-archive', action='append', default=[], metavar='PATH',
+                        help='Import the pages of a web archive (.warc, .warc.gz or .har) into the cache before exporting (repeatable)')
+    parser.add_argument('--offline', action='store_true',
+                        help='Only read pages from the cache, without requests to DarkLyrics.com')
+    parser.add_argument('--debug', action='store_true', help='Enable debug logging')
+
+    return parser
+
+
+def main(argv=None):
+    """Entry point of the metalparser command."""
+
+    args = get_parser().parse_args(argv)
+    output_format = args.format or os.path.splitext(args.output)[1].lstrip('.').lower()
+    if output_format not in EXPORTERS:
+        output_format = 'jsonl'
+    checkpoint = args.checkpoint or args.output + '.checkpoint'
+    if not args.resume and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    done_artists = read_checkpoint(checkpoint)
+
+    api = DarkLyricsApi(
+        use_cache=not args.no_cache,
+        debug_mode=args.debug,
+        requests_per_minute=args.requests_per_minute,
+        wait_time=args.wait_time,
+        offline=args.offline
+    )
+    for archive_path in args.import_archive:
+        imported_pages = api.helper.scraping_agent.import_pages(read_archive(archive_path))
+        print('Imported {} pages from {}'.format(imported_pages, archive_path), file=sys.stderr)
+    source = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8')
+    exporter = get_exporter(output_format, args.output, chunk_size=args.chunk_size, append=args.resume)
+
+    try:
+        artists = (artist for artist in read_artists(source) if artist not in done_artists)
+        exported_artists = export_artists(api, artists, exporter, workers=max(args.workers, 1), checkpoint=checkpoint)
+    finally:
+        exporter.close()
+        if source is not sys.stdin:
+            source.close()
+
+    print('Exported {} records of {} artists to {} ({} failures)'.format(
+        exporter.written_records, exported_artists, exporter.path, len(api.get_failures())
+    ), file=sys.stderr)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
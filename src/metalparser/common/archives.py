@@ -0,0 +1,159 @@
+import base64
+import gzip
+import json
+import zlib
+
+
+_HOP_BY_HOP_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive')
+
+
+def read_archive(path):
+    """
+    Lazily yields the HTTP responses stored in a web archive, given its file path: WARC files (.warc, or .warc.gz when
+    compressed) or HAR files (.har). Bodies are returned decoded from their transfer and content encodings.
+
+    Arguments:
+        path {str} -- The path of the archive file
+
+    Raises:
+        ValueError: Exception raised when the archive format is not recognized by the file extension
+
+    Returns:
+        [generator] -- A generator of (URL, status code, headers dict, content bytes) tuples
+    """
+
+    lower_path = path.lower()
+    if lower_path.endswith('.har'):
+        return read_har(path)
+    if lower_path.endswith(('.warc', '.warc.gz')):
+        return read_warc(path)
+
+    raise ValueError('Unknown archive format of "{}", expected a .warc, .warc.gz or .har file'.format(path))
+
+
+def read_warc(path):
+    """
+    Lazily yields the HTTP responses stored in the response records of a WARC file, reading one record at a time.
+    Gzipped WARC files (one gzip member per record, or the whole file) are decompressed while reading.
+
+    Arguments:
+        path {str} -- The path of the WARC file
+
+    Returns:
+        [generator] -- A generator of (URL, status code, headers dict, content bytes) tuples
+    """
+
+    with (gzip.open(path, 'rb') if path.lower().endswith('.gz') else open(path, 'rb')) as f:
+        while True:
+            line = f.readline()
+            if not line:
+                return
+            if not line.startswith(b'WARC/'):
+                # Blank lines separating the records
+                continue
+
+            warc_headers = _parse_header_lines(f)
+            block = f.read(int(warc_headers.get('content-length', 0)))
+            if warc_headers.get('warc-type') != 'response' or \
+                    not warc_headers.get('content-type', '').startswith('application/http'):
+                continue
+
+            url = warc_headers.get('warc-target-uri', '').strip('<>')
+            try:
+                status_code, headers, content = _parse_http_response(block)
+            except (ValueError, zlib.error, OSError, EOFError):
+                continue
+
+            yield url, status_code, headers, content
+
+
+def read_har(path):
+    """
+    Yields the HTTP responses of the GET requests stored in a HAR file.
+    HAR files are JSON documents, so they are loaded at once: large captures are better imported as WARC files.
+
+    Arguments:
+        path {str} -- The path of the HAR file
+
+    Returns:
+        [generator] -- A generator of (URL, status code, headers dict, content bytes) tuples
+    """
+
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)['log']['entries']
+
+    for entry in entries:
+        if entry['request'].get('method', 'GET').upper() != 'GET':
+            continue
+        response = entry['response']
+        headers = {
+            header['name']: header['value'] for header in response.get('headers', [])
+            if header['name'].lower() not in _HOP_BY_HOP_HEADERS
+        }
+        body = response.get('content', {})
+        text = body.get('text', '')
+        if body.get('encoding') == 'base64':
+            content = base64.b64decode(text)
+        else:
+            # The text of the content is already decoded by the browser
+            content = text.encode('utf-8')
+            headers['Content-Type'] = body.get('mimeType', 'text/html').split(';')[0] + '; charset=utf-8'
+
+        yield entry['request']['url'], response['status'], headers, content
+
+
+def _parse_header_lines(f):
+    """Read header lines up to the blank line ending them, returning a dict with lowercase names."""
+
+    headers = {}
+    for line in iter(f.readline, b''):
+        line = line.rstrip(b'\r\n')
+        if not line:
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    return headers
+
+
+def _parse_http_response(block):
+    """Returns status code, headers and decoded body of a raw HTTP response."""
+
+    head, _, body = block.partition(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status_code = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip()] = value.strip()
+
+    lower_headers = {name.lower(): value.lower() for name, value in headers.items()}
+    if lower_headers.get('transfer-encoding') == 'chunked':
+        body = _dechunk(body)
+    content_encoding = lower_headers.get('content-encoding')
+    if content_encoding in ('gzip', 'x-gzip'):
+        body = gzip.decompress(body)
+    elif content_encoding == 'deflate':
+        try:
+            body = zlib.decompress(body)
+        except zlib.error:
+            # Some servers send raw deflate data, without the zlib wrapper
+            body = zlib.decompress(body, -zlib.MAX_WBITS)
+    elif content_encoding not in (None, '', 'identity'):
+        raise ValueError('Unsupported content encoding: {}'.format(content_encoding))
+
+    return status_code, {name: value for name, value in headers.items() if name.lower() not in _HOP_BY_HOP_HEADERS}, body
+
+
+def _dechunk(body):
+    """Returns the body of a response sent with the chunked transfer encoding."""
+
+    chunks = []
+    position = 0
+    while True:
+        line_end = body.index(b'\r\n', position)
+        size = int(body[position:line_end].split(b';')[0], 16)
+        if size == 0:
+            return b''.join(chunks)
+        chunks.append(body[line_end + 2:line_end + 2 + size])
+        position = line_end + 2 + size + 2
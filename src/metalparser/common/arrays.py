@@ -0,0 +1,42 @@
+import sys
+
+from array import array
+
+
+def to_little_endian(values):
+    """
+    Returns the bytes of an array in little-endian order, whatever the platform byte order is.
+
+    Arguments:
+        values {array} -- The array to convert
+
+    Returns:
+        [bytes] -- The little-endian bytes of the array
+    """
+
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+
+    return values.tobytes()
+
+
+def from_little_endian(view, typecode):
+    """
+    Returns a sequence of numbers from a buffer of little-endian bytes.
+    On little-endian platforms the buffer is not copied: the returned memoryview shares its memory.
+
+    Arguments:
+        view {memoryview} -- The buffer to read
+        typecode {str} -- The array typecode of the numbers (e.g. 'I' or 'Q')
+
+    Returns:
+        [memoryview or array] -- The numbers contained in the buffer
+    """
+
+    if sys.byteorder != 'little':
+        values = array(typecode, bytes(view))
+        values.byteswap()
+        return values
+
+    return view.cast(typecode)
@@ -0,0 +1,275 @@
+import os
+import pickle
+import sqlite3
+import struct
+import threading
+import zlib
+
+from collections import Counter
+from requests_cache.backends.storage.dbdict import DbDict, DbPickleDict
+
+
+ZLIB_CODEC = b'z'
+
+ZSTD_CODEC = b's'
+
+ZLIB_DICTIONARY_SIZE = 32768
+
+ZSTD_DICTIONARY_SIZE = 112640
+
+_HEADER = struct.Struct('<cH')
+
+_PICKLE_MARKER = b'\x80'
+
+
+def get_default_codec():
+    """
+    Returns the codec used for compressing new cache entries: zstd when the zstandard package is installed, zlib otherwise.
+
+    Returns:
+        [bytes] -- The codec marker, ZSTD_CODEC or ZLIB_CODEC
+    """
+
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return ZLIB_CODEC
+
+    return ZSTD_CODEC
+
+
+def train_dictionary(samples, codec=None):
+    """
+    Trains a compression dictionary on samples of cached entries, capturing the page templates they share
+    (markup, menus, headers), so that every entry can be compressed as if the others had been seen before.
+    With zstd the dictionary is trained by zstandard, with zlib it's made of the lines shared by most of the samples.
+
+    Arguments:
+        samples {list} -- A list of bytes containing the samples (e.g. pickled cached responses)
+
+    Keyword Arguments:
+        codec {bytes} -- The codec the dictionary is trained for (default: {None}, meaning the default codec)
+
+    Returns:
+        [bytes] -- The dictionary
+    """
+
+    codec = codec or get_default_codec()
+    if codec == ZSTD_CODEC:
+        import zstandard
+
+        return zstandard.train_dictionary(ZSTD_DICTIONARY_SIZE, samples).as_bytes()
+
+    # Count in how many samples each line appears, ignoring lines too short to be worth it
+    line_counts = Counter()
+    for sample in samples:
+        line_counts.update(set(line for line in sample.split(b'\n') if len(line) > 8))
+    shared_lines = [line for line, count in line_counts.most_common() if count > len(samples) // 2]
+
+    # zlib finds matches closer to the end of the dictionary with shorter codes: the most shared lines go last
+    dictionary = b''
+    for line in shared_lines:
+        if len(dictionary) + len(line) + 1 > ZLIB_DICTIONARY_SIZE:
+            break
+        dictionary = line + b'\n' + dictionary
+
+    return dictionary
+
+
+class CompressedPickleDict(DbPickleDict):
+    """
+    The sqlite storage of the cached responses, compressing the pickled responses before saving them, optionally with
+    a dictionary trained on the cached pages (see migrate_cache()). Dictionaries are stored in the same database, and
+    each entry refers to the dictionary it was compressed with. Entries saved uncompressed (by DbPickleDict) are still
+    read, so existing caches don't need to be migrated. Entries compressed with zstd are missing when zstandard is not installed.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the sqlite database.
+
+    table_name : str
+        The table storing the entries.
+
+    fast_save : bool
+        Boolean defining if sqlite is configured to save without waiting for the data to be written to disk.
+
+    Methods
+    -------
+    compress(self, data)
+        Returns the compressed entry of some pickled data, using the current dictionary.
+
+    decompress(self, value)
+        Returns the pickled data of a stored entry, compressed or not.
+
+    add_dictionary(self, dictionary, codec=None)
+        Stores a dictionary and makes it the current one, used for compressing new entries.
+    """
+
+    def __init__(self, filename, table_name='responses', fast_save=False):
+        super().__init__(filename, table_name, fast_save=fast_save)
+        self.dictionaries = DbDict(filename, table_name + '_dictionaries')
+        self.__loaded_dictionaries = {0: (get_default_codec(), None)}
+        self.__lock = threading.Lock()
+        try:
+            self.__current_dictionary_id = int(self.dictionaries['current'])
+        except KeyError:
+            self.__current_dictionary_id = 0
+
+    def __setitem__(self, key, item):
+        DbDict.__setitem__(self, key, sqlite3.Binary(self.compress(pickle.dumps(item))))
+
+    def __getitem__(self, key):
+        try:
+            data = self.decompress(bytes(DbDict.__getitem__(self, key)))
+        except ImportError:
+            # Compressed with zstd, but zstandard is not installed (anymore): the page is fetched again, as if not cached
+            raise KeyError(key)
+
+        return pickle.loads(data)
+
+    def compress(self, data):
+        """
+        Returns the compressed entry of some pickled data, using the current dictionary.
+
+        Arguments:
+            data {bytes} -- The pickled data
+
+        Returns:
+            [bytes] -- The entry, i.e. a header (codec and dictionary) followed by the compressed data
+        """
+
+        dictionary_id = self.__current_dictionary_id
+        codec, dictionary = self.__get_dictionary(dictionary_id)
+        if codec == ZSTD_CODEC:
+            import zstandard
+
+            dictionary_data = None if dictionary is None else zstandard.ZstdCompressionDict(dictionary)
+            compressed_data = zstandard.ZstdCompressor(level=3, dict_data=dictionary_data).compress(data)
+        else:
+            compressor = zlib.compressobj(6) if dictionary is None else zlib.compressobj(6, zdict=dictionary)
+            compressed_data = compressor.compress(data) + compressor.flush()
+
+        return _HEADER.pack(codec, dictionary_id) + compressed_data
+
+    def decompress(self, value):
+        """
+        Returns the pickled data of a stored entry, compressed or not.
+
+        Arguments:
+            value {bytes} -- The stored entry
+
+        Returns:
+            [bytes] -- The pickled data
+        """
+
+        if value[:1] == _PICKLE_MARKER:
+            # Saved uncompressed
+            return value
+
+        codec, dictionary_id = _HEADER.unpack_from(value)
+        dictionary = self.__get_dictionary(dictionary_id)[1]
+        compressed_data = value[_HEADER.size:]
+        if codec == ZSTD_CODEC:
+            import zstandard
+
+            dictionary_data = None if dictionary is None else zstandard.ZstdCompressionDict(dictionary)
+            return zstandard.ZstdDecompressor(dict_data=dictionary_data).decompress(compressed_data)
+
+        decompressor = zlib.decompressobj() if dictionary is None else zlib.decompressobj(zdict=dictionary)
+
+        return decompressor.decompress(compressed_data) + decompressor.flush()
+
+    def add_dictionary(self, dictionary, codec=None):
+        """
+        Stores a dictionary and makes it the current one, used for compressing new entries.
+
+        Arguments:
+            dictionary {bytes} -- The dictionary, as returned by train_dictionary()
+
+        Keyword Arguments:
+            codec {bytes} -- The codec the dictionary was trained for (default: {None}, meaning the default codec)
+
+        Returns:
+            [int] -- The id of the dictionary
+        """
+
+        codec = codec or get_default_codec()
+        with self.__lock:
+            dictionary_id = max([int(key) for key in self.dictionaries if key != 'current'] + [0]) + 1
+            self.dictionaries[str(dictionary_id)] = sqlite3.Binary(codec + dictionary)
+            self.dictionaries['current'] = dictionary_id
+            self.__loaded_dictionaries[dictionary_id] = (codec, dictionary)
+            self.__current_dictionary_id = dictionary_id
+
+        return dictionary_id
+
+    def __get_dictionary(self, dictionary_id):
+        """Returns codec and dictionary given the dictionary id, loading the dictionary from the database only once."""
+
+        entry = self.__loaded_dictionaries.get(dictionary_id)
+        if entry is None:
+            stored_dictionary = bytes(self.dictionaries[str(dictionary_id)])
+            entry = (stored_dictionary[:1], stored_dictionary[1:])
+            with self.__lock:
+                self.__loaded_dictionaries[dictionary_id] = entry
+
+        return entry
+
+
+def migrate_cache(filename, samples=1000, batch_size=1000, table_name='responses'):
+    """
+    Compresses all the entries of an existing cache database with a dictionary trained on a sample of its pages,
+    then reclaims the space freed on disk. Entries saved uncompressed, or compressed with a previous dictionary,
+    are all rewritten. The cache must not be used by other processes during the migration.
+
+    Arguments:
+        filename {str} -- The path of the sqlite database (e.g. metalparser_cache.sqlite)
+
+    Keyword Arguments:
+        samples {int} -- Amount of entries the dictionary is trained on (default: {1000})
+        batch_size {int} -- Amount of entries rewritten in a single transaction (default: {1000})
+        table_name {str} -- The table storing the entries (default: {'responses'})
+
+    Returns:
+        [dict] -- A dict with the amount of migrated entries and the size of the database before and after the migration
+    """
+
+    size_before = os.path.getsize(filename)
+    responses = CompressedPickleDict(filename, table_name)
+    connection = sqlite3.connect(filename)
+    try:
+        rows = connection.execute('select value from `{}` order by random() limit ?'.format(table_name), (samples,))
+        sample_data = [responses.decompress(bytes(value)) for value, in rows]
+        if sample_data:
+            responses.add_dictionary(train_dictionary(sample_data))
+
+        migrated_entries = 0
+        last_rowid = 0
+        while True:
+            rows = connection.execute(
+                'select rowid, value from `{}` where rowid > ? order by rowid limit ?'.format(table_name),
+                (last_rowid, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            connection.executemany(
+                'update `{}` set value = ? where rowid = ?'.format(table_name),
+                [(sqlite3.Binary(responses.compress(responses.decompress(bytes(value)))), rowid) for rowid, value in rows]
+            )
+            connection.commit()
+            migrated_entries += len(rows)
+            last_rowid = rows[-1][0]
+
+        if sample_data:
+            # Previous dictionaries are not referred to anymore
+            connection.execute(
+                'delete from `{}` where key not in (?, ?)'.format(responses.dictionaries.table_name),
+                ('current', str(responses.dictionaries['current']))
+            )
+            connection.commit()
+        connection.execute('vacuum')
+    finally:
+        connection.close()
+
+    return {'entries': migrated_entries, 'size_before': size_before, 'size_after': os.path.getsize(filename)}
@@ -16,3 +16,24 @@ class ArtistNotFoundException(MetalParserException):
 class SongsNotFoundException(MetalParserException):
     def __init__(self, message='Error'):
         super().__init__(message)
+
+
+class FetchException(MetalParserException):
+    def __init__(self, message='Error', url=None):
+        super().__init__(message)
+        self.url = url
+
+
+class CircuitOpenException(FetchException):
+    def __init__(self, message='Error', url=None):
+        super().__init__(message, url=url)
+
+
+class DeadlineExceededException(FetchException):
+    def __init__(self, message='Error', url=None):
+        super().__init__(message, url=url)
+
+
+class CacheMissException(FetchException):
+    def __init__(self, message='Error', url=None):
+        super().__init__(message, url=url)
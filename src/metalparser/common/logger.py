@@ -1,9 +1,19 @@
+import atexit
 import logging
+import logging.handlers
+import queue
+import threading
+
+
+_listeners = {}
+_listeners_lock = threading.Lock()
 
 
 class MetalParserLogger:
     """
     Instantiate a logging.Logger object.
+    The logger is configured only once per process: later instances reuse it without adding handlers. Records are put on
+    a queue and written to the console (and to the log file) by a background thread, so logging never blocks the caller.
 
     Parameters
     ----------
@@ -41,28 +51,45 @@ class MetalParserLogger:
 
     def __set_debug_mode_logger(self):
         """
-        Set logger level to DEBUG and only display error messages on a log file and on console.
+        Set logger level to DEBUG and display messages on a log file and on console.
         It creates the log file in the folder from where the script is called.
         """
 
-        logging.basicConfig(
-            level=logging.DEBUG,
-            format='%(asctime)s %(levelname)-- 8s %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S',
-            filename='metalparser.log',
-            filemode='w'
-        )
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.DEBUG)
+        def create_handlers():
+            file_handler = logging.FileHandler('metalparser.log', mode='w')
+            file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)-- 8s %(message)s', '%Y-%m-%d %H:%M:%S'))
+            return [file_handler, logging.StreamHandler()]
 
-        self.logger = logging.getLogger('metalparser')
-        self.logger.addHandler(console_handler)
+        self.logger = _get_queue_logger('metalparser', logging.DEBUG, logging.DEBUG, create_handlers)
 
     def __set_error_mode_logger(self):
         """Set logger level to ERROR and only display error messages on console."""
 
-        ch = logging.StreamHandler()
-        ch.setLevel(logging.ERROR)
+        def create_handlers():
+            return [logging.StreamHandler()]
+
+        self.logger = _get_queue_logger('metalparser_console_only', None, logging.ERROR, create_handlers)
+
+
+def _get_queue_logger(name, level, handler_level, create_handlers):
+    """
+    Returns the named logger, attaching the first time a queue handler (filtering records below handler_level)
+    served by a listener thread writing to the handlers returned by create_handlers().
+    """
 
-        self.logger = logging.getLogger('metalparser_console_only')
-        self.logger.addHandler(ch)
+    logger = logging.getLogger(name)
+    with _listeners_lock:
+        if name not in _listeners:
+            records_queue = queue.Queue(-1)
+            listener = logging.handlers.QueueListener(records_queue, *create_handlers())
+            listener.start()
+            # Write the records still queued before exiting
+            atexit.register(listener.stop)
+            if level is not None:
+                logger.setLevel(level)
+            queue_handler = logging.handlers.QueueHandler(records_queue)
+            queue_handler.setLevel(handler_level)
+            logger.addHandler(queue_handler)
+            _listeners[name] = listener
+
+    return logger
@@ -0,0 +1,93 @@
+import threading
+
+from collections import OrderedDict
+
+
+class MemoryCache:
+    """
+    A least recently used (LRU) cache of a limited amount of entries, kept in memory in front of a slower cache. Thread safe.
+
+    Parameters
+    ----------
+    max_entries : int
+        Maximum amount of entries: when full, the least recently used entry is discarded.
+
+    Methods
+    -------
+    get(self, key)
+        Returns the entry stored for a key, or None if not found.
+
+    put(self, key, value)
+        Stores an entry for a key.
+
+    discard(self, key)
+        Removes the entry stored for a key, if any.
+
+    get_stats(self)
+        Returns a dict with the amount of entries, hits and misses.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+
+    def get(self, key):
+        """
+        Returns the entry stored for a key, or None if not found.
+
+        Arguments:
+            key {hashable} -- The key of the entry
+
+        Returns:
+            [object or None] -- The entry stored for the key
+        """
+
+        with self.__lock:
+            value = self.__entries.get(key)
+            if value is None:
+                self.__misses += 1
+            else:
+                self.__hits += 1
+                self.__entries.move_to_end(key)
+
+        return value
+
+    def put(self, key, value):
+        """
+        Stores an entry for a key, discarding the least recently used entry when full.
+
+        Arguments:
+            key {hashable} -- The key of the entry
+            value {object} -- The entry (not None)
+        """
+
+        with self.__lock:
+            self.__entries[key] = value
+            self.__entries.move_to_end(key)
+            if len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+
+    def discard(self, key):
+        """
+        Removes the entry stored for a key, if any.
+
+        Arguments:
+            key {hashable} -- The key of the entry
+        """
+
+        with self.__lock:
+            self.__entries.pop(key, None)
+
+    def get_stats(self):
+        """
+        Returns a dict with the amount of entries, hits and misses.
+
+        Returns:
+            [dict] -- A dict with entries, hits and misses
+        """
+
+        with self.__lock:
+            return {'entries': len(self.__entries), 'hits': self.__hits, 'misses': self.__misses}
@@ -0,0 +1,220 @@
+import re
+import threading
+import time
+
+from datetime import datetime, timezone
+
+
+THROTTLING_STATUS_CODES = (429, 503)
+
+BLOCK_STATUS_CODES = (403,)
+
+# Block pages are recognized by their structure (a whole title, a challenge widget or script), never by page text,
+# which may contain the same words in a song or an album title
+BLOCK_PAGE_REGEX = re.compile(
+    br'<title>\s*(?:access denied|403 forbidden|too many requests|attention required! \| cloudflare|just a moment\.\.\.)\s*</title>'
+    br'|<(?:div|form)\b[^>]*\b(?:id|class)\s*=\s*["\']?(?:g-recaptcha|h-captcha|cf-turnstile|challenge-form|captcha)\b'
+    br'|/cdn-cgi/challenge-platform/',
+    re.IGNORECASE
+)
+
+
+def parse_retry_after(value):
+    """
+    Returns the seconds to wait according to the value of a Retry-After header.
+
+    Arguments:
+        value {str} -- The value of the header, either an amount of seconds or an HTTP date
+
+    Returns:
+        [float or None] -- The seconds to wait, or None when the value is missing or invalid
+    """
+
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    from email.utils import parsedate_to_datetime
+
+    try:
+        retry_date = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_date is None:
+        return None
+    if retry_date.tzinfo is None:
+        retry_date = retry_date.replace(tzinfo=timezone.utc)
+
+    return max((retry_date - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def is_block_page(response):
+    """
+    Check if a response is a block page (e.g. a captcha or an "access denied" page) instead of the requested page,
+    according to its status code or its structure (see BLOCK_PAGE_REGEX).
+
+    Arguments:
+        response {Response} -- The response to check
+
+    Returns:
+        [bool] -- True if the response looks like a block page
+    """
+
+    if response.status_code in BLOCK_STATUS_CODES:
+        return True
+
+    return BLOCK_PAGE_REGEX.search(response.content) is not None
+
+
+class AdaptiveRateController:
+    """
+    Paces requests with an AIMD (additive increase, multiplicative decrease) policy: the rate grows by a fixed step
+    after each healthy response, and is cut by a factor on throttling responses (429/503), block pages, timeouts or
+    slow responses. A Retry-After delay sent by the server is always honored. Thread safe.
+
+    Parameters
+    ----------
+    initial_rate : float
+        Requests per minute at start.
+
+    min_rate : float
+        The rate is never decreased below this amount of requests per minute.
+
+    max_rate : float
+        The rate is never increased above this amount of requests per minute.
+
+    increase : float
+        Requests per minute added after each healthy response.
+
+    decrease_factor : float
+        Factor the rate is multiplied by after each unhealthy response.
+
+    max_latency : float
+        Seconds after which a response is considered slow, i.e. a sign of an overloaded server.
+
+    Methods
+    -------
+    acquire(self, timeout=None)
+        Wait until the next request can be made according to the current rate.
+
+    on_response(self, response, latency)
+        Update the rate according to a response received from the server.
+
+    on_failure(self)
+        Decrease the rate after a failed request (e.g. a timeout).
+
+    get_rate(self)
+        Returns the current rate, in requests per minute.
+
+    get_metrics(self)
+        Returns a dict with the current rate and the counters of the responses seen so far.
+    """
+
+    def __init__(self, initial_rate, min_rate=1, max_rate=60, increase=1, decrease_factor=0.5, max_latency=5):
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, min_rate)
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.max_latency = max_latency
+        self.__rate = min(max(initial_rate, self.min_rate), self.max_rate)
+        self.__next_request_time = 0
+        self.__lock = threading.Lock()
+        self.__turn_lock = threading.Lock()
+        self.__counters = {'healthy_responses': 0, 'throttled_responses': 0, 'slow_responses': 0, 'failed_requests': 0}
+
+    def acquire(self, timeout=None):
+        """
+        Wait until the next request can be made according to the current rate.
+        Concurrent callers are let through one at a time, each one at least an interval after the previous one.
+
+        Keyword Arguments:
+            timeout {float} -- Maximum seconds to wait (default: {None}, meaning no limit)
+
+        Returns:
+            [bool] -- True when the request can be made, False when it should wait longer than the timeout
+        """
+
+        expires_at = None if timeout is None else time.monotonic() + timeout
+        if not self.__turn_lock.acquire(timeout=-1 if timeout is None else max(timeout, 0)):
+            return False
+        try:
+            while True:
+                # The next request time can be postponed while sleeping (e.g. by a Retry-After), so check it again
+                with self.__lock:
+                    delay = self.__next_request_time - time.monotonic()
+                    if delay <= 0:
+                        self.__next_request_time = time.monotonic() + self.__get_interval()
+                        return True
+                if expires_at is not None and time.monotonic() + delay > expires_at:
+                    return False
+                time.sleep(delay)
+        finally:
+            self.__turn_lock.release()
+
+    def on_response(self, response, latency):
+        """
+        Update the rate according to a response received from the server.
+
+        Arguments:
+            response {Response} -- The response received from the server
+            latency {float} -- Seconds elapsed between the request and the response
+        """
+
+        if response.status_code in THROTTLING_STATUS_CODES or is_block_page(response):
+            self.__decrease('throttled_responses', parse_retry_after(response.headers.get('Retry-After')))
+        elif latency > self.max_latency:
+            self.__decrease('slow_responses')
+        else:
+            with self.__lock:
+                self.__counters['healthy_responses'] += 1
+                self.__rate = min(self.__rate + self.increase, self.max_rate)
+                self.__delay_next_request(self.__get_interval())
+
+    def on_failure(self):
+        """Decrease the rate after a failed request (e.g. a timeout or a connection error)."""
+
+        self.__decrease('failed_requests')
+
+    def get_rate(self):
+        """
+        Returns the current rate.
+
+        Returns:
+            [float] -- The current amount of requests per minute
+        """
+
+        return self.__rate
+
+    def get_metrics(self):
+        """
+        Returns a dict with the current rate and the counters of the responses seen so far.
+
+        Returns:
+            [dict] -- A dict with requests_per_minute, healthy_responses, throttled_responses, slow_responses and failed_requests
+        """
+
+        with self.__lock:
+            metrics = {'requests_per_minute': self.__rate}
+            metrics.update(self.__counters)
+
+        return metrics
+
+    def __decrease(self, counter, retry_after=None):
+        """Cut the rate by the decrease factor, waiting at least retry_after seconds before the next request."""
+
+        with self.__lock:
+            self.__counters[counter] += 1
+            self.__rate = max(self.__rate * self.decrease_factor, self.min_rate)
+            self.__delay_next_request(max(self.__get_interval(), retry_after or 0))
+
+    def __delay_next_request(self, delay):
+        """Make the next request wait at least delay seconds from now. The lock must be held by the caller."""
+
+        self.__next_request_time = max(self.__next_request_time, time.monotonic() + delay)
+
+    def __get_interval(self):
+        """Returns the seconds between two requests according to the current rate."""
+
+        return 60 / self.__rate
@@ -0,0 +1,189 @@
+import sys
+import weakref
+
+from collections.abc import Mapping
+
+
+class AlbumRecord:
+    """
+    Compact, immutable info about an album, shared by all the songs of the album.
+
+    Parameters
+    ----------
+    artist : str
+        The artist's name.
+
+    title : str
+        The title of the album.
+
+    type : str
+        The album type (album, EP, demo, ...).
+
+    release_year : int or None
+        The release year of the album (None when unknown).
+    """
+
+    __slots__ = ('artist', 'title', 'type', 'release_year', '__weakref__')
+
+    def __init__(self, artist, title, type, release_year):
+        self.artist = artist
+        self.title = title
+        self.type = type
+        self.release_year = release_year
+
+    def __repr__(self):
+        return 'AlbumRecord(artist={!r}, title={!r}, type={!r}, release_year={!r})'.format(
+            self.artist, self.title, self.type, self.release_year
+        )
+
+
+class SongRecord(Mapping):
+    """
+    Compact info and lyrics of a song, referencing a shared AlbumRecord.
+    For backward compatibility, a SongRecord can be read like the dict returned by the APIs
+    (e.g. record['release_year'], which is a str as before, while record.release_year is an int).
+
+    Parameters
+    ----------
+    album_record : AlbumRecord
+        The album the song belongs to.
+
+    title : str
+        The title of the song.
+
+    track_no : int
+        The track number of the song in the album.
+
+    lyrics : str
+        The lyrics of the song.
+
+    duplicate_of : dict
+        Album, title and track number of the original version, when the song is a duplicate sharing its lyrics
+        (None otherwise). The 'duplicate_of' key is only readable for duplicates, as in the dicts returned by the APIs.
+
+    Methods
+    -------
+    to_dict(self)
+        Returns the song info and lyrics as a dict, in the same format returned by the APIs.
+    """
+
+    __slots__ = ('album_record', 'title', 'track_no', 'lyrics', 'duplicate_of')
+
+    KEYS = ('artist', 'album', 'album_type', 'release_year', 'title', 'track_no', 'lyrics')
+
+    def __init__(self, album_record, title, track_no, lyrics, duplicate_of=None):
+        self.album_record = album_record
+        self.title = title
+        self.track_no = track_no
+        self.lyrics = lyrics
+        self.duplicate_of = duplicate_of
+
+    @property
+    def artist(self):
+        return self.album_record.artist
+
+    @property
+    def album(self):
+        return self.album_record.title
+
+    @property
+    def album_type(self):
+        return self.album_record.type
+
+    @property
+    def release_year(self):
+        return self.album_record.release_year
+
+    def to_dict(self):
+        """
+        Returns the song info and lyrics as a dict, in the same format returned by the APIs.
+
+        Returns:
+            [dict] -- A dict containing info and lyrics of the song
+        """
+
+        return {key: self[key] for key in self}
+
+    def __getitem__(self, key):
+        if key == 'release_year':
+            release_year = self.album_record.release_year
+            return '' if release_year is None else str(release_year)
+        elif key in self.KEYS or (key == 'duplicate_of' and self.duplicate_of is not None):
+            return getattr(self, key)
+
+        raise KeyError(key)
+
+    def __iter__(self):
+        if self.duplicate_of is not None:
+            return iter(self.KEYS + ('duplicate_of',))
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS) + (self.duplicate_of is not None)
+
+    def __repr__(self):
+        return 'SongRecord(artist={!r}, album={!r}, title={!r}, track_no={!r})'.format(
+            self.artist, self.album, self.title, self.track_no
+        )
+
+
+class RecordsFactory:
+    """
+    Creates song records, sharing a single AlbumRecord among the songs of the same album.
+    Repeated strings (artist names, album titles and types) are interned.
+
+    Methods
+    -------
+    get_album_record(self, artist, title, type, release_year)
+        Returns the AlbumRecord corresponding to the specified album info.
+
+    get_song_record(self, album_record, title, track_no, lyrics, duplicate_of=None)
+        Returns a SongRecord related to the specified AlbumRecord.
+    """
+
+    def __init__(self):
+        self.__albums = weakref.WeakValueDictionary()
+
+    def get_album_record(self, artist, title, type, release_year):
+        """
+        Returns the AlbumRecord corresponding to the specified album info.
+        The same object is returned as long as a song of the album is still referenced.
+
+        Arguments:
+            artist {str} -- The artist's name
+            title {str} -- The title of the album
+            type {str} -- The album type
+            release_year {str or int} -- The release year of the album (str as found on DarkLyrics.com)
+
+        Returns:
+            [AlbumRecord] -- The album record
+        """
+
+        release_year = int(release_year) if str(release_year).isdigit() else None
+        key = (artist, title, type, release_year)
+        album_record = self.__albums.get(key)
+
+        if album_record is None:
+            album_record = AlbumRecord(sys.intern(artist), sys.intern(title), sys.intern(type), release_year)
+            self.__albums[key] = album_record
+
+        return album_record
+
+    def get_song_record(self, album_record, title, track_no, lyrics, duplicate_of=None):
+        """
+        Returns a SongRecord related to the specified AlbumRecord.
+
+        Arguments:
+            album_record {AlbumRecord} -- The album the song belongs to
+            title {str} -- The title of the song
+            track_no {int} -- The track number of the song
+            lyrics {str} -- The lyrics of the song
+
+        Keyword Arguments:
+            duplicate_of {dict} -- Album, title and track number of the original version of a duplicate song (default: {None})
+
+        Returns:
+            [SongRecord] -- The song record
+        """
+
+        return SongRecord(album_record, title, track_no, lyrics, duplicate_of=duplicate_of)
@@ -0,0 +1,139 @@
+import random
+import threading
+import time
+
+from metalparser.common.exceptions import CircuitOpenException
+
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def get_backoff_delay(attempt, backoff_factor=1, max_delay=60):
+    """
+    Returns the seconds to wait before retrying a request, growing exponentially with the attempt number.
+    The delay is randomly jittered (between half and all of the exponential delay) so that concurrent retries don't
+    hit the server at the same time.
+
+    Arguments:
+        attempt {int} -- The number of the failed attempt, starting from 0
+
+    Keyword Arguments:
+        backoff_factor {float} -- Seconds to wait after the first failed attempt (default: {1})
+        max_delay {float} -- Maximum seconds to wait (default: {60})
+
+    Returns:
+        [float] -- The seconds to wait
+    """
+
+    delay = min(backoff_factor * 2 ** attempt, max_delay)
+
+    return random.uniform(delay / 2, delay)
+
+
+class CircuitBreaker:
+    """
+    Fails fast when the server is down: after a number of consecutive failures the circuit opens, and requests are
+    refused without reaching the server. Once the reset timeout is over, a single trial request is let through:
+    the circuit closes if it succeeds, and opens again otherwise. Thread safe.
+
+    Parameters
+    ----------
+    failure_threshold : int
+        Amount of consecutive failures opening the circuit.
+
+    reset_timeout : float
+        Seconds after which a trial request is let through an open circuit.
+
+    Methods
+    -------
+    check(self, url=None)
+        Raises CircuitOpenException if a request can't be made because the circuit is open.
+
+    cancel_trial(self)
+        Release the trial request let through by check() when it is not made after all.
+
+    on_success(self)
+        Close the circuit after a successful request.
+
+    on_failure(self)
+        Count a failed request, opening the circuit when needed.
+
+    get_state(self)
+        Returns the state of the circuit: 'closed', 'open' or 'half-open'.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.__failures = 0
+        self.__opened_at = None
+        self.__trial_running = False
+        self.__lock = threading.Lock()
+
+    def check(self, url=None):
+        """
+        Raises CircuitOpenException if a request can't be made because the circuit is open.
+
+        Keyword Arguments:
+            url {str} -- The URL to be requested, reported in the exception (default: {None})
+
+        Raises:
+            CircuitOpenException: Exception raised when the circuit is open, or when a trial request is already running
+
+        Returns:
+            [bool] -- True if the request is the trial request of a half-open circuit, False if the circuit is closed
+        """
+
+        with self.__lock:
+            if self.__opened_at is None:
+                return False
+            if not self.__trial_running and time.monotonic() - self.__opened_at >= self.reset_timeout:
+                self.__trial_running = True
+                return True
+
+        raise CircuitOpenException(
+            'Too many consecutive failures, requests are suspended for {} seconds. Is darklyrics.com down?'.format(self.reset_timeout),
+            url=url
+        )
+
+    def cancel_trial(self):
+        """
+        Release the trial request let through by check() when it is not made after all (e.g. its deadline is exceeded
+        while waiting for the rate limit), so that the next request can be the trial request.
+        """
+
+        with self.__lock:
+            self.__trial_running = False
+
+    def on_success(self):
+        """Close the circuit after a successful request."""
+
+        with self.__lock:
+            self.__failures = 0
+            self.__opened_at = None
+            self.__trial_running = False
+
+    def on_failure(self):
+        """Count a failed request, opening the circuit after too many consecutive failures or a failed trial request."""
+
+        with self.__lock:
+            self.__failures += 1
+            if self.__trial_running or self.__failures >= self.failure_threshold:
+                self.__opened_at = time.monotonic()
+                self.__trial_running = False
+
+    def get_state(self):
+        """
+        Returns the state of the circuit.
+
+        Returns:
+            [str] -- 'closed', 'open' or 'half-open' (i.e. a trial request is running or can be made)
+        """
+
+        with self.__lock:
+            if self.__opened_at is None:
+                return 'closed'
+            elif self.__trial_running or time.monotonic() - self.__opened_at >= self.reset_timeout:
+                return 'half-open'
+
+            return 'open'
@@ -0,0 +1,147 @@
+import itertools
+import threading
+import time
+
+from contextlib import contextmanager
+from metalparser.common.exceptions import DeadlineExceededException
+
+
+DEFAULT_WEIGHTS = {'interactive': 10, 'bulk': 1}
+
+
+class RequestScheduler:
+    """
+    Decides which of the waiting requests takes the next turn of the rate budget, so that interactive lookups are not
+    starved by bulk crawls. Requests belong to priority classes sharing the budget by weighted fair queuing: when every
+    class has waiting requests, each class gets turns in proportion to its weight, while an idle class leaves its share
+    to the others. A request can have a deadline: it is served first when the deadline is close, and it fails with
+    DeadlineExceededException when the deadline is over before it gets its turn. Thread safe.
+
+    Parameters
+    ----------
+    weights : dict
+        Weight of each priority class (default: {'interactive': 10, 'bulk': 1}).
+
+    urgency_window : float
+        Requests whose deadline is over within these seconds are served before the others, earliest deadline first.
+
+    Methods
+    -------
+    turn(self, priority, deadline=None, url=None)
+        Context manager waiting for the turn of a request, and holding it until exit.
+
+    get_stats(self)
+        Returns a dict with the counters and the waiting times of each priority class.
+    """
+
+    def __init__(self, weights=None, urgency_window=1):
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.urgency_window = urgency_window
+        self.__condition = threading.Condition()
+        self.__waiting = []
+        self.__busy = False
+        self.__virtual_time = 0.0
+        self.__finish_tags = {priority: 0.0 for priority in self.weights}
+        self.__sequence = itertools.count()
+        self.__stats = {
+            priority: {'requests': 0, 'expired_requests': 0, 'waiting_requests': 0, 'total_wait': 0.0, 'max_wait': 0.0}
+            for priority in self.weights
+        }
+
+    @contextmanager
+    def turn(self, priority, deadline=None, url=None):
+        """
+        Context manager waiting for the turn of a request, and holding it until exit.
+
+        Arguments:
+            priority {str} -- The priority class of the request
+
+        Keyword Arguments:
+            deadline {float} -- Maximum seconds to wait for the turn (default: {None}, meaning no deadline)
+            url {str} -- The URL to be requested, reported in the exception (default: {None})
+
+        Raises:
+            ValueError: Exception raised when the priority class is unknown
+            DeadlineExceededException: Exception raised when the deadline is over before the request gets its turn
+        """
+
+        self.__acquire(priority, deadline, url)
+        try:
+            yield
+        finally:
+            with self.__condition:
+                self.__busy = False
+                self.__condition.notify_all()
+
+    def get_stats(self):
+        """
+        Returns a dict with the counters and the waiting times of each priority class.
+
+        Returns:
+            [dict] -- A dict with a dict for each priority class, with the amount of served, expired and waiting requests
+                      and the mean and max seconds waited for the turn
+        """
+
+        with self.__condition:
+            return {
+                priority: {
+                    'requests': stats['requests'],
+                    'expired_requests': stats['expired_requests'],
+                    'waiting_requests': stats['waiting_requests'],
+                    'mean_wait': stats['total_wait'] / stats['requests'] if stats['requests'] else 0.0,
+                    'max_wait': stats['max_wait']
+                }
+                for priority, stats in self.__stats.items()
+            }
+
+    def __acquire(self, priority, deadline, url):
+        """Wait until the request is selected and no other request holds the turn."""
+
+        if priority not in self.weights:
+            raise ValueError('Unknown priority class "{}", expected one of: {}'.format(priority, ', '.join(sorted(self.weights))))
+
+        start = time.monotonic()
+        expires_at = None if deadline is None else start + deadline
+
+        with self.__condition:
+            # Virtual finish tag: a class advances by 1 / weight at each request, so heavier classes get more turns
+            tag = max(self.__virtual_time, self.__finish_tags[priority]) + 1 / self.weights[priority]
+            self.__finish_tags[priority] = tag
+            request = (tag, next(self.__sequence), priority, expires_at)
+            self.__waiting.append(request)
+            stats = self.__stats[priority]
+            stats['waiting_requests'] += 1
+
+            try:
+                while self.__busy or self.__select() is not request:
+                    timeout = None
+                    if expires_at is not None:
+                        timeout = expires_at - time.monotonic()
+                        if timeout <= 0:
+                            stats['expired_requests'] += 1
+                            raise DeadlineExceededException(
+                                'Request not served within its deadline of {} seconds.'.format(deadline), url=url
+                            )
+                    self.__condition.wait(timeout)
+            finally:
+                self.__waiting.remove(request)
+                stats['waiting_requests'] -= 1
+                # Let the other requests check whether they are selected now
+                self.__condition.notify_all()
+
+            self.__busy = True
+            self.__virtual_time = tag
+            wait = time.monotonic() - start
+            stats['requests'] += 1
+            stats['total_wait'] += wait
+            stats['max_wait'] = max(stats['max_wait'], wait)
+
+    def __select(self):
+        """Returns the next request to be served: the most urgent one, if any, otherwise the one with the lowest finish tag."""
+
+        urgent_before = time.monotonic() + self.urgency_window
+        urgent_requests = [request for request in self.__waiting if request[3] is not None and request[3] <= urgent_before]
+        if urgent_requests:
+            return min(urgent_requests, key=lambda request: (request[3], request[1]))
+
+        return min(self.__waiting)
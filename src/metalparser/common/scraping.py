@@ -1,25 +1,164 @@
+import codecs
+import io
 import json
 import os
+import queue
 import random
-import requests
-import requests_cache
+import re
+import threading
 import time
 
-from bs4 import BeautifulSoup
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
-from ratelimit import limits, sleep_and_retry
+
+from metalparser.common.exceptions import CacheMissException, DeadlineExceededException, FetchException
+from metalparser.common.memorycache import MemoryCache
+from metalparser.common.ratecontrol import BLOCK_PAGE_REGEX, AdaptiveRateController, is_block_page
+from metalparser.common.retry import RETRY_STATUS_CODES, CircuitBreaker, get_backoff_delay
+from metalparser.common.scheduler import RequestScheduler
+from metalparser.common.singleflight import SingleFlight
+
+
+_USER_AGENTS = None
+_USER_AGENTS_LOCK = threading.Lock()
+
+POOL_SIZE = 10
+
+DEFAULT_PRIORITY = 'interactive'
+
+_CHARSET_PATTERN = re.compile(br'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+
+def get_user_agents_list():
+    """
+    Returns the list of user agents from the corresponding JSON file, which is read only once.
+
+    Returns:
+        [list] -- A list of str containing user agents
+    """
+
+    global _USER_AGENTS
+
+    if _USER_AGENTS is None:
+        with _USER_AGENTS_LOCK:
+            if _USER_AGENTS is None:
+                file_path = os.path.dirname(os.path.realpath(__file__)) + '/resources/user_agents.json'
+                with open(file_path, 'r') as f:
+                    _USER_AGENTS = [ua['user_agent'] for ua in json.loads(f.read())]
+
+    return _USER_AGENTS
+
+
+def get_declared_encoding(content, headers):
+    """
+    Returns the encoding of a page declared by the Content-Type header or, when missing, by a <meta> tag in the head of the page.
+
+    Arguments:
+        content {bytes} -- The raw content of the page
+        headers {dict} -- The response headers
+
+    Returns:
+        [str or None] -- The name of the encoding, or None when not declared (or unknown)
+    """
+
+    for source in (headers.get('Content-Type', '').encode('latin-1', 'ignore'), content[:2048]):
+        match = _CHARSET_PATTERN.search(source)
+        if match:
+            try:
+                return codecs.lookup(match.group(1).decode('ascii')).name
+            except LookupError:
+                continue
+
+    return None
+
+
+def decode_content(content, headers):
+    """
+    Decodes the raw content of a page with the declared encoding, when any (the fast path), detecting the encoding otherwise.
+
+    Arguments:
+        content {bytes} -- The raw content of the page
+        headers {dict} -- The response headers
+
+    Returns:
+        [str] -- The decoded content of the page
+    """
+
+    encoding = get_declared_encoding(content, headers)
+    if encoding is not None:
+        try:
+            return content.decode(encoding)
+        except UnicodeDecodeError:
+            pass
+
+    from bs4 import UnicodeDammit
+
+    return UnicodeDammit(content, is_html=True).unicode_markup
+
+
+def _strip_fragment(url):
+    """Returns the URL without the fragment, which is never sent to the server (so pages are cached once, not per song)."""
+
+    return url.split('#')[0]
+
+
+def _cap_timeout(timeout, remaining):
+    """Returns the requests timeout (a number or a (connect, read) tuple) shortened to the remaining seconds."""
+
+    remaining = max(remaining, 0.001)
+    if isinstance(timeout, tuple):
+        return tuple(remaining if value is None else min(value, remaining) for value in timeout)
+
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+@contextmanager
+def _no_transaction():
+    """Context manager doing nothing, for the cache backends without transactions."""
+
+    yield
 
 
 class ScrapingAgent:
     """
     Instantiate an object with cached and uncached web crawling functions.
+    Heavy dependencies are imported, and the cached session is created, only when the first page is requested.
 
     Parameters
     ----------
     use_cache : bool
         Boolean defining if a cached session will be created or not
 
+    requests_per_minute : int
+        Maximum amount of uncached requests per minute
+
+    wait_time : float
+        Seconds to wait after each uncached request at start, then adapted to the server responses
+
+    timeout : tuple
+        Connect and read timeouts of uncached requests, in seconds
+
+    max_retries : int
+        Maximum amount of retries of an uncached request failing because of a timeout, a connection error or a server error
+
+    prefetch_requests_per_minute : int
+        Maximum amount of background requests per minute, made to warm the cache (on top of the uncached requests)
+
+    memory_cache_size : int
+        Maximum amount of cached pages also kept in memory, in front of the sqlite cache (0 to disable the memory tier)
+
+    offline : bool
+        Boolean defining if pages are only read from the cache, which never expires, without any request to darklyrics.com
+        (e.g. after importing a web archive with import_pages())
+
+    cache_only : bool
+        Boolean defining if pages not cached (or expired) raise CacheMissException instead of being fetched, by default
+        (see cache_policy())
+
+    cache_path : str
+        Path of the sqlite cache, without the extension (None for metalparser_cache in the package directory)
+
     Attributes
     ----------
     cache_expires_after : int
@@ -28,29 +167,106 @@ class ScrapingAgent:
     cached_session : CachedSession
         Object instantiating a cached session for requests
 
+    session : Session
+        Persistent session, pooling keep-alive connections, used for uncached requests
+
+    memory_cache : MemoryCache
+        The memory tier of the cache, keeping the most recently used cached pages (None when disabled)
+
+    rate_controller : AdaptiveRateController
+        Object pacing uncached requests, increasing the rate while the server is healthy and backing off when it is not
+
+    prefetch_rate_controller : AdaptiveRateController
+        Object pacing background requests made to warm the cache
+
+    scheduler : RequestScheduler
+        Object deciding which waiting request takes the next turn of the rate budget, by priority class and deadline
+
+    circuit_breaker : CircuitBreaker
+        Object refusing uncached requests for a while after too many consecutive failures, when the server is down
+
+    single_flight : SingleFlight
+        Object coalescing concurrent requests for the same URL into a single fetch (and a single parsing)
+
     Methods
     -------
     get_page_from_url(self, url)
         Returns a DarkLyrics.com page related to an artist in form of a BeautifulSoup object.
 
+    get_content_from_url(self, url)
+        Returns the raw content of a DarkLyrics.com page, without parsing it.
+
+    get_text_from_url(self, url)
+        Returns the content of a DarkLyrics.com page decoded as text, without parsing it.
+
+    get_cached_content(self, url)
+        Returns the raw content of a cached DarkLyrics.com page, reading the cache only once.
+
+    import_pages(self, pages, batch_size=1000)
+        Stores pages captured elsewhere (e.g. read from a web archive) in the cache, in large transactions.
+
+    prefetch_url(self, url)
+        Fetches a DarkLyrics.com page in the background, storing it in the cache.
+
+    request_priority(self, priority, deadline=None)
+        Context manager setting the priority class (and the deadline) of the requests made by the current thread.
+
+    cache_policy(self, cache_only=True, deadline=None, serve_stale=False, fetch_misses=False)
+        Context manager setting how the current thread handles pages not cached (or expired), bounding the latency.
+
     get_cached_session(self)
         Returns the cached_session attribute.
 
     get_last_response(self)
         Returns the last Response object corresponding to the last request made by the ScrapingAgent.
+
+    get_metrics(self)
+        Returns a dict with the current rate of uncached requests, the counters of the server responses and the circuit state.
     """
 
-    def __init__(self, use_cache=True):
-        self.cache_validity = 7200
-        self.cached_session = self.__create_cached_session() if use_cache is True else None
+    def __init__(self, use_cache=True, requests_per_minute=40, wait_time=3, timeout=(5, 30), max_retries=3,
+                 prefetch_requests_per_minute=10, memory_cache_size=0, offline=False, cache_only=False, cache_path=None):
+        self.offline = offline is True
+        # Imported pages must not expire when working offline
+        self.cache_validity = None if self.offline else 7200
+        self.use_cache = use_cache is True or self.offline
+        self.cache_path = cache_path or str(Path(os.path.abspath(__file__)).parent.parent) + '/metalparser_cache'
+        self.cached_session = None
+        self.session = None
         self.last_response = None
-
-        if use_cache:
-            self.__remove_expired_entries()
+        self.memory_cache = MemoryCache(memory_cache_size) if memory_cache_size else None
+        self.requests_per_minute = requests_per_minute
+        self.wait_time = wait_time
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.circuit_breaker = CircuitBreaker()
+        self.rate_controller = AdaptiveRateController(
+            initial_rate=min(requests_per_minute, 60 / wait_time) if wait_time else requests_per_minute,
+            max_rate=requests_per_minute
+        )
+        self.prefetch_rate_controller = AdaptiveRateController(
+            initial_rate=prefetch_requests_per_minute,
+            max_rate=prefetch_requests_per_minute
+        )
+        self.scheduler = RequestScheduler()
+        self.single_flight = SingleFlight()
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        self.__last_cached_response = None
+        self.__foreground_requests = 0
+        self.__foreground_idle = threading.Condition()
+        # (cache_only, deadline, serve_stale, fetch_misses)
+        self.__default_cache_policy = (cache_only is True or self.offline, None, False, False)
+        self.__misses = queue.Queue()
+        self.__queued_misses = set()
+        self.__misses_thread = None
+        self.__cache_policy_stats = {'cache_misses': 0, 'stale_pages': 0, 'queued_misses': 0}
 
     def get_page_from_url(self, url):
         """
         Returns a DarkLyrics.com page related to an artist in form of a BeautifulSoup object.
+        The page is parsed from the decoded text, so BeautifulSoup doesn't have to detect the encoding. Concurrent callers asking for the same URL share a single fetch and the same BeautifulSoup object,
+        which must not be modified.
 
         Arguments:
             url {str} -- A string containing an URL
@@ -59,23 +275,200 @@ class ScrapingAgent:
             [BeautifulSoup] -- An HTML page related to the specified URL in form of a BeautifulSoup object
         """
 
-        if self.__is_cached(url):
-            response = self.__get_response_without_limiter(url)
-        else:
-            response = self.__get_response_with_limiter(url)
+        url = _strip_fragment(url)
+
+        return self.single_flight.do(('page', url, self.__get_cache_policy()), lambda: self.__parse_page(url))
+
+    def get_content_from_url(self, url):
+        """
+        Returns the raw content of a DarkLyrics.com page, without parsing it.
+        Concurrent callers asking for the same URL share a single fetch.
+
+        Arguments:
+            url {str} -- A string containing an URL
+
+        Raises:
+            FetchException: Exception raised when the page can't be fetched, even after retrying
+
+        Returns:
+            [bytes] -- The content of the page related to the specified URL
+        """
+
+        url = _strip_fragment(url)
+
+        return self.single_flight.do(('content', url, self.__get_cache_policy()), lambda: self.__get_content(url))
+
+    def get_text_from_url(self, url):
+        """
+        Returns the content of a DarkLyrics.com page decoded as text, without parsing it.
+        Pages are decoded with the encoding declared by the response headers (or by the page), detecting it only when
+        not declared. When the memory tier is enabled, the decoded text is kept there, so cached pages are decoded only once.
+        Concurrent callers asking for the same URL share a single fetch.
+
+        Arguments:
+            url {str} -- A string containing an URL
+
+        Raises:
+            FetchException: Exception raised when the page can't be fetched, even after retrying
+
+        Returns:
+            [str] -- The decoded content of the page related to the specified URL
+        """
+
+        url = _strip_fragment(url)
+
+        return self.single_flight.do(('text', url, self.__get_cache_policy()), lambda: self.__get_text(url))
+
+    def get_cached_content(self, url):
+        """
+        Returns the raw content of a cached DarkLyrics.com page, reading the cache only once (the memory tier first, if enabled).
+
+        Arguments:
+            url {str} -- A string containing an URL
+
+        Returns:
+            [bytes or None] -- The content of the page, or None when the page is not cached (or expired)
+        """
+
+        entry = self.__read_cache(_strip_fragment(url))
+        if entry is None:
+            return None
+
+        self.__last_cached_response = entry[0]
+
+        return entry[0]._content
+
+    def import_pages(self, pages, batch_size=1000):
+        """
+        Stores pages captured elsewhere (e.g. read from a web archive with metalparser.common.archives.read_archive())
+        in the cache, committing them in transactions of batch_size pages. Only successful responses (except block pages)
+        are stored, as done for the fetched pages. Imported pages expire as the fetched ones, unless the cache is used offline.
+
+        Arguments:
+            pages {iterable} -- An iterable of (URL, status code, headers dict, content bytes) tuples
+
+        Keyword Arguments:
+            batch_size {int} -- Amount of pages stored in a single transaction (default: {1000})
+
+        Raises:
+            ValueError: Exception raised when the cache is not used
+
+        Returns:
+            [int] -- The amount of pages stored in the cache
+        """
+
+        cached_session = self.get_cached_session()
+        if cached_session is None:
+            raise ValueError('Importing pages requires the cache')
+
+        imported_pages = 0
+        batch = []
+        for page in pages:
+            if page[1] == 200 and BLOCK_PAGE_REGEX.search(page[3]) is None:
+                batch.append(page)
+            if len(batch) == batch_size:
+                imported_pages += self.__store_pages(cached_session, batch)
+                batch = []
+        if batch:
+            imported_pages += self.__store_pages(cached_session, batch)
+
+        return imported_pages
+
+    def prefetch_url(self, url):
+        """
+        Fetches a DarkLyrics.com page in the background, storing it in the cache, without parsing it.
+        Background requests have their own (lower) rate budget and are always preempted by foreground requests:
+        they are made only when no foreground request is waiting or running.
+
+        Arguments:
+            url {str} -- A string containing an URL
+
+        Raises:
+            FetchException: Exception raised when the page can't be fetched, even after retrying
+
+        Returns:
+            [bool] -- True if the page has been fetched, False if it was already cached and not expired (or when the cache
+                      is not used)
+        """
+
+        url = _strip_fragment(url)
+        if not self.use_cache or self.__is_cached(url):
+            return False
+
+        self.__fetch(url, self.__acquire_background_turn, self.prefetch_rate_controller)
+
+        return True
+
+    @contextmanager
+    def request_priority(self, priority, deadline=None):
+        """
+        Context manager setting the priority class of the uncached requests made by the current thread,
+        e.g. 'interactive' (the default) for user-facing lookups and 'bulk' for crawls.
+
+        Arguments:
+            priority {str} -- The priority class, i.e. one of the classes weighted by the scheduler
+
+        Keyword Arguments:
+            deadline {float} -- Maximum seconds each request can wait for its turn, after which DeadlineExceededException
+                                is raised (default: {None}, meaning no deadline)
+
+        Raises:
+            ValueError: Exception raised when the priority class is unknown
+        """
+
+        if priority not in self.scheduler.weights:
+            raise ValueError('Unknown priority class "{}", expected one of: {}'.format(priority, ', '.join(sorted(self.scheduler.weights))))
+
+        previous_priority = getattr(self.__local, 'priority', None)
+        self.__local.priority = (priority, deadline)
+        try:
+            yield
+        finally:
+            self.__local.priority = previous_priority
 
-        page = BeautifulSoup(response.content, 'html.parser')
+    @contextmanager
+    def cache_policy(self, cache_only=True, deadline=None, serve_stale=False, fetch_misses=False):
+        """
+        Context manager setting how the pages requested by the current thread are handled when not cached (or expired),
+        so that a request handler never blocks on a rate-limited fetch. Pages not served raise CacheMissException.
+
+        Keyword Arguments:
+            cache_only {bool} -- Boolean defining if pages not cached are never fetched (default: {True})
+            deadline {float} -- Maximum seconds spent fetching the pages not cached within the block (counted from its
+                                start), including the waits for the rate budget, the requests and their retries
+                                (default: {None}, meaning no deadline)
+            serve_stale {bool} -- Boolean defining if expired pages are returned when they can't be fetched (because of
+                                  cache_only, the deadline or a fetch error) (default: {False})
+            fetch_misses {bool} -- Boolean defining if pages not served are queued for fetching in the background,
+                                   with the budget of prefetch_url() (default: {False})
+        """
 
-        return page
+        previous_policy = getattr(self.__local, 'cache_policy', None)
+        previous_expires_at = getattr(self.__local, 'cache_policy_expires_at', None)
+        self.__local.cache_policy = (cache_only is True, deadline, serve_stale is True, fetch_misses is True)
+        # The deadline bounds the whole block, not each page: a lookup may fetch several pages
+        self.__local.cache_policy_expires_at = None if deadline is None else time.monotonic() + deadline
+        try:
+            yield
+        finally:
+            self.__local.cache_policy = previous_policy
+            self.__local.cache_policy_expires_at = previous_expires_at
 
     def get_cached_session(self):
         """
-        Returns the cached_session attribute.
+        Returns the cached_session attribute, creating the cached session if not done yet.
 
         Returns:
-            [CachedSession or None] -- The CachedSession object instantiated when initializing the object class.
+            [CachedSession or None] -- The CachedSession object, or None when the cache is not used.
         """
 
+        if self.use_cache and self.cached_session is None:
+            with self.__lock:
+                if self.cached_session is None:
+                    cached_session = self.__create_cached_session()
+                    self.__remove_expired_entries(cached_session)
+                    self.cached_session = cached_session
+
         return self.cached_session
 
     def get_last_response(self):
@@ -86,61 +479,393 @@ class ScrapingAgent:
             [Response or None] -- The Response object corresponding to the last request made by the ScrapingAgent.
         """
 
+        # Pages read from the cache are turned into Response objects only when asked for
+        cached_response = self.__last_cached_response
+        if cached_response is not None:
+            self.__last_cached_response = None
+            response = self.get_cached_session().cache.restore_response(cached_response)
+            response.from_cache = True
+            self.last_response = response
+
         return self.last_response
 
-    def __remove_expired_entries(self):
+    def get_metrics(self):
+        """
+        Returns a dict with the current rate of uncached requests, the counters of the server responses and the circuit state.
+
+        Returns:
+            [dict] -- A dict with requests_per_minute, healthy_responses, throttled_responses, slow_responses, failed_requests,
+                      circuit_state, prefetch_requests_per_minute, scheduler (the stats of each priority class)
+                      coalescing (the amount of requests sharing the fetch of a concurrent one), cache_policy (the amount
+                      of cache misses, stale pages served and misses queued for fetching) and memory_cache (the stats of
+                      the memory tier, when enabled)
+        """
+
+        metrics = self.rate_controller.get_metrics()
+        metrics['circuit_state'] = self.circuit_breaker.get_state()
+        metrics['prefetch_requests_per_minute'] = self.prefetch_rate_controller.get_rate()
+        metrics['scheduler'] = self.scheduler.get_stats()
+        metrics['coalescing'] = self.single_flight.get_stats()
+        with self.__lock:
+            metrics['cache_policy'] = dict(self.__cache_policy_stats)
+        if self.memory_cache is not None:
+            metrics['memory_cache'] = self.memory_cache.get_stats()
+
+        return metrics
+
+    def __parse_page(self, url):
+        """Fetch a page and parse it with BeautifulSoup."""
+
+        from bs4 import BeautifulSoup
+
+        return BeautifulSoup(self.get_text_from_url(url), 'html.parser')
+
+    def __get_content(self, url):
+        """Retrieve the content of a page from the cache or, when not cached, from darklyrics.com."""
+
+        entry, response = self.__read_or_fetch(url)
+
+        return response.content if entry is None else entry[0]._content
+
+    def __get_text(self, url):
+        """Retrieve the decoded content of a page from the memory tier, the cache or, when not cached, from darklyrics.com."""
+
+        entry, response = self.__read_or_fetch(url)
+        if entry is not None:
+            cached_response, timestamp, text = entry
+            if text is None:
+                text = decode_content(cached_response._content, cached_response.headers)
+                if self.memory_cache is not None:
+                    self.memory_cache.put(url, (cached_response, timestamp, text))
+            return text
+
+        text = decode_content(response.content, response.headers)
+        # Only successful responses are stored in the cache
+        if self.memory_cache is not None and self.use_cache and response.status_code == 200:
+            self.memory_cache.put(url, (response, datetime.utcnow(), text))
+
+        return text
+
+    def __read_or_fetch(self, url):
+        """
+        Returns the cache entry of a page or, when not cached (or expired), the response fetched from darklyrics.com,
+        as an (entry, response) tuple with one of the two set, according to the cache policy of the current thread.
+        """
+
+        cache_only, deadline, serve_stale, fetch_misses = self.__get_cache_policy()
+        entry = self.__read_cache(url, allow_stale=serve_stale)
+        if entry is not None and not self.__is_expired(entry[1]):
+            self.__last_cached_response = entry[0]
+            return entry, None
+
+        expires_at = None if cache_only or deadline is None else self.__local.cache_policy_expires_at
+        if not cache_only and (expires_at is None or time.monotonic() < expires_at):
+            try:
+                return None, self.__get_response_with_limiter(url, expires_at)
+            except FetchException as e:
+                if entry is not None:
+                    self.__restore_stale_entry(url, entry)
+                # Errors are raised as usual, unless a stale page can be served or the deadline of the policy is over
+                elif not (expires_at is not None and isinstance(e, DeadlineExceededException)):
+                    raise
+
+        if fetch_misses:
+            self.__queue_miss(url)
+        with self.__lock:
+            self.__cache_policy_stats['cache_misses' if entry is None else 'stale_pages'] += 1
+        if entry is None:
+            reason = 'requests are disabled' if cache_only else 'it could not be fetched within {} seconds'.format(deadline)
+            raise CacheMissException('URL {} is not cached, and {}'.format(url, reason), url=url)
+
+        self.__last_cached_response = entry[0]
+
+        return entry, None
+
+    def __get_cache_policy(self):
+        """Returns the cache policy of the current thread, as a (cache_only, deadline, serve_stale, fetch_misses) tuple."""
+
+        return getattr(self.__local, 'cache_policy', None) or self.__default_cache_policy
+
+    def __queue_miss(self, url):
+        """Queue a page not served for fetching in the background (unless already queued)."""
+
+        with self.__lock:
+            if url in self.__queued_misses:
+                return
+            self.__queued_misses.add(url)
+            self.__cache_policy_stats['queued_misses'] += 1
+            self.__misses.put(url)
+            if self.__misses_thread is None:
+                self.__misses_thread = threading.Thread(target=self.__fetch_misses, daemon=True)
+                self.__misses_thread.start()
+
+    def __fetch_misses(self):
+        """Fetch the queued pages, one at a time, with the background rate budget."""
+
+        while True:
+            url = self.__misses.get()
+            try:
+                self.prefetch_url(url)
+            except Exception:
+                # The page will be queued again at the next miss
+                pass
+            finally:
+                with self.__lock:
+                    self.__queued_misses.discard(url)
+                self.__misses.task_done()
+
+    def __store_pages(self, cached_session, pages):
+        """Store a batch of pages in the cache in a single transaction, returning the amount of stored pages."""
+
+        import requests
+
+        from urllib3.response import HTTPResponse
+
+        cache = cached_session.cache
+        bulk_commit = getattr(cache.responses, 'bulk_commit', None)
+        now = datetime.utcnow()
+        with bulk_commit() if bulk_commit is not None else _no_transaction():
+            for url, status_code, headers, content in pages:
+                url = _strip_fragment(url)
+                response = requests.Response()
+                response.status_code = status_code
+                response.url = url
+                response.request = requests.PreparedRequest()
+                response.request.prepare(method='GET', url=url)
+                response.headers.update(headers)
+                response.encoding = get_declared_encoding(content, response.headers)
+                response.raw = HTTPResponse(body=io.BytesIO(content), preload_content=False, status=status_code)
+                response._content = content
+                cache.responses[cache.create_key(response.request)] = (cache.reduce_response(response), now)
+                if self.memory_cache is not None:
+                    self.memory_cache.discard(url)
+
+        return len(pages)
+
+    def __remove_expired_entries(self, cached_session):
         """Removes expired entries from cache storage."""
 
         if not self.cache_validity:
             return
 
         expires_after = timedelta(seconds=self.cache_validity)
-        self.cached_session.cache.remove_old_entries(datetime.utcnow() - expires_after)
+        cached_session.cache.remove_old_entries(datetime.utcnow() - expires_after)
 
     def __create_cached_session(self):
         """Initialize a cached session for requests."""
 
-        cache_path = str(Path(os.path.abspath(__file__)).parent.parent) + '/metalparser_cache'
+        import requests_cache
+
+        from metalparser.common.compression import CompressedPickleDict
+
         cached_session = requests_cache.CachedSession(
-            cache_path,
+            self.cache_path,
             backend='sqlite',
             expire_after=self.cache_validity,
             include_get_headers=False
         )
+        # Responses are stored compressed (entries stored uncompressed by previous versions are still read)
+        cached_session.cache.responses = CompressedPickleDict(cached_session.cache.responses.filename, 'responses')
+        self.__configure_session(cached_session)
 
         return cached_session
 
-    @sleep_and_retry
-    @limits(calls=40, period=60)
-    def __get_response_with_limiter(self, url):
-        """Make an HTTP request to darklyrics.com with a limited amount of calls per minute."""
+    def __get_session(self):
+        """Returns the persistent session used for uncached requests, creating it if not done yet."""
 
-        if self.cached_session is None:
-            headers = self.__get_headers()
-            response = requests.get(url, headers=headers)
-        else:
-            response = self.cached_session.get(url)
+        if self.session is None:
+            import requests
 
-        self.last_response = response
-        time.sleep(3)  # Avoid too many reqs per second, which can lead to a blacklist
+            with self.__lock:
+                if self.session is None:
+                    session = requests.Session()
+                    self.__configure_session(session)
+                    self.session = session
 
-        return response
+        return self.session
+
+    def __configure_session(self, session):
+        """Mount a connection pool on the session and negotiate keep-alive and compressed responses."""
+
+        from requests.adapters import HTTPAdapter
+        from urllib3.util import make_headers
 
-    def __get_response_without_limiter(self, url):
-        """Retrieve the response from cache, given that the URL is cached."""
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({
+            'Accept-Encoding': make_headers(accept_encoding=True)['accept-encoding'],  # includes br when brotli is installed
+            'Connection': 'keep-alive'
+        })
+
+    def __get_response_with_limiter(self, url, expires_at=None):
+        """Make a foreground HTTP request to darklyrics.com, preempting background requests, within the deadline (if any)."""
+
+        with self.__foreground_idle:
+            self.__foreground_requests += 1
+        try:
+            response = self.__fetch(
+                url, lambda: self.__acquire_foreground_turn(url, expires_at), self.rate_controller, expires_at=expires_at
+            )
+        finally:
+            with self.__foreground_idle:
+                self.__foreground_requests -= 1
+                self.__foreground_idle.notify_all()
 
-        response = self.cached_session.get(url)
         self.last_response = response
+        self.__last_cached_response = None
 
         return response
 
-    def __get_headers(self):
+    def __acquire_foreground_turn(self, url, expires_at=None):
+        """Wait until the scheduler gives the turn to the request, according to its priority, then for the rate budget."""
+
+        priority, deadline = getattr(self.__local, 'priority', None) or (DEFAULT_PRIORITY, None)
+        if expires_at is not None:
+            remaining = expires_at - time.monotonic()
+            deadline = remaining if deadline is None else min(deadline, remaining)
+        with self.scheduler.turn(priority, deadline=deadline, url=url):
+            if not self.rate_controller.acquire(timeout=None if expires_at is None else expires_at - time.monotonic()):
+                raise DeadlineExceededException('Request not allowed by the rate budget within its deadline.', url=url)
+
+    def __acquire_background_turn(self):
+        """Wait until a background request can be made, i.e. its rate budget allows it and no foreground request is pending."""
+
+        while True:
+            with self.__foreground_idle:
+                self.__foreground_idle.wait_for(lambda: self.__foreground_requests == 0)
+            self.prefetch_rate_controller.acquire()
+            # A foreground request may have come in the meantime
+            with self.__foreground_idle:
+                if self.__foreground_requests == 0:
+                    return
+
+    def __fetch(self, url, acquire, rate_controller, expires_at=None):
+        """
+        Make an HTTP request to darklyrics.com when allowed by the rate controller, which avoids too many reqs per second
+        (leading to a blacklist), then report the outcome of the request to the rate controller.
+        Timeouts, connection errors, server errors and block pages are retried with a jittered exponential backoff,
+        and block pages are never cached. With a deadline, timeouts are shortened and retries are given up so that the deadline is never exceeded.
+        """
+
+        if self.offline:
+            raise FetchException('URL {} is not cached, and requests are disabled in offline mode'.format(url), url=url)
+
+        import requests
+
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                delay = get_backoff_delay(attempt - 1)
+                if expires_at is not None and time.monotonic() + delay >= expires_at:
+                    raise DeadlineExceededException(
+                        'Unable to fetch URL {} within its deadline after {} attempts: {}'.format(url, attempt, error), url=url
+                    )
+                time.sleep(delay)
+            is_trial = self.circuit_breaker.check(url)
+            try:
+                acquire()
+            except BaseException:
+                # No request was made, neither success nor failure will be reported
+                if is_trial:
+                    self.circuit_breaker.cancel_trial()
+                raise
+            timeout = self.timeout if expires_at is None else _cap_timeout(self.timeout, expires_at - time.monotonic())
+            start = time.monotonic()
+            try:
+                cached_session = self.get_cached_session()
+                if cached_session is None:
+                    response = self.__get_session().get(url, headers=self.__get_headers(), timeout=timeout)
+                else:
+                    response = cached_session.get(url, timeout=timeout)
+            except requests.exceptions.RequestException as e:
+                rate_controller.on_failure()
+                self.circuit_breaker.on_failure()
+                error = e
+                continue
+
+            rate_controller.on_response(response, time.monotonic() - start)
+            if response.status_code in RETRY_STATUS_CODES or is_block_page(response):
+                self.circuit_breaker.on_failure()
+                if cached_session is not None and response.status_code == 200:
+                    # Block pages served with status 200 have already been stored by the cached session
+                    cached_session.cache.delete_url(url)
+                if response.status_code in RETRY_STATUS_CODES:
+                    error = 'HTTP status {}'.format(response.status_code)
+                else:
+                    error = 'block page (HTTP status {})'.format(response.status_code)
+                continue
+
+            self.circuit_breaker.on_success()
+
+            return response
+
+        raise FetchException('Unable to fetch URL {} after {} attempts: {}'.format(url, self.max_retries + 1, error), url=url)
+
+    def __read_cache(self, url, allow_stale=False):
         """
-        Make an HTTP request and returns the response.
-        If the URL is cached, then returns a response from the persistent sqlite cache.
+        Returns the cached response (as stored by requests_cache) of an URL with a single lookup, without restoring it
+        into a Response object, along with its timestamp and its decoded text (None when not decoded yet).
+        Returns None when the URL is not cached or expired (unless allow_stale is True).
         """
 
-        user_agent = random.choice(self.__get_user_agents_list())
+        cached_session = self.get_cached_session()
+        if cached_session is None:
+            return None
+
+        cache = cached_session.cache
+        # The memory tier is keyed by URL, sparing the computation of the cache key
+        entry = None if self.memory_cache is None else self.memory_cache.get(url)
+        if entry is None:
+            key = self.__get_cache_key(url)
+            try:
+                entry = cache.responses[key]
+            except KeyError:
+                # Redirected requests are stored under the key of the final URL
+                try:
+                    entry = cache.responses[cache.keys_map[key]]
+                except KeyError:
+                    return None
+            entry = entry + (None,)
+            if self.memory_cache is not None:
+                self.memory_cache.put(url, entry)
+
+        if not allow_stale and self.__is_expired(entry[1]):
+            if self.memory_cache is not None:
+                self.memory_cache.discard(url)
+            return None
+
+        return entry
+
+    def __restore_stale_entry(self, url, entry):
+        """
+        Store again an expired cache entry after a failed refresh (the cached session deletes expired entries before
+        fetching them again), unless a newer entry has been stored meanwhile, so that it can still be served later.
+        """
+
+        cache = self.get_cached_session().cache
+        key = self.__get_cache_key(url)
+        if key not in cache.responses and key not in cache.keys_map:
+            cache.responses[key] = entry[:2]
+
+    def __is_expired(self, timestamp):
+        """Check if a page cached at the given time is expired."""
+
+        return bool(self.cache_validity) and datetime.utcnow() - timestamp > timedelta(seconds=self.cache_validity)
+
+    def __get_cache_key(self, url):
+        """Returns the key of an URL in the cache, i.e. the same key computed by the cached session for a GET request."""
+
+        from requests import PreparedRequest
+
+        request = PreparedRequest()
+        request.prepare(method='GET', url=url)
+
+        return self.get_cached_session().cache.create_key(request)
+
+    def __get_headers(self):
+        """Returns the request headers with a user agent randomly chosen from the preloaded list."""
+
+        user_agent = random.choice(get_user_agents_list())
         headers = {
             'User-Agent': user_agent
         }
@@ -148,18 +873,6 @@ class ScrapingAgent:
         return headers
 
     def __is_cached(self, url):
-        """Check if an URL is already cached."""
-
-        if self.cached_session is None:
-            return False
-
-        return self.cached_session.cache.has_url(url)
-
-    def __get_user_agents_list(self):
-        """Creates a list of user agents from the corresponding JSON file."""
-
-        file_path = os.path.dirname(os.path.realpath(__file__)) + '/resources/user_agents.json'
-        with open(file_path, 'r') as f:
-            user_agents_list = [ua['user_agent'] for ua in json.loads(f.read())]
+        """Check if an URL is already cached, and not expired (so expired pages are fetched again)."""
 
-        return user_agents_list
+        return self.__read_cache(url) is not None
@@ -0,0 +1,68 @@
+import threading
+
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls: while a call for a key is running, other callers asking for the same key don't run
+    the function again, but wait for the running call and share its result (or its exception). Thread safe.
+
+    Methods
+    -------
+    do(self, key, function)
+        Returns the result of the function, sharing it with concurrent callers asking for the same key.
+
+    get_stats(self)
+        Returns a dict with the amount of calls, of executed functions and of coalesced calls.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__calls = {}
+        self.__stats = {'calls': 0, 'executions': 0, 'coalesced_calls': 0}
+
+    def do(self, key, function):
+        """
+        Returns the result of the function, sharing it with concurrent callers asking for the same key.
+        Results are not stored: once the running call is over, the next call for the key runs the function again.
+
+        Arguments:
+            key {hashable} -- The key identifying the call
+            function {callable} -- The function to be called, without arguments
+
+        Returns:
+            [object] -- The result of the function
+        """
+
+        with self.__lock:
+            self.__stats['calls'] += 1
+            call = self.__calls.get(key)
+            leader = call is None
+            if leader:
+                self.__stats['executions'] += 1
+                call = self.__calls[key] = Future()
+            else:
+                self.__stats['coalesced_calls'] += 1
+
+        if leader:
+            try:
+                call.set_result(function())
+            except BaseException as e:
+                call.set_exception(e)
+            finally:
+                with self.__lock:
+                    del self.__calls[key]
+
+        return call.result()
+
+    def get_stats(self):
+        """
+        Returns a dict with the amount of calls, of executed functions and of coalesced calls.
+
+        Returns:
+            [dict] -- A dict with calls, executions and coalesced_calls (calls which shared the result of a running one)
+        """
+
+        with self.__lock:
+            return dict(self.__stats)
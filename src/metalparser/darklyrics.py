@@ -1,9 +1,13 @@
 # coding: utf-8
+import logging
 import string
+import threading
 
-from metalparser.libs.darklyrics_utils import DarkLyricsHelper
-from metalparser.common.exceptions import MetalParserException
+from concurrent.futures import ThreadPoolExecutor
+from metalparser.libs.darklyrics_utils import DarkLyricsHelper, find_duplicate_tracks, parse_artist_page
+from metalparser.common.exceptions import ArtistNotFoundException, MetalParserException
 from metalparser.common.logger import MetalParserLogger
+from metalparser.common.records import RecordsFactory
 
 
 class DarkLyricsApi():
@@ -18,11 +22,47 @@ class DarkLyricsApi():
     debug_mode : bool
         Boolean defining when to save debug info on a log file.
 
+    requests_per_minute : int
+        Maximum amount of uncached requests per minute (default: 40).
+
+    wait_time : float
+        Seconds to wait after each uncached request at start, then adapted to the server responses (default: 3).
+
+    compact_records : bool
+        Boolean defining if songs info and lyrics are returned as compact SongRecord objects instead of dicts.
+        SongRecord objects share the album info among the songs of the same album and can still be read like dicts.
+
+    timeout : tuple
+        Connect and read timeouts of uncached requests, in seconds (default: (5, 30)).
+
+    max_retries : int
+        Maximum amount of retries of an uncached request failing because of a timeout, a connection error or a server error (default: 3).
+
+    memory_cache_size : int
+        Maximum amount of cached pages also kept in memory, in front of the sqlite cache (default: 0, i.e. no memory tier).
+
+    offline : bool
+        Boolean defining if pages are only read from the cache (e.g. imported from a web archive), which never expires,
+        without any request to DarkLyrics.com. Pages not cached make the related songs to be skipped as failures.
+
+    cache_only : bool
+        Boolean defining if pages not cached (or expired) raise CacheMissException instead of being fetched, so lookups never
+        block on a rate-limited request (see ScrapingAgent.cache_policy() for deadlines, stale pages and background fetching).
+
+    cache_path : str
+        Path of the sqlite cache, without the extension (default: metalparser_cache in the package directory).
+
+    base_url : str
+        Base URL of the site, to be changed only for a local stand-in of DarkLyrics.com (e.g. in load tests).
+
     Attributes
     ----------
     helper : DarkLyricsHelper
         Object containing helpers for DarkLyrics.com APIs.
 
+    failures : list
+        List of dict describing the songs, albums and artists skipped because of an error.
+
     Methods
     -------
     get_artists_list(self, initial_letter=None)
@@ -38,16 +78,48 @@ class DarkLyricsApi():
     get_album_info_and_lyrics(self, album, artist)
         Returns a list of dict containing name, title, album, track number and lyrics of all the songs related to an album on DarkLyrics.com.
 
-    get_albums_info_and_lyrics_by_artist(self, artist)
+    get_albums_info_and_lyrics_by_artist(self, artist, max_workers=1, skip_duplicates=False)
         Returns a list of dict containing name, title, album, track number and lyrics of all the songs related to an artist on DarkLyrics.com.
 
+    get_discography(self, artist)
+        Returns a list of dict containing info and track titles of all the albums related to an artist on DarkLyrics.com.
+
+    sync_albums_info_and_lyrics_by_artist(self, artist, discography)
+        Compares the discography of an artist with a previously stored one, fetching info and lyrics of new or changed albums only.
+
     def get_song_info_and_lyrics(self, song, artist)
         Returns a str containing the lyrics of the specified song.
+
+    get_failures(self)
+        Returns a list of dict describing the songs, albums and artists skipped because of an error.
+
+    add_failure(self, error, artist=None, album=None, song=None)
+        Logs an error which made a song, an album or an artist to be skipped, and adds it to the failures.
+
+    get_duplicates_stats(self)
+        Returns a dict with the duplicate tracks skipped so far and the page fetches saved.
     """
 
-    def __init__(self, use_cache=True, debug_mode=False):
-        self.helper = DarkLyricsHelper(use_cache)
+    def __init__(self, use_cache=True, debug_mode=False, requests_per_minute=40, wait_time=3, compact_records=False,
+                 timeout=(5, 30), max_retries=3, memory_cache_size=0, offline=False,
+                 cache_only=False, cache_path=None, base_url='http://www.darklyrics.com/'):
+        self.helper = DarkLyricsHelper(
+            use_cache,
+            requests_per_minute=requests_per_minute,
+            wait_time=wait_time,
+            timeout=timeout,
+            max_retries=max_retries,
+            memory_cache_size=memory_cache_size,
+            offline=offline,
+            cache_only=cache_only,
+            cache_path=cache_path,
+            base_url=base_url
+        )
         self.logger = MetalParserLogger(debug_mode).get_logger()
+        self.records_factory = RecordsFactory() if compact_records is True else None
+        self.failures = []
+        self.__duplicates_stats = {'duplicate_tracks': 0, 'skipped_albums': 0, 'saved_fetches': 0}
+        self.__duplicates_stats_lock = threading.Lock()
 
     def get_artists_list(self, initial_letter=None):
         """
@@ -72,13 +144,14 @@ class DarkLyricsApi():
         else:
             artist_indexes = list(string.ascii_lowercase) + ['19']
 
-        for index in artist_indexes:
-            url = self.helper.get_base_url() + index + '.html'
-            index_page = self.helper.scraping_agent.get_page_from_url(url)
-            artists_tags = index_page.select('div.artists > a')
-            for tag in artists_tags:
-                artist = tag.text.title()
-                artists.append(artist)
+        with self.helper.scraping_agent.request_priority('bulk'):
+            for index in artist_indexes:
+                url = self.helper.get_base_url() + index + '.html'
+                index_page = self.helper.scraping_agent.get_page_from_url(url)
+                artists_tags = index_page.select('div.artists > a')
+                for tag in artists_tags:
+                    artist = tag.text.title()
+                    artists.append(artist)
 
         return sorted(artists)
 
@@ -134,7 +207,7 @@ class DarkLyricsApi():
 
         return songs_list
 
-    def get_album_info_and_lyrics(self, album, artist, lyrics_only=False):
+    def get_album_info_and_lyrics(self, album, artist, lyrics_only=False, skipped_tracks=None):
         """
         Returns a list of dict containing info and lyrics of all the songs related to an album on DarkLyrics.com.
 
@@ -142,23 +215,39 @@ class DarkLyricsApi():
             album {str} -- The title of the album
             artist {str} -- The artist's name
 
+        Keyword Arguments:
+            lyrics_only {bool} -- Flag to determinate if returning the lyrics only (default: {False})
+            skipped_tracks {set} -- Track numbers of the songs not to be fetched (default: {None})
+
         Returns:
-            [list] -- A list of dict containing info and lyrics about of all the songs related to the specified album or
-                      a list of str containing only the lyrics of the specified album, depending on the lyrics_only flag.
+            [list] -- A list of dict (or SongRecord, when using compact records) containing info and lyrics about of all
+                      the songs related to the specified album or a list of str containing only the lyrics of the
+                      specified album, depending on the lyrics_only flag.
         """
 
         lyrics_list = []
         songs_links = self.helper.get_songs_links_from_artist(artist, album=album)
         album_url = self.helper.get_lyrics_url_by_tag(songs_links[0])
         album_info = self.helper.get_albums_info_from_url(album_url)
+        album_record = self.__get_album_record(artist, album_info)
 
         for song_link in songs_links:
-            self.logger.debug('\t\tProcessing song "{}" ...'.format(song_link.text))
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug('\t\tProcessing song "{}" ...'.format(song_link.text))
             # Don't break the entire job because of a single song
             try:
                 url = self.helper.get_lyrics_url_by_tag(song_link)
+                if skipped_tracks and int(url.split('#')[1]) in skipped_tracks:
+                    continue
                 if lyrics_only is True:
                     lyrics_list.append(self.helper.get_lyrics_by_url(url))
+                elif album_record is not None:
+                    lyrics_list.append(self.records_factory.get_song_record(
+                        album_record,
+                        song_link.text,
+                        int(url.split('#')[1]),
+                        self.helper.get_lyrics_by_url(url)
+                    ))
                 else:
                     lyrics_list.append({
                         "artist": artist.title(),
@@ -170,38 +259,116 @@ class DarkLyricsApi():
                         "lyrics": self.helper.get_lyrics_by_url(url)
                     })
             except (MetalParserException, Exception) as e:
-                self.logger.error('Error while processing the song "{}": {}'.format(song_link.text, str(e)))
+                self.add_failure(e, artist=artist, album=album, song=song_link.text)
                 continue
 
         return lyrics_list
 
-    def get_albums_info_and_lyrics_by_artist(self, artist):
+    def get_albums_info_and_lyrics_by_artist(self, artist, max_workers=1, skip_duplicates=False):
         """
         Returns a list of dict containing name, title, album, track number and lyrics of all the songs related to an artist on DarkLyrics.com.
+        With more than one worker, albums are processed concurrently: cached pages are parsed while the next uncached
+        request waits for its turn (the rate limit is shared by all the workers). Songs are returned in the same order anyway.
+        When skipping duplicates, the versions of a song on live albums, compilations and re-releases are found by normalized
+        title on the artist page (see find_duplicate_tracks()): only the original version is fetched, and the duplicates
+        share its lyrics, with a 'duplicate_of' reference (album, title and track number of the original version).
+        Albums made of duplicates only are not fetched at all (see get_duplicates_stats()). When the original version
+        can't be fetched, its duplicates are fetched from their own albums instead, so no song is lost.
 
         Arguments:
             artist {str} -- The artist's name
 
+        Keyword Arguments:
+            max_workers {int} -- Maximum amount of albums processed concurrently (default: {1})
+            skip_duplicates {bool} -- Flag to determinate if fetching the original version of duplicate songs only (default: {False})
+
         Returns:
-            [list] -- A list of dict containing info and lyrics of all the songs related to the specified artist.
+            [list] -- A list of dict (or SongRecord, when using compact records) containing info and lyrics of all the songs
+                      related to the specified artist.
         """
 
         self.logger.debug('Processing artist "{}" ...'.format(artist.title()))
-        albums = self.get_albums_info(artist, title_only=True)
+        if skip_duplicates:
+            return self.__get_albums_info_and_lyrics_without_duplicates(artist, max_workers)
+
+        with self.helper.scraping_agent.request_priority('bulk'):
+            albums = self.get_albums_info(artist, title_only=True)
         albums_info_lyrics = []
 
-        for album in albums:
-            self.logger.debug('\tProcessing album "{}" ...'.format(album))
-            # Don't break the entire job because of a single album
-            try:
-                album_info_lyrics = self.get_album_info_and_lyrics(album, artist)
-                albums_info_lyrics += album_info_lyrics
-            except Exception as e:
-                self.logger.error('Error while processing the album "{}" by "{}": {}'.format(album, artist, str(e)))
-                continue
+        for album_info_lyrics in self.__map_albums(artist, [(album, None) for album in albums], max_workers):
+            albums_info_lyrics += album_info_lyrics
 
         return albums_info_lyrics
 
+    def get_discography(self, artist):
+        """
+        Returns a list of dict containing info and track titles of all the albums related to an artist on DarkLyrics.com.
+        Only the artist page is requested.
+
+        Arguments:
+            artist {str} -- The artist's name
+
+        Returns:
+            [list] -- A list of dict with title, type, release year and the list of track titles of each album.
+        """
+
+        artist_page = self.helper.get_artist_page(artist)
+
+        return self.helper.get_discography_from_artist_page(artist_page)
+
+    def sync_albums_info_and_lyrics_by_artist(self, artist, discography):
+        """
+        Compares the discography of an artist on DarkLyrics.com with a previously stored one, fetching info and lyrics of
+        new or changed albums only (an album is changed when its type, release year or track titles differ).
+        Albums which failed, even partially (i.e. some of their songs), are left out of the returned discography, or keep
+        their stored info, so that they are fetched again at the next sync; the songs fetched anyway are returned.
+        The stored discography can be the one returned by a previous sync or by get_discography(), or it can be computed from
+        previously crawled songs with DarkLyricsHelper.get_discography_from_records().
+
+        Arguments:
+            artist {str} -- The artist's name
+            discography {list} -- The stored discography of the artist, i.e. a list of dict as returned by get_discography()
+
+        Returns:
+            [dict] -- A dict with the following keys:
+                      'added' and 'changed': lists of dict containing info and lyrics of the songs of new and changed albums;
+                      'removed', 'unchanged' and 'failed': lists of album titles;
+                      'discography': the discography to be stored for the next sync.
+        """
+
+        stored_albums = {album['title']: album for album in discography}
+        changeset = {'added': [], 'changed': [], 'removed': [], 'unchanged': [], 'failed': [], 'discography': []}
+
+        self.logger.debug('Syncing artist "{}" ...'.format(artist.title()))
+        with self.helper.scraping_agent.request_priority('bulk'):
+            for album in self.get_discography(artist):
+                stored_album = stored_albums.pop(album['title'], None)
+                if stored_album is not None and self.__is_same_album(album, stored_album):
+                    changeset['unchanged'].append(album['title'])
+                    changeset['discography'].append(album)
+                    continue
+
+                status = 'added' if stored_album is None else 'changed'
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug('\tFetching {} album "{}" ...'.format(status, album['title']))
+                failures_count = len(self.failures)
+                # Don't break the entire job because of a single album
+                try:
+                    changeset[status] += self.get_album_info_and_lyrics(album['title'], artist)
+                except Exception as e:
+                    self.add_failure(e, artist=artist, album=album['title'])
+                # Albums with songs which failed are not synced, so they are fetched again at the next sync
+                if any(failure['artist'] == artist and failure['album'] == album['title'] for failure in self.failures[failures_count:]):
+                    changeset['failed'].append(album['title'])
+                    if stored_album is not None:
+                        changeset['discography'].append(stored_album)
+                else:
+                    changeset['discography'].append(album)
+
+        changeset['removed'] = list(stored_albums)
+
+        return changeset
+
     def get_song_info_and_lyrics(self, song, artist, lyrics_only=False):
         """
         Returns a str containing the lyrics of the specified song.
@@ -211,8 +378,9 @@ class DarkLyricsApi():
             artist {str} -- The artist's name
 
         Returns:
-            [dict or str] -- A dict containing info and lyrics about a song of a certain artist or
-                             a str containing only the lyrics of the specified song, depending on the lyrics_only flag.
+            [dict or str] -- A dict (or SongRecord, when using compact records) containing info and lyrics about a song
+                             of a certain artist or a str containing only the lyrics of the specified song, depending on
+                             the lyrics_only flag.
         """
 
         lyrics_url = self.helper.get_lyrics_url_by_song(song, artist)
@@ -220,6 +388,13 @@ class DarkLyricsApi():
 
         if lyrics_only is True:
             return self.helper.get_lyrics_by_url(lyrics_url)
+        elif self.records_factory is not None:
+            return self.records_factory.get_song_record(
+                self.__get_album_record(artist, album_info),
+                song,
+                int(lyrics_url.split('#')[1]),
+                self.helper.get_lyrics_by_url(lyrics_url)
+            )
         else:
             return {
                 "artist": artist.title(),
@@ -229,3 +404,190 @@ class DarkLyricsApi():
                 "track_no": int(lyrics_url.split('#')[1]),
                 "lyrics": self.helper.get_lyrics_by_url(lyrics_url)
             }
+
+    def get_failures(self):
+        """
+        Returns a list of dict describing the songs, albums and artists skipped because of an error, e.g. when a page
+        can't be fetched even after retrying. Skipped items can be fetched again later on.
+
+        Returns:
+            [list] -- A list of dict with the following keys: artist, album, song (None when not related to a single
+                      album or song), url (None when unknown), error (the exception class name) and message.
+        """
+
+        return list(self.failures)
+
+    def add_failure(self, error, artist=None, album=None, song=None):
+        """
+        Logs an error which made a song, an album or an artist to be skipped, and adds it to the failures.
+
+        Arguments:
+            error {Exception} -- The error raised while processing the item
+
+        Keyword Arguments:
+            artist {str} -- The artist's name (default: {None})
+            album {str} -- The title of the album (default: {None})
+            song {str} -- The title of the song (default: {None})
+        """
+
+        if song is not None:
+            self.logger.error('Error while processing the song "{}": {}'.format(song, str(error)))
+        elif album is not None:
+            self.logger.error('Error while processing the album "{}" by "{}": {}'.format(album, artist, str(error)))
+        else:
+            self.logger.error('Error while processing the artist "{}": {}'.format(artist, str(error)))
+
+        self.failures.append({
+            'artist': artist,
+            'album': album,
+            'song': song,
+            'url': getattr(error, 'url', None),
+            'error': type(error).__name__,
+            'message': str(error)
+        })
+
+    def get_duplicates_stats(self):
+        """
+        Returns a dict with the duplicate songs skipped so far by get_albums_info_and_lyrics_by_artist(skip_duplicates=True)
+        and the page fetches saved: a duplicate song saves the lookup of its lyrics (and their sanitization), an album made
+        of duplicates only saves the request of its page as well.
+
+        Returns:
+            [dict] -- A dict with duplicate_tracks, skipped_albums and saved_fetches
+        """
+
+        with self.__duplicates_stats_lock:
+            return dict(self.__duplicates_stats)
+
+    def __get_album_info_and_lyrics_or_nothing(self, album, artist, skipped_tracks=None):
+        """Returns info and lyrics of the songs of an album, or an empty list (logging the error) if something goes wrong."""
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('\tProcessing album "{}" ...'.format(album))
+        # Don't break the entire job because of a single album
+        try:
+            with self.helper.scraping_agent.request_priority('bulk'):
+                if skipped_tracks is None:
+                    return self.get_album_info_and_lyrics(album, artist)
+                return self.get_album_info_and_lyrics(album, artist, skipped_tracks=skipped_tracks)
+        except Exception as e:
+            self.add_failure(e, artist=artist, album=album)
+            return []
+
+    def __map_albums(self, artist, albums, max_workers):
+        """
+        Returns info and lyrics of the songs of each (album, skipped tracks) tuple, in the same order,
+        processing the albums concurrently with more than one worker.
+        """
+
+        if max_workers > 1 and len(albums) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(albums))) as executor:
+                return list(executor.map(
+                    lambda album: self.__get_album_info_and_lyrics_or_nothing(album[0], artist, album[1]), albums
+                ))
+
+        return (self.__get_album_info_and_lyrics_or_nothing(album, artist, skipped_tracks) for album, skipped_tracks in albums)
+
+    def __get_albums_info_and_lyrics_without_duplicates(self, artist, max_workers):
+        """Returns info and lyrics of all the songs of an artist, fetching only the original version of duplicate songs."""
+
+        url = self.helper.get_artist_url(artist)
+        with self.helper.scraping_agent.request_priority('bulk'):
+            artist_albums = parse_artist_page(self.helper.scraping_agent.get_text_from_url(url))
+        if artist_albums is None:
+            raise ArtistNotFoundException(
+                'Artist page for "{}" not found at URL: {}. Is it on darklyrics.com?'.format(artist.title(), url)
+            )
+        duplicates = find_duplicate_tracks(artist_albums)
+
+        # Albums made of duplicates only are not fetched
+        skipped_tracks = [{int(href.split('#')[1]) for _, href in album['songs'] if href in duplicates} for album in artist_albums]
+        is_fetched = [not album['songs'] or len(tracks) < len(album['songs']) for album, tracks in zip(artist_albums, skipped_tracks)]
+        fetched_songs = iter(self.__map_albums(artist, [
+            (album['title'], tracks) for album, tracks, fetched in zip(artist_albums, skipped_tracks, is_fetched) if fetched
+        ], max_workers))
+        albums_songs = [{song['track_no']: song for song in next(fetched_songs)} if fetched else {} for fetched in is_fetched]
+
+        # Duplicates of songs which failed are fetched from their own album instead
+        fetched_hrefs = {
+            href for album, album_songs in zip(artist_albums, albums_songs) for _, href in album['songs']
+            if href not in duplicates and int(href.split('#')[1]) in album_songs
+        }
+        missing_tracks = [
+            {int(href.split('#')[1]) for _, href in album['songs'] if href in duplicates and duplicates[href] not in fetched_hrefs}
+            for album in artist_albums
+        ]
+        fallback_albums = [index for index, tracks in enumerate(missing_tracks) if tracks]
+        fallback_songs = self.__map_albums(artist, [
+            (artist_albums[index]['title'], {int(href.split('#')[1]) for _, href in artist_albums[index]['songs']} - missing_tracks[index])
+            for index in fallback_albums
+        ], max_workers)
+        for index, songs in zip(fallback_albums, fallback_songs):
+            albums_songs[index].update((song['track_no'], song) for song in songs)
+
+        # The original version of a song always comes first, so it's already known when its duplicates are found
+        songs_by_href = {}
+        albums_info_lyrics = []
+        for album, album_songs in zip(artist_albums, albums_songs):
+            for title, href in album['songs']:
+                track_no = int(href.split('#')[1])
+                if duplicates.get(href) in songs_by_href:
+                    albums_info_lyrics.append(self.__get_duplicate_song(artist, album, title, track_no, songs_by_href[duplicates[href]]))
+                elif track_no in album_songs:
+                    songs_by_href[href] = album_songs[track_no]
+                    albums_info_lyrics.append(album_songs[track_no])
+
+        duplicate_tracks = len(duplicates) - sum(len(tracks) for tracks in missing_tracks)
+        skipped_albums = sum(1 for fetched, tracks in zip(is_fetched, missing_tracks) if not fetched and not tracks)
+        with self.__duplicates_stats_lock:
+            self.__duplicates_stats['duplicate_tracks'] += duplicate_tracks
+            self.__duplicates_stats['skipped_albums'] += skipped_albums
+            self.__duplicates_stats['saved_fetches'] += duplicate_tracks + skipped_albums
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('Skipped {} duplicate songs and {} albums of "{}"'.format(
+                duplicate_tracks, skipped_albums, artist.title()
+            ))
+
+        return albums_info_lyrics
+
+    def __get_duplicate_song(self, artist, album, title, track_no, original_song):
+        """Returns info of a duplicate song, sharing the lyrics of the original version and referencing it."""
+
+        duplicate_of = {'album': original_song['album'], 'title': original_song['title'], 'track_no': original_song['track_no']}
+        if self.records_factory is not None:
+            return self.records_factory.get_song_record(
+                self.__get_album_record(artist, album), title, track_no, original_song['lyrics'], duplicate_of=duplicate_of
+            )
+
+        return {
+            "artist": artist.title(),
+            "album": album['title'],
+            "album_type": album['type'],
+            "release_year": album['release_year'],
+            "title": title,
+            "track_no": track_no,
+            "lyrics": original_song['lyrics'],
+            "duplicate_of": duplicate_of
+        }
+
+    def __is_same_album(self, album, stored_album):
+        """Check if an album on the artist page matches the stored one."""
+
+        return (
+            album['type'].lower() == stored_album['type'].lower() and
+            str(album['release_year']) == str(stored_album['release_year']) and
+            list(album['tracks']) == list(stored_album['tracks'])
+        )
+
+    def __get_album_record(self, artist, album_info):
+        """Returns the AlbumRecord shared by the songs of an album, or None when not using compact records."""
+
+        if self.records_factory is None:
+            return None
+
+        return self.records_factory.get_album_record(
+            artist.title(),
+            album_info['title'],
+            album_info['type'],
+            album_info['release_year']
+        )
@@ -0,0 +1,401 @@
+import json
+import os
+
+from array import array
+from metalparser.libs.search import tokenize
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+GROUPS = ('song', 'album', 'artist')
+
+
+class LyricsCorpus:
+    """
+    Corpus analytics over songs lyrics with NumPy: lyrics are tokenized once (as in the lyrics search, see tokenize())
+    into a single array of integer term ids, and term frequencies, per-album and per-artist aggregates, TF-IDF and n-gram
+    counts are computed as vectorized operations over it. Term and document frequencies are updated incrementally when
+    songs are added, and the corpus can be saved to a .npz file and loaded again, so that only newly crawled albums
+    need to be tokenized.
+
+    Parameters
+    ----------
+    path : str
+        The .npz file the corpus is loaded from, if it exists, and saved to (optional, the corpus is in-memory only when
+        not specified).
+
+    Methods
+    -------
+    add(self, records)
+        Adds songs to the corpus, skipping the ones already added.
+
+    save(self, path=None)
+        Saves the corpus to a .npz file.
+
+    get_stats(self)
+        Returns a dict with the size of the corpus.
+
+    get_term_frequencies(self, limit=None)
+        Returns the most frequent terms with their frequencies.
+
+    get_group_stats(self, by='album')
+        Returns the aggregates of each album or artist.
+
+    get_tf_idf(self, by='song', limit=10)
+        Returns the terms with the highest TF-IDF of each song, album or artist.
+
+    get_ngram_counts(self, n=2, limit=20)
+        Returns the most frequent n-grams.
+    """
+
+    def __init__(self, path=None):
+        if np is None:
+            raise ImportError('Corpus analytics requires numpy: pip install metalparser[analytics]')
+
+        self.path = path
+        self.terms = []
+        self.term_ids = {}
+        self.artists = []
+        self.albums = []
+        self.songs = []
+        self.__artist_ids = {}
+        self.__album_ids = {}
+        self.__song_keys = set()
+        self.tokens = np.zeros(0, dtype=np.uint32)
+        self.song_offsets = np.zeros(1, dtype=np.int64)
+        self.song_lines = np.zeros(0, dtype=np.int32)
+        self.song_albums = np.zeros(0, dtype=np.int32)
+        self.album_artists = np.zeros(0, dtype=np.int32)
+        self.term_counts = np.zeros(0, dtype=np.int64)
+        self.document_frequencies = np.zeros(0, dtype=np.int64)
+        # Songs added since the last consolidation, appended to the arrays at the first query
+        self.__pending_tokens = array('I')
+        self.__pending_lengths = array('q')
+        self.__pending_lines = array('i')
+        self.__pending_albums = array('i')
+        self.__pending_album_artists = array('i')
+
+        if path is not None and os.path.exists(path):
+            self.__load(path)
+
+    def __len__(self):
+        return len(self.songs)
+
+    def add(self, records):
+        """
+        Adds songs to the corpus, tokenizing their lyrics. Songs already added (same artist, album and track number)
+        are skipped, so the songs of an artist can be added again after crawling new albums.
+
+        Arguments:
+            records {iterable} -- Dict (or SongRecord) as returned by DarkLyricsApi.get_album_info_and_lyrics()
+
+        Returns:
+            [int] -- The amount of songs added
+        """
+
+        added = 0
+        for record in records:
+            key = (record['artist'], record['album'], record['track_no'])
+            if key in self.__song_keys:
+                continue
+            self.__song_keys.add(key)
+
+            artist_id = self.__artist_ids.get(record['artist'])
+            if artist_id is None:
+                artist_id = self.__artist_ids[record['artist']] = len(self.artists)
+                self.artists.append(record['artist'])
+            album_id = self.__album_ids.get((artist_id, record['album']))
+            if album_id is None:
+                album_id = self.__album_ids[(artist_id, record['album'])] = len(self.albums)
+                self.albums.append(record['album'])
+                self.__pending_album_artists.append(artist_id)
+
+            terms = tokenize(record['lyrics'])
+            for term in terms:
+                term_id = self.term_ids.get(term)
+                if term_id is None:
+                    term_id = self.term_ids[term] = len(self.terms)
+                    self.terms.append(term)
+                self.__pending_tokens.append(term_id)
+            self.songs.append((record['title'], record['track_no']))
+            self.__pending_lengths.append(len(terms))
+            self.__pending_lines.append(sum(1 for line in record['lyrics'].splitlines() if line.strip()))
+            self.__pending_albums.append(album_id)
+            added += 1
+
+        return added
+
+    def save(self, path=None):
+        """
+        Saves the corpus to a .npz file (replacing it atomically), to be loaded with LyricsCorpus(path).
+
+        Keyword Arguments:
+            path {str} -- The path of the .npz file (default: {None}, meaning the path the corpus was created with)
+        """
+
+        path = path or self.path
+        self.__consolidate()
+        metadata = json.dumps({
+            'terms': self.terms, 'artists': self.artists, 'albums': self.albums, 'songs': self.songs
+        }, ensure_ascii=False).encode('utf-8')
+
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(
+                f,
+                metadata=np.frombuffer(metadata, dtype=np.uint8),
+                tokens=self.tokens,
+                song_offsets=self.song_offsets,
+                song_lines=self.song_lines,
+                song_albums=self.song_albums,
+                album_artists=self.album_artists,
+                term_counts=self.term_counts,
+                document_frequencies=self.document_frequencies
+            )
+        os.replace(path + '.tmp', path)
+
+    def get_stats(self):
+        """
+        Returns a dict with the size of the corpus.
+
+        Returns:
+            [dict] -- A dict with the amount of artists, albums, songs, words (i.e. tokens), lines and distinct terms
+        """
+
+        self.__consolidate()
+
+        return {
+            'artists': len(self.artists),
+            'albums': len(self.albums),
+            'songs': len(self.songs),
+            'words': int(self.tokens.size),
+            'lines': int(self.song_lines.sum()),
+            'vocabulary': len(self.terms)
+        }
+
+    def get_term_frequencies(self, limit=None):
+        """
+        Returns the most frequent terms with their frequencies (the amount of occurrences) and document frequencies
+        (the amount of songs containing them).
+
+        Keyword Arguments:
+            limit {int} -- Maximum amount of terms (default: {None}, meaning all of them)
+
+        Returns:
+            [list] -- A list of (term, frequency, document frequency) tuples, sorted by decreasing frequency
+        """
+
+        self.__consolidate()
+        order = _top_indexes(self.term_counts, limit)
+
+        return [(self.terms[term_id], int(self.term_counts[term_id]), int(self.document_frequencies[term_id])) for term_id in order]
+
+    def get_group_stats(self, by='album'):
+        """
+        Returns the aggregates of each album or artist: songs, words, lines, distinct terms and mean words per song.
+
+        Keyword Arguments:
+            by {str} -- 'album' or 'artist' (default: {'album'})
+
+        Raises:
+            ValueError: Exception raised when the group is not 'album' or 'artist'
+
+        Returns:
+            [list] -- A list of dict with the name (and the artist, for albums) of each group and its aggregates
+        """
+
+        if by not in GROUPS[1:]:
+            raise ValueError('Stats can be grouped by album or artist, not by "{}"'.format(by))
+
+        self.__consolidate()
+        song_groups, groups_count = self.__get_song_groups(by)
+        songs = np.bincount(song_groups, minlength=groups_count)
+        words = np.bincount(song_groups, weights=np.diff(self.song_offsets), minlength=groups_count).astype(np.int64)
+        lines = np.bincount(song_groups, weights=self.song_lines, minlength=groups_count).astype(np.int64)
+        group_terms, _ = self.__get_group_terms(song_groups)
+        distinct_terms = np.bincount(group_terms // max(len(self.terms), 1), minlength=groups_count)
+
+        stats = []
+        for group_id in range(groups_count):
+            group_stats = {
+                'songs': int(songs[group_id]),
+                'words': int(words[group_id]),
+                'lines': int(lines[group_id]),
+                'distinct_terms': int(distinct_terms[group_id]),
+                'words_per_song': float(words[group_id] / songs[group_id]) if songs[group_id] else 0.0
+            }
+            if by == 'album':
+                group_stats = dict(artist=self.artists[self.album_artists[group_id]], album=self.albums[group_id], **group_stats)
+            else:
+                group_stats = dict(artist=self.artists[group_id], **group_stats)
+            stats.append(group_stats)
+
+        return stats
+
+    def get_tf_idf(self, by='song', limit=10):
+        """
+        Returns the terms with the highest TF-IDF of each song, album or artist, i.e. the terms frequent in a document
+        (the lyrics of the song, album or artist) but rare in the others: tf is the frequency of the term in the document
+        divided by the length of the document, idf is log(documents / documents containing the term).
+
+        Keyword Arguments:
+            by {str} -- 'song', 'album' or 'artist' (default: {'song'})
+            limit {int} -- Maximum amount of terms of each document (default: {10})
+
+        Raises:
+            ValueError: Exception raised when the group is not 'song', 'album' or 'artist'
+
+        Returns:
+            [list] -- A list (one item per document, in the order they were added) of lists of (term, score) tuples,
+                      sorted by decreasing score
+        """
+
+        if by not in GROUPS:
+            raise ValueError('TF-IDF can be computed by song, album or artist, not by "{}"'.format(by))
+
+        self.__consolidate()
+        vocabulary_size = max(len(self.terms), 1)
+        song_groups, groups_count = self.__get_song_groups(by)
+        group_terms, counts = self.__get_group_terms(song_groups)
+        documents, terms = np.divmod(group_terms, vocabulary_size)
+        if by == 'song':
+            document_frequencies = self.document_frequencies
+        else:
+            document_frequencies = np.bincount(terms, minlength=vocabulary_size)
+        lengths = np.bincount(documents, weights=counts, minlength=groups_count)
+        scores = counts / lengths[documents] * np.log(groups_count / document_frequencies[terms])
+
+        # Sort by document, then by decreasing score, and keep the first terms of each document
+        order = np.lexsort((-scores, documents))
+        documents, terms, scores = documents[order], terms[order], scores[order]
+        starts = np.searchsorted(documents, np.arange(groups_count + 1))
+
+        return [
+            [(self.terms[term_id], float(score)) for term_id, score in zip(terms[start:end], scores[start:end])]
+            for start, end in zip(starts[:-1], np.minimum(starts[1:], starts[:-1] + limit))
+        ]
+
+    def get_ngram_counts(self, n=2, limit=20):
+        """
+        Returns the most frequent n-grams, i.e. sequences of n terms within the lyrics of the same song.
+
+        Keyword Arguments:
+            n {int} -- The amount of terms of the n-grams (default: {2})
+            limit {int} -- Maximum amount of n-grams (default: {20})
+
+        Returns:
+            [list] -- A list of (n-gram, count) tuples, where n-grams are tuples of str, sorted by decreasing count
+        """
+
+        self.__consolidate()
+        # The positions where an n-gram starts without crossing the end of its song
+        token_songs = np.repeat(np.arange(len(self.songs)), np.diff(self.song_offsets))
+        starts = np.flatnonzero(token_songs[:token_songs.size - n + 1] == token_songs[n - 1:]) if token_songs.size >= n else np.zeros(0, dtype=np.int64)
+        columns = [self.tokens[starts + offset].astype(np.int64) for offset in range(n)]
+
+        vocabulary_size = max(len(self.terms), 1)
+        if vocabulary_size ** n < 2 ** 63:
+            # Each n-gram is encoded as a single integer, much faster to count than rows
+            keys = np.zeros(starts.size, dtype=np.int64)
+            for column in columns:
+                keys = keys * vocabulary_size + column
+            ngrams, counts = np.unique(keys, return_counts=True)
+            order = _top_indexes(counts, limit)
+            decoded = []
+            for key in ngrams[order]:
+                ngram = []
+                for _ in range(n):
+                    key, term_id = divmod(int(key), vocabulary_size)
+                    ngram.append(self.terms[term_id])
+                decoded.append(tuple(reversed(ngram)))
+        else:
+            ngrams, counts = np.unique(np.stack(columns, axis=1), axis=0, return_counts=True)
+            order = _top_indexes(counts, limit)
+            decoded = [tuple(self.terms[term_id] for term_id in ngram) for ngram in ngrams[order]]
+
+        return list(zip(decoded, (int(count) for count in counts[order])))
+
+    def __consolidate(self):
+        """Append the songs added since the last consolidation to the arrays, updating term and document frequencies."""
+
+        if not self.__pending_lengths:
+            return
+
+        new_tokens = np.frombuffer(self.__pending_tokens, dtype=np.uint32).copy()
+        new_lengths = np.frombuffer(self.__pending_lengths, dtype=np.int64)
+        vocabulary_size = len(self.terms)
+
+        self.term_counts = np.concatenate([self.term_counts, np.zeros(vocabulary_size - self.term_counts.size, dtype=np.int64)])
+        self.term_counts += np.bincount(new_tokens, minlength=vocabulary_size)
+        # A term is counted once per song containing it
+        new_songs = np.repeat(np.arange(new_lengths.size, dtype=np.int64), new_lengths)
+        song_terms = np.unique(new_songs * vocabulary_size + new_tokens)
+        self.document_frequencies = np.concatenate([
+            self.document_frequencies, np.zeros(vocabulary_size - self.document_frequencies.size, dtype=np.int64)
+        ])
+        self.document_frequencies += np.bincount(song_terms % max(vocabulary_size, 1), minlength=vocabulary_size)
+
+        self.tokens = np.concatenate([self.tokens, new_tokens])
+        self.song_offsets = np.concatenate([self.song_offsets, self.song_offsets[-1] + np.cumsum(new_lengths)])
+        self.song_lines = np.concatenate([self.song_lines, np.frombuffer(self.__pending_lines, dtype=np.int32)])
+        self.song_albums = np.concatenate([self.song_albums, np.frombuffer(self.__pending_albums, dtype=np.int32)])
+        self.album_artists = np.concatenate([self.album_artists, np.frombuffer(self.__pending_album_artists, dtype=np.int32)])
+        self.__pending_tokens = array('I')
+        self.__pending_lengths = array('q')
+        self.__pending_lines = array('i')
+        self.__pending_albums = array('i')
+        self.__pending_album_artists = array('i')
+
+    def __get_song_groups(self, by):
+        """Returns the group (song, album or artist) id of each song and the amount of groups."""
+
+        if by == 'song':
+            return np.arange(len(self.songs)), len(self.songs)
+        if by == 'album':
+            return self.song_albums, len(self.albums)
+
+        return self.album_artists[self.song_albums], len(self.artists)
+
+    def __get_group_terms(self, song_groups):
+        """Returns the distinct (group, term) pairs, encoded as group * vocabulary size + term, and their counts."""
+
+        token_groups = np.repeat(song_groups.astype(np.int64), np.diff(self.song_offsets))
+
+        return np.unique(token_groups * max(len(self.terms), 1) + self.tokens, return_counts=True)
+
+    def __load(self, path):
+        """Load a corpus saved with save()."""
+
+        with np.load(path) as data:
+            metadata = json.loads(data['metadata'].tobytes().decode('utf-8'))
+            self.tokens = data['tokens']
+            self.song_offsets = data['song_offsets']
+            self.song_lines = data['song_lines']
+            self.song_albums = data['song_albums']
+            self.album_artists = data['album_artists']
+            self.term_counts = data['term_counts']
+            self.document_frequencies = data['document_frequencies']
+
+        self.terms = metadata['terms']
+        self.term_ids = {term: term_id for term_id, term in enumerate(self.terms)}
+        self.artists = metadata['artists']
+        self.__artist_ids = {artist: artist_id for artist_id, artist in enumerate(self.artists)}
+        self.albums = metadata['albums']
+        self.__album_ids = {(int(self.album_artists[album_id]), album): album_id for album_id, album in enumerate(self.albums)}
+        self.songs = [tuple(song) for song in metadata['songs']]
+        self.__song_keys = {
+            (self.artists[self.album_artists[album_id]], self.albums[album_id], track_no)
+            for (_, track_no), album_id in zip(self.songs, self.song_albums.tolist())
+        }
+
+
+def _top_indexes(values, limit):
+    """Returns the indexes of the highest values, sorted by decreasing value (ties by increasing index)."""
+
+    if limit is None or limit >= values.size:
+        return np.argsort(-values, kind='stable')
+    top = np.argpartition(-values, limit)[:limit]
+
+    return top[np.lexsort((top, -values[top]))]
@@ -0,0 +1,134 @@
+import threading
+import time
+
+from bisect import bisect_left
+from metalparser.libs.darklyrics_utils import sanitize_artist_name
+
+
+class ArtistAutocomplete:
+    """
+    Completes artists' names from an in-memory prefix index, built once from the artist index pages of DarkLyrics.com.
+    The index is a sorted array of names cleaned as in artist URLs (so 'motley', 'Mötley' and 'mötley c' all match
+    'Mötley Crüe'): the matches of a prefix are a contiguous range of the array, found by binary search.
+    The index can be rebuilt periodically in a background thread, while completions keep being served by the previous one.
+
+    Parameters
+    ----------
+    api : DarkLyricsApi
+        The API object used for fetching the artist index pages.
+
+    Methods
+    -------
+    complete(self, prefix, limit=10)
+        Returns the artists whose names start with a prefix.
+
+    refresh(self)
+        Builds the index from the artist index pages, replacing the current one.
+
+    start_refresh(self, interval=86400)
+        Rebuilds the index periodically in a background thread.
+
+    stop_refresh(self)
+        Stops the background refresh.
+
+    get_stats(self)
+        Returns a dict with the size of the index and the time of the last refresh.
+    """
+
+    def __init__(self, api):
+        self.api = api
+        self.__index = None
+        self.__refreshed_at = None
+        self.__lock = threading.Lock()
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def complete(self, prefix, limit=10):
+        """
+        Returns the artists whose names start with a prefix, in alphabetical order of the cleaned names
+        (so an exact match comes first). The index is built at the first call, if not done yet.
+
+        Arguments:
+            prefix {str} -- The beginning of the artist's name, as typed by the user
+
+        Keyword Arguments:
+            limit {int} -- Maximum amount of artists (default: {10})
+
+        Returns:
+            [list] -- A list of str containing the artists' names
+        """
+
+        index = self.__index
+        if index is None:
+            with self.__lock:
+                if self.__index is None:
+                    self.refresh()
+                index = self.__index
+
+        keys, names = index
+        prefix = sanitize_artist_name(prefix)
+        if not prefix:
+            return []
+
+        start = bisect_left(keys, prefix)
+        end = start
+        # Only the first matches are needed, so they are checked one by one instead of searching the end of the range
+        while end < len(keys) and end - start < limit and keys[end].startswith(prefix):
+            end += 1
+
+        return names[start:end]
+
+    def refresh(self):
+        """Builds the index from the artist index pages (fetched with the bulk priority), replacing the current one."""
+
+        entries = sorted(set((sanitize_artist_name(artist), artist) for artist in self.api.get_artists_list()))
+        # The index is replaced at once, so concurrent completions see either the old index or the new one
+        self.__index = ([key for key, _ in entries], [artist for _, artist in entries])
+        self.__refreshed_at = time.time()
+
+    def start_refresh(self, interval=86400):
+        """
+        Rebuilds the index periodically in a background thread. When a refresh fails, the previous index is kept.
+
+        Keyword Arguments:
+            interval {float} -- Seconds between two refreshes (default: {86400})
+        """
+
+        with self.__lock:
+            if self.__thread is None:
+                self.__stop.clear()
+                self.__thread = threading.Thread(target=self.__refresh_periodically, args=(interval,), daemon=True)
+                self.__thread.start()
+
+    def stop_refresh(self):
+        """Stops the background refresh, waiting for the refresh in progress (if any)."""
+
+        with self.__lock:
+            thread = self.__thread
+            self.__thread = None
+        if thread is not None:
+            self.__stop.set()
+            thread.join()
+
+    def get_stats(self):
+        """
+        Returns a dict with the size of the index and the time of the last refresh.
+
+        Returns:
+            [dict] -- A dict with artists (None when the index is not built yet) and refreshed_at (a Unix timestamp)
+        """
+
+        index = self.__index
+
+        return {'artists': None if index is None else len(index[0]), 'refreshed_at': self.__refreshed_at}
+
+    def __refresh_periodically(self, interval):
+        """Refresh the index now and then every interval seconds, until stopped."""
+
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                self.api.logger.error('Refresh of the artists index failed: {}'.format(str(e)))
+            if self.__stop.wait(interval):
+                return
@@ -1,7 +1,7 @@
 import re
 import string
+import unicodedata
 
-from bs4 import BeautifulSoup
 from metalparser.common.scraping import ScrapingAgent
 from metalparser.common.exceptions import ArtistNotFoundException, LyricsNotFoundException, SongsNotFoundException
 
@@ -13,7 +13,7 @@ class DarkLyricsHelper:
     Attributes
     ----------
     BASE_URL : str
-        DarkLyrics.com base URL
+        DarkLyrics.com base URL (or the base URL of a local stand-in, e.g. in load tests)
 
     scraping_agent : ScrapingAgent
         The agent taking hand of HTTP requests
@@ -23,6 +23,9 @@ class DarkLyricsHelper:
     get_base_url(self)
         Returns DarkLyrics.com base URL.
 
+    get_artist_url(self, artist)
+        Build an URL leading to the page of the specified artist.
+
     get_artist_page(self, artist)
         Returns a DarkLyrics.com page related to an artist in form of a BeautifulSoup object.
 
@@ -32,9 +35,18 @@ class DarkLyricsHelper:
     get_albums_info_from_artist_page(self, artist_page, all_info=False):
         Given the artist page, returns infos about the albums.
 
+    get_discography_from_artist_page(self, artist_page)
+        Given the artist page, returns infos and track titles of the albums.
+
+    get_discography_from_records(self, records)
+        Given the songs info and lyrics of an artist, returns infos and track titles of the albums.
+
     get_albums_info_from_url(self, url):
         Returns album info given the album's URL.
 
+    get_search_url(self, song, artist)
+        Build an URL with a query usable by DarkLyrics.com internal search engine.
+
     get_lyrics_url_by_song(self, song, artist)
         Given a song title and the artist, returns the link related to the lyrics.
 
@@ -45,9 +57,20 @@ class DarkLyricsHelper:
         Given an URL related to a song, returns the lyrics.
     """
 
-    def __init__(self, use_cache):
-        self.BASE_URL = 'http://www.darklyrics.com/'
-        self.scraping_agent = ScrapingAgent(use_cache=use_cache)
+    def __init__(self, use_cache, requests_per_minute=40, wait_time=3, timeout=(5, 30), max_retries=3, memory_cache_size=0,
+                 offline=False, cache_only=False, cache_path=None, base_url='http://www.darklyrics.com/'):
+        self.BASE_URL = base_url
+        self.scraping_agent = ScrapingAgent(
+            use_cache=use_cache,
+            requests_per_minute=requests_per_minute,
+            wait_time=wait_time,
+            timeout=timeout,
+            max_retries=max_retries,
+            memory_cache_size=memory_cache_size,
+            offline=offline,
+            cache_only=cache_only,
+            cache_path=cache_path
+        )
 
     def get_base_url(self):
         """
@@ -59,6 +82,25 @@ class DarkLyricsHelper:
 
         return self.BASE_URL
 
+    def get_artist_url(self, artist):
+        """
+        Build an URL leading to the page of the specified artist.
+
+        Arguments:
+            artist {str} -- The artist's name
+
+        Returns:
+            [str] -- The URL of the artist page
+        """
+
+        artist = self.__sanitize_artist_url(artist)
+        if artist[0].isdigit():
+            index = '19'
+        else:
+            index = artist[0]
+
+        return self.BASE_URL + index + '/' + artist + '.html'
+
     def get_artist_page(self, artist):
         """
         Returns a DarkLyrics.com page related to an artist in form of a BeautifulSoup object.
@@ -73,7 +115,7 @@ class DarkLyricsHelper:
             [BeautifulSoup] -- Page related to an artist in form of a BeautifulSoup object
         """
 
-        url = self.__get_artist_url(artist)
+        url = self.get_artist_url(artist)
         artist_page = self.scraping_agent.get_page_from_url(url)
 
         if 'not Found' in artist_page.title.string:
@@ -100,6 +142,8 @@ class DarkLyricsHelper:
             [list] -- List of strings containing all the lyrics URLs related to an artist or an album
         """
 
+        from bs4 import BeautifulSoup
+
         links = None
         artist_page = self.get_artist_page(artist)
 
@@ -137,20 +181,62 @@ class DarkLyricsHelper:
         albums_list = []
 
         for line in album_headlines:
-            album_line_parts = line.text.split('"')
-            is_valid_album_type = any(elem in album_line_parts[0].lower() for elem in ['album', 'ep', 'demo'])
-            if(len(album_line_parts) > 1 and is_valid_album_type):
-                if title_only is False:
-                    albums_list.append({
-                        'title': album_line_parts[1],
-                        'type': album_line_parts[0].replace(':', '').strip(),
-                        'release_year': line.text.split('"')[2].replace(')', '').replace('(', '').strip()
-                    })
-                else:
-                    albums_list.append(line.text.split('"')[1])
+            album_info = parse_album_headline(line.text)
+            if album_info is not None:
+                albums_list.append(album_info['title'] if title_only else album_info)
 
         return albums_list
 
+    def get_discography_from_artist_page(self, artist_page):
+        """
+        Given the artist page, returns infos and track titles of the albums.
+
+        Arguments:
+            artist_page {BeautifulSoup} -- The artist page in BeautifulSoup format.
+
+        Returns:
+            [list] -- List of dict with title, type, release year and the list of track titles of each album
+        """
+
+        discography = []
+
+        for album_tag in artist_page.find_all('div', class_='album'):
+            headline = album_tag.find('h2')
+            album_info = parse_album_headline(headline.text) if headline is not None else None
+            if album_info is not None:
+                album_info['tracks'] = [link.text for link in album_tag.find_all('a') if '/lyrics' in link.attrs.get('href', '')]
+                discography.append(album_info)
+
+        return discography
+
+    def get_discography_from_records(self, records):
+        """
+        Given the songs info and lyrics of an artist, returns infos and track titles of the albums,
+        in the same format returned by get_discography_from_artist_page().
+
+        Arguments:
+            records {list} -- List of dict (or SongRecord) as returned by DarkLyricsApi.get_albums_info_and_lyrics_by_artist()
+
+        Returns:
+            [list] -- List of dict with title, type, release year and the list of track titles of each album
+        """
+
+        discography = {}
+
+        for record in records:
+            album_info = discography.setdefault(record['album'], {
+                'title': record['album'],
+                'type': record['album_type'],
+                'release_year': record['release_year'],
+                'tracks': []
+            })
+            album_info['tracks'].append((record['track_no'], record['title']))
+
+        for album_info in discography.values():
+            album_info['tracks'] = [title for _, title in sorted(album_info['tracks'])]
+
+        return list(discography.values())
+
     def get_albums_info_from_url(self, url):
         """
         Returns album info given the album's URL.
@@ -166,20 +252,8 @@ class DarkLyricsHelper:
             url = url.replace('../', self.BASE_URL)
 
         album_page = self.scraping_agent.get_page_from_url(url)
-        album_info_text = album_page.select_one('div.albumlyrics > h2').text
-
-        if 'non-album' in album_info_text:
-            return {
-                'title': '',
-                'release_year': '',
-                'type': 'non-album songs'
-            }
-        else:
-            return {
-                'title': album_info_text.split('"')[1],
-                'release_year': album_info_text.split('"')[2].replace(')', '').replace('(', '').strip(),
-                'type': album_info_text.split('"')[0].replace(':', '').strip()
-            }
+
+        return get_album_info_from_page(album_page)
 
     def get_lyrics_url_by_song(self, song, artist):
         """
@@ -196,7 +270,7 @@ class DarkLyricsHelper:
             [str] -- The link related to the lyrics of the specified song
         """
 
-        url = self.__get_search_url(song, artist)
+        url = self.get_search_url(song, artist)
         search_page = self.scraping_agent.get_page_from_url(url)
         sens = search_page.find_all('div', class_='sen')
 
@@ -257,74 +331,29 @@ class DarkLyricsHelper:
 
         song_lyrics = lyrics_div.prettify().split('</h3>')[song_number]
 
-        return self.__sanitize_lyrics(song_lyrics)
-
-    def __sanitize_lyrics(self, lyrics):
-        """Clean the lyrics string."""
-
-        # remove tail
-        sanitized_lyrics = lyrics[:lyrics.find('<h3>')]
-        # Set linebreaks
-        sanitized_lyrics = sanitized_lyrics.replace('<br/>', '')
-        # Remove italic
-        sanitized_lyrics = sanitized_lyrics.replace('</i>', '').replace('<i>', '')
-        # Remove trailing divs
-        sanitized_lyrics = sanitized_lyrics.split('<div')[0]
-        # Remove duplicate blank lines
-        split_lyrics = sanitized_lyrics.splitlines()
-        sanitized_lyrics = ''
-        for line_number in range(len(split_lyrics) - 1):
-            line = split_lyrics[line_number].rstrip()
-            next_line = split_lyrics[line_number + 1].rstrip()
-            last_line = split_lyrics[max(line_number - 1, 0)].rstrip()
-
-            if line != '' or (line == '' and next_line == '' and last_line != ''):
-                sanitized_lyrics = sanitized_lyrics + '\n' + line
-        # Remove starting/ending newlines
-        sanitized_lyrics = sanitized_lyrics[1:-1]
-        # Remove space after newline
-        sanitized_lyrics = sanitized_lyrics.replace('\n ', '\n')
-        # Remove leading and trailing spaces
-        sanitized_lyrics = sanitized_lyrics.strip()
-
-        return sanitized_lyrics
-
-    def __get_search_url(self, song, artist):
-        """Build an URL with a query usable by DarkLyrics.com internal search engine."""
+        return sanitize_lyrics(song_lyrics)
 
-        query = self.__sanitize_search_query(artist + ' ' + song)
-        url = self.BASE_URL + 'search?q=' + query
+    def get_search_url(self, song, artist):
+        """
+        Build an URL with a query usable by DarkLyrics.com internal search engine.
 
-        return url
+        Arguments:
+            song {str} -- The title of the song
+            artist {str} -- The artist's name
 
-    def __get_artist_url(self, artist):
-        """Build an URL leading to the page of the specified artist."""
+        Returns:
+            [str] -- The URL of the search page
+        """
 
-        artist = self.__sanitize_artist_url(artist)
-        if artist[0].isdigit():
-            index = '19'
-        else:
-            index = artist[0]
+        query = self.__sanitize_search_query(artist + ' ' + song)
+        url = self.BASE_URL + 'search?q=' + query
 
-        return self.BASE_URL + index + '/' + artist + '.html'
+        return url
 
     def __sanitize_artist_url(self, artist):
         """Clean a string and make it compatible to a DarkLyrics.com artist URL"""
 
-        # Lowercase
-        artist = artist.lower()
-        # Special cases
-        artist = artist.replace('+\\-', '2').replace('vhäldemar', 'vhaldemar').replace('øscillatör', 'scillatr').replace('zamieć', 'zamiec')
-        # Replace nordic chars with another letter
-        artist = artist.replace('ø', 'o').replace('ö', 'o').replace('ü', 'u').replace('å', 'a').replace(u'æ', u'e')
-        # Remove punctuation signs
-        artist = re.sub(r'[' + re.escape(string.punctuation) + ']', '', artist)
-        # Remove other special chars
-        artist = re.sub(r'[äæøáéíóúýćïëöüêčďěňřšťžėūãõ]', '', artist)
-        # Remove whitespaces
-        artist = re.sub(r'[' + re.escape(string.whitespace) + ']', '', artist)
-
-        return artist
+        return sanitize_artist_name(artist)
 
     def __sanitize_search_query(self, query):
         """Clean a string and make it compatible to a DarkLyrics.com search engine query"""
@@ -343,3 +372,269 @@ class DarkLyricsHelper:
         query = re.sub(r'[' + re.escape(string.whitespace) + ']', '+', query)
 
         return query
+
+
+def sanitize_artist_name(artist):
+    """
+    Clean an artist's name the way DarkLyrics.com does for artist URLs (e.g. 'Mötley Crüe' -> 'motleycrue').
+
+    Arguments:
+        artist {str} -- The artist's name
+
+    Returns:
+        [str] -- The cleaned name, lowercase, without punctuation, diacritics and whitespaces
+    """
+
+    # Lowercase
+    artist = artist.lower()
+    # Special cases
+    artist = artist.replace('+\\-', '2').replace('vhäldemar', 'vhaldemar').replace('øscillatör', 'scillatr').replace('zamieć', 'zamiec')
+    # Replace nordic chars with another letter
+    artist = artist.replace('ø', 'o').replace('ö', 'o').replace('ü', 'u').replace('å', 'a').replace(u'æ', u'e')
+    # Remove punctuation signs
+    artist = re.sub(r'[' + re.escape(string.punctuation) + ']', '', artist)
+    # Remove other special chars
+    artist = re.sub(r'[äæøáéíóúýćïëöüêčďěňřšťžėūãõ]', '', artist)
+    # Remove whitespaces
+    artist = re.sub(r'[' + re.escape(string.whitespace) + ']', '', artist)
+
+    return artist
+
+
+_VERSION_WORDS = (
+    r'live|remaster(?:ed)?|demo|version|edit|mix|remix|re-?recorded|acoustic|unplugged|orchestral|bonus|single|radio|mono|stereo'
+)
+
+# Trailing annotations of a version of a song, e.g. 'Wrathchild (Live)', 'Wrathchild [2015 Remaster]' or 'Wrathchild - Demo'
+_VERSION_ANNOTATION = re.compile(
+    r'\s*(?:[\(\[][^\(\)\[\]]*\b(?:' + _VERSION_WORDS + r')\b[^\(\)\[\]]*[\)\]]|\s-\s.*\b(?:' + _VERSION_WORDS + r')\b.*)$'
+)
+
+# Titles shared by unrelated songs, never considered duplicates
+_GENERIC_TITLES = frozenset(['intro', 'outro', 'interlude', 'prologue', 'epilogue', 'untitled', 'instrumental', 'hidden track'])
+
+
+def normalize_song_title(title):
+    """
+    Clean a song title so that the versions of the same song match (e.g. 'Wrathchild (Live)' -> 'wrathchild'):
+    lowercase, without diacritics, punctuation and trailing version annotations (live, remastered, demo, ...).
+
+    Arguments:
+        title {str} -- The title of the song
+
+    Returns:
+        [str] -- The normalized title
+    """
+
+    title = unicodedata.normalize('NFKD', title.lower())
+    title = ''.join(char for char in title if not unicodedata.combining(char))
+    previous_title = None
+    while title != previous_title:
+        previous_title = title
+        title = _VERSION_ANNOTATION.sub('', title)
+    title = re.sub(r'[' + re.escape(string.punctuation) + ']', '', title)
+
+    return ' '.join(title.split())
+
+
+def find_duplicate_tracks(albums):
+    """
+    Finds the tracks of a discography which are versions of songs already listed, by normalized title (see
+    normalize_song_title()). Albums are listed by release date on the artist page, so the first occurrence of a song,
+    i.e. the original one, is the canonical version; the ones on later live albums, compilations and re-releases are
+    duplicates. Generic titles (e.g. 'Intro') are never considered duplicates.
+
+    Arguments:
+        albums {list} -- A list of dict with the songs (list of (title, href) tuples) of each album, as returned by parse_artist_page()
+
+    Returns:
+        [dict] -- A dict href of a duplicate track -> href of its canonical version
+    """
+
+    canonical_hrefs = {}
+    duplicates = {}
+
+    for album in albums:
+        for title, href in album['songs']:
+            normalized_title = normalize_song_title(title)
+            if not normalized_title or normalized_title in _GENERIC_TITLES:
+                continue
+            canonical_href = canonical_hrefs.setdefault(normalized_title, href)
+            if canonical_href != href:
+                duplicates[href] = canonical_href
+
+    return duplicates
+
+
+def parse_album_headline(headline):
+    """
+    Parse an album headline (e.g. 'album: "Piece Of Mind" (1983)').
+
+    Arguments:
+        headline {str} -- The text of the headline
+
+    Returns:
+        [dict or None] -- A dict with title, type and release year of the album, or None if the headline is not about an album
+    """
+
+    album_line_parts = headline.split('"')
+    is_valid_album_type = any(elem in album_line_parts[0].lower() for elem in ['album', 'ep', 'demo'])
+
+    if len(album_line_parts) > 1 and is_valid_album_type:
+        return {
+            'title': album_line_parts[1],
+            'type': album_line_parts[0].replace(':', '').strip(),
+            'release_year': album_line_parts[2].replace(')', '').replace('(', '').strip() if len(album_line_parts) > 2 else ''
+        }
+
+    return None
+
+
+def get_album_info_from_page(album_page):
+    """
+    Returns album info given the album page.
+
+    Arguments:
+        album_page {BeautifulSoup} -- The album page in BeautifulSoup format
+
+    Returns:
+        [dict] -- A dict with the following album info: title, release year and type (album, EP).
+    """
+
+    album_info_text = album_page.select_one('div.albumlyrics > h2').text
+
+    if 'non-album' in album_info_text:
+        return {
+            'title': '',
+            'release_year': '',
+            'type': 'non-album songs'
+        }
+    else:
+        return {
+            'title': album_info_text.split('"')[1],
+            'release_year': album_info_text.split('"')[2].replace(')', '').replace('(', '').strip(),
+            'type': album_info_text.split('"')[0].replace(':', '').strip()
+        }
+
+
+def sanitize_lyrics(lyrics):
+    """
+    Clean the lyrics string.
+
+    Arguments:
+        lyrics {str} -- The prettified HTML of a song's lyrics
+
+    Returns:
+        [str] -- The lyrics as plain text
+    """
+
+    # remove tail
+    sanitized_lyrics = lyrics[:lyrics.find('<h3>')]
+    # Set linebreaks
+    sanitized_lyrics = sanitized_lyrics.replace('<br/>', '')
+    # Remove italic
+    sanitized_lyrics = sanitized_lyrics.replace('</i>', '').replace('<i>', '')
+    # Remove trailing divs
+    sanitized_lyrics = sanitized_lyrics.split('<div')[0]
+    # Remove duplicate blank lines
+    split_lyrics = sanitized_lyrics.splitlines()
+    sanitized_lyrics = ''
+    for line_number in range(len(split_lyrics) - 1):
+        line = split_lyrics[line_number].rstrip()
+        next_line = split_lyrics[line_number + 1].rstrip()
+        last_line = split_lyrics[max(line_number - 1, 0)].rstrip()
+
+        if line != '' or (line == '' and next_line == '' and last_line != ''):
+            sanitized_lyrics = sanitized_lyrics + '\n' + line
+    # Remove starting/ending newlines
+    sanitized_lyrics = sanitized_lyrics[1:-1]
+    # Remove space after newline
+    sanitized_lyrics = sanitized_lyrics.replace('\n ', '\n')
+    # Remove leading and trailing spaces
+    sanitized_lyrics = sanitized_lyrics.strip()
+
+    return sanitized_lyrics
+
+
+def parse_artist_page(content):
+    """
+    Extracts the albums and the songs links from the raw content of an artist page.
+    Being a module-level function returning plain data, it can run in a worker process.
+
+    Arguments:
+        content {str or bytes} -- The content of the artist page (decoded, or raw bytes)
+
+    Returns:
+        [list or None] -- A list of dict with title, type, release year and songs (list of (title, href) tuples) of each album,
+                          or None if the page is a "not found" page
+    """
+
+    from bs4 import BeautifulSoup
+
+    artist_page = BeautifulSoup(content, 'html.parser')
+    if artist_page.title is None or 'not Found' in artist_page.title.string:
+        return None
+
+    albums = []
+    for album_tag in artist_page.find_all('div', class_='album'):
+        headline = album_tag.find('h2')
+        album_info = parse_album_headline(headline.text) if headline is not None else None
+        if album_info is not None:
+            album_info['songs'] = [
+                (link.text, link.attrs['href']) for link in album_tag.find_all('a') if '/lyrics' in link.attrs.get('href', '')
+            ]
+            albums.append(album_info)
+
+    return albums
+
+
+def parse_album_page(content):
+    """
+    Extracts the album info and the lyrics of all the songs from the raw content of an album page.
+    Being a module-level function returning plain data (no BeautifulSoup trees), it can run in a worker process.
+
+    Arguments:
+        content {str or bytes} -- The content of the album page (decoded, or raw bytes)
+
+    Raises:
+        LyricsNotFoundException: Exception raised when no lyrics div is found
+
+    Returns:
+        [dict] -- A dict with the album info (title, release year, type) and the lyrics of the songs by track number
+    """
+
+    from bs4 import BeautifulSoup
+
+    album_page = BeautifulSoup(content, 'html.parser')
+    lyrics_div = album_page.find('div', class_='lyrics')
+
+    if lyrics_div is None:
+        raise LyricsNotFoundException('No lyrics found in the album page.')
+
+    songs_lyrics = lyrics_div.prettify().split('</h3>')
+    album_info = get_album_info_from_page(album_page)
+    album_info['lyrics'] = {song_number: sanitize_lyrics(songs_lyrics[song_number]) for song_number in range(1, len(songs_lyrics))}
+
+    return album_info
+
+
+def parse_search_page(content):
+    """
+    Extracts the first lyrics link from the raw content of a search page, as done by DarkLyricsHelper.get_lyrics_url_by_song().
+
+    Arguments:
+        content {str or bytes} -- The content of the search page (decoded, or raw bytes)
+
+    Returns:
+        [str or None] -- The href of the first lyrics link (relative to DarkLyrics.com base URL), or None if not found
+    """
+
+    from bs4 import BeautifulSoup
+
+    search_page = BeautifulSoup(content, 'html.parser')
+    for sen in search_page.find_all('div', class_='sen'):
+        link = sen.find('a')
+        if link and '#' in link.get('href', ''):
+            return link.get('href')
+
+    return None
@@ -0,0 +1,201 @@
+import csv
+import json
+import os
+
+from abc import ABC, abstractmethod
+
+
+RECORD_FIELDS = ['artist', 'album', 'album_type', 'release_year', 'title', 'track_no', 'lyrics']
+
+
+class RecordsExporter(ABC):
+    """
+    Base class for the exporters streaming song records to a file in chunks.
+    Subclasses implement _write_chunk() and _close(), and can't be instantiated otherwise.
+
+    Parameters
+    ----------
+    path : str
+        The path of the output file.
+
+    chunk_size : int
+        Amount of records buffered before writing them to the file.
+
+    append : bool
+        Boolean defining if the records are appended to an existing file or if the file is overwritten.
+
+    Attributes
+    ----------
+    written_records : int
+        Amount of records written so far.
+
+    Methods
+    -------
+    write(self, records)
+        Buffers the records, writing a chunk to the file when the buffer is full.
+
+    flush(self)
+        Writes the buffered records to the file.
+
+    close(self)
+        Flushes the buffered records and closes the file.
+    """
+
+    def __init__(self, path, chunk_size=1000, append=False):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.append = append
+        self.written_records = 0
+        self._buffer = []
+
+    def write(self, records):
+        """
+        Buffers the records, writing a chunk to the file when the buffer is full.
+
+        Arguments:
+            records {list} -- A list of dict (or SongRecord) as returned by DarkLyricsApi.get_album_info_and_lyrics()
+
+        Returns:
+            [bool] -- True if the buffer has been flushed to the file, False otherwise
+        """
+
+        self._buffer.extend(records)
+        if len(self._buffer) < self.chunk_size:
+            return False
+
+        self.flush()
+
+        return True
+
+    def flush(self):
+        """Writes the buffered records to the file."""
+
+        if self._buffer:
+            self._write_chunk(self._buffer)
+            self.written_records += len(self._buffer)
+            self._buffer = []
+
+    def close(self):
+        """Flushes the buffered records and closes the file."""
+
+        self.flush()
+        self._close()
+
+    @abstractmethod
+    def _write_chunk(self, records):
+        """Writes a chunk of records to the file."""
+
+    @abstractmethod
+    def _close(self):
+        """Closes the file."""
+
+
+class JsonLinesExporter(RecordsExporter):
+    """Exporter writing one JSON object per line."""
+
+    def __init__(self, path, chunk_size=1000, append=False):
+        super().__init__(path, chunk_size, append)
+        self.file = open(path, 'a' if append else 'w', encoding='utf-8')
+
+    def _write_chunk(self, records):
+        self.file.write(''.join(json.dumps(dict(record), ensure_ascii=False) + '\n' for record in records))
+        self.file.flush()
+
+    def _close(self):
+        self.file.close()
+
+
+class CsvExporter(RecordsExporter):
+    """Exporter writing CSV rows. When appending, the header is written only if the file is empty."""
+
+    def __init__(self, path, chunk_size=1000, append=False):
+        super().__init__(path, chunk_size, append)
+        write_header = not append or not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a' if append else 'w', encoding='utf-8', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=RECORD_FIELDS, extrasaction='ignore')
+        if write_header:
+            self.writer.writeheader()
+
+    def _write_chunk(self, records):
+        self.writer.writerows(records)
+        self.file.flush()
+
+    def _close(self):
+        self.file.close()
+
+
+class ParquetExporter(RecordsExporter):
+    """
+    Exporter writing a Parquet file, one row group per chunk.
+    A Parquet file cannot be appended to: when appending to an existing file, a new part file is created next to it.
+    """
+
+    def __init__(self, path, chunk_size=1000, append=False):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError('Parquet export requires pyarrow: pip install metalparser[parquet]')
+
+        super().__init__(self.__get_free_path(path) if append else path, chunk_size, append)
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema([
+            ('artist', pyarrow.string()),
+            ('album', pyarrow.string()),
+            ('album_type', pyarrow.string()),
+            ('release_year', pyarrow.string()),
+            ('title', pyarrow.string()),
+            ('track_no', pyarrow.int64()),
+            ('lyrics', pyarrow.string())
+        ])
+        self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema)
+
+    def _write_chunk(self, records):
+        columns = {field: [record.get(field) for record in records] for field in RECORD_FIELDS}
+        self.writer.write_table(self.pyarrow.Table.from_pydict(columns, schema=self.schema))
+
+    def _close(self):
+        self.writer.close()
+
+    def __get_free_path(self, path):
+        """Returns the path itself or, if it already exists, the first free part file path."""
+
+        root, extension = os.path.splitext(path)
+        part = 0
+        while os.path.exists(path):
+            part += 1
+            path = '{}.part-{}{}'.format(root, part, extension or '.parquet')
+
+        return path
+
+
+EXPORTERS = {
+    'jsonl': JsonLinesExporter,
+    'csv': CsvExporter,
+    'parquet': ParquetExporter
+}
+
+
+def get_exporter(output_format, path, chunk_size=1000, append=False):
+    """
+    Returns the exporter corresponding to the specified format.
+
+    Arguments:
+        output_format {str} -- One among 'jsonl', 'csv' and 'parquet'
+        path {str} -- The path of the output file
+
+    Keyword Arguments:
+        chunk_size {int} -- Amount of records written at once (default: {1000})
+        append {bool} -- Append to the file instead of overwriting it (default: {False})
+
+    Raises:
+        ValueError: Exception raised when the format is not supported
+
+    Returns:
+        [RecordsExporter] -- The exporter writing to the specified path
+    """
+
+    if output_format not in EXPORTERS:
+        raise ValueError('Unsupported output format "{}". Choose among: {}'.format(output_format, ', '.join(EXPORTERS)))
+
+    return EXPORTERS[output_format](path, chunk_size=chunk_size, append=append)
@@ -0,0 +1,224 @@
+import os
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from metalparser.common.exceptions import ArtistNotFoundException, LyricsNotFoundException
+from metalparser.libs.darklyrics_utils import parse_album_page, parse_artist_page
+
+
+class CrawlPipeline:
+    """
+    A two-stage pipeline for crawling many artists: pages are fetched and decoded by I/O threads (sharing the rate limit and
+    the cache of the API object), while HTML parsing, which is CPU-bound and holds the GIL, runs on a pool of worker processes.
+    Pages are sent to the workers in batches to amortize the inter-process communication, and workers return plain data
+    (album info and lyrics) instead of BeautifulSoup trees.
+
+    Parameters
+    ----------
+    api : DarkLyricsApi
+        The API object used for fetching pages.
+
+    processes : int
+        Amount of worker processes parsing the pages (default: the amount of CPUs).
+
+    fetch_workers : int
+        Amount of threads fetching the pages.
+
+    batch_size : int
+        Amount of pages parsed by a worker process at once.
+
+    Methods
+    -------
+    get_albums_info_and_lyrics_by_artists(self, artists)
+        Yields, for each artist, a list of dict containing info and lyrics of all the songs related to the artist.
+
+    get_albums_info_and_lyrics_by_artist(self, artist)
+        Returns a list of dict containing info and lyrics of all the songs related to an artist.
+
+    close(self)
+        Shuts the threads and the worker processes down.
+    """
+
+    def __init__(self, api, processes=None, fetch_workers=2, batch_size=8):
+        self.api = api
+        self.batch_size = batch_size
+        self.parse_executor = ProcessPoolExecutor(max_workers=processes)
+        self.fetch_executor = ThreadPoolExecutor(max_workers=fetch_workers)
+        self.artists_per_round = batch_size * (processes or os.cpu_count() or 1) * 4
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_albums_info_and_lyrics_by_artists(self, artists):
+        """
+        Yields, for each artist, a list of dict containing info and lyrics of all the songs related to the artist
+        (the same result of DarkLyricsApi.get_albums_info_and_lyrics_by_artist()), in the same order of the artists.
+        Artists are processed in rounds, so memory usage doesn't depend on the amount of artists.
+
+        Arguments:
+            artists {iterable} -- The artists' names
+
+        Returns:
+            [generator] -- A generator of (artist, list of dict) tuples
+        """
+
+        artists_round = []
+        for artist in artists:
+            artists_round.append(artist)
+            if len(artists_round) == self.artists_per_round:
+                yield from self.__process_artists(artists_round)
+                artists_round = []
+
+        if artists_round:
+            yield from self.__process_artists(artists_round)
+
+    def get_albums_info_and_lyrics_by_artist(self, artist):
+        """
+        Returns a list of dict containing info and lyrics of all the songs related to an artist.
+
+        Arguments:
+            artist {str} -- The artist's name
+
+        Returns:
+            [list] -- A list of dict (or SongRecord, when using compact records) containing info and lyrics of the songs
+        """
+
+        for _, songs in self.get_albums_info_and_lyrics_by_artists([artist]):
+            return songs
+
+    def close(self):
+        """Shuts the threads and the worker processes down."""
+
+        self.fetch_executor.shutdown()
+        self.parse_executor.shutdown()
+
+    def __process_artists(self, artists):
+        """Fetch and parse the pages of a round of artists, yielding their songs."""
+
+        helper = self.api.helper
+        artists_urls = [helper.get_artist_url(artist) for artist in artists]
+        artists_pages = self.__fetch_and_parse(artists_urls, parse_artist_page)
+
+        albums_urls = []
+        for artist, artist_url in zip(artists, artists_urls):
+            artist_page = artists_pages[artist_url]
+            if artist_page is None:
+                artists_pages[artist_url] = ArtistNotFoundException(
+                    'Artist page for "{}" not found at URL: {}. Is it on darklyrics.com?'.format(artist.title(), artist_url)
+                )
+            elif not isinstance(artist_page, Exception):
+                albums_urls += [self.__get_album_url(album) for album in artist_page if album['songs']]
+        albums_pages = self.__fetch_and_parse(list(dict.fromkeys(albums_urls)), parse_album_page)
+
+        for artist, artist_url in zip(artists, artists_urls):
+            artist_page = artists_pages[artist_url]
+            if isinstance(artist_page, Exception):
+                self.api.add_failure(artist_page, artist=artist)
+                yield artist, []
+            else:
+                yield artist, self.__get_songs(artist, artist_page, albums_pages)
+
+    def __fetch_and_parse(self, urls, parse_function):
+        """
+        Fetch the pages on the I/O threads and parse them on the worker processes, in batches, as soon as they are fetched.
+        Returns a dict URL -> parsed page (or the exception raised while fetching or parsing it).
+        """
+
+        fetches = {self.fetch_executor.submit(self.__fetch_page, url): url for url in urls}
+        results = {}
+        parsings = []
+        batch = []
+
+        for fetch in as_completed(fetches):
+            try:
+                batch.append((fetches[fetch], fetch.result()))
+            except Exception as e:
+                results[fetches[fetch]] = e
+                continue
+            if len(batch) == self.batch_size:
+                parsings.append(self.parse_executor.submit(parse_pages, parse_function, batch))
+                batch = []
+        if batch:
+            parsings.append(self.parse_executor.submit(parse_pages, parse_function, batch))
+
+        for parsing in parsings:
+            results.update(parsing.result())
+
+        return results
+
+    def __fetch_page(self, url):
+        """Returns the decoded content of a page, fetched with the bulk priority."""
+
+        scraping_agent = self.api.helper.scraping_agent
+        with scraping_agent.request_priority('bulk'):
+            return scraping_agent.get_text_from_url(url)
+
+    def __get_songs(self, artist, artist_page, albums_pages):
+        """Build the songs info and lyrics of an artist from the parsed artist and album pages."""
+
+        songs = []
+        records_factory = self.api.records_factory
+
+        for album in artist_page:
+            if not album['songs']:
+                continue
+            album_page = albums_pages[self.__get_album_url(album)]
+            # Don't break the entire job because of a single album
+            if isinstance(album_page, Exception):
+                self.api.add_failure(album_page, artist=artist, album=album['title'])
+                continue
+            album_record = None
+            if records_factory is not None:
+                album_record = records_factory.get_album_record(
+                    artist.title(), album_page['title'], album_page['type'], album_page['release_year']
+                )
+
+            for title, href in album['songs']:
+                track_no = int(href.split('#')[1])
+                lyrics = album_page['lyrics'].get(track_no)
+                if lyrics is None:
+                    error = LyricsNotFoundException('Lyrics URL for the song "{}" not found.'.format(title))
+                    self.api.add_failure(error, artist=artist, album=album['title'], song=title)
+                elif album_record is not None:
+                    songs.append(records_factory.get_song_record(album_record, title, track_no, lyrics))
+                else:
+                    songs.append({
+                        "artist": artist.title(),
+                        "album": album_page['title'],
+                        "album_type": album_page["type"],
+                        "release_year": album_page['release_year'],
+                        "title": title,
+                        "track_no": track_no,
+                        "lyrics": lyrics
+                    })
+
+        return songs
+
+    def __get_album_url(self, album):
+        """Returns the URL of an album page, given the album info parsed from the artist page."""
+
+        return album['songs'][0][1].replace('../', self.api.helper.get_base_url()).split('#')[0]
+
+
+def parse_pages(parse_function, pages):
+    """
+    Parse a batch of pages in a worker process.
+
+    Arguments:
+        parse_function {function} -- A module-level function parsing the content of a page
+        pages {list} -- A list of (URL, content) tuples
+
+    Returns:
+        [dict] -- A dict URL -> parsed page (or the exception raised while parsing it)
+    """
+
+    results = {}
+    for url, content in pages:
+        try:
+            results[url] = parse_function(content)
+        except Exception as e:
+            results[url] = e
+
+    return results
@@ -0,0 +1,247 @@
+from concurrent.futures import ThreadPoolExecutor
+from metalparser.libs.darklyrics_utils import parse_artist_page, parse_search_page
+from metalparser.libs.pipeline import CrawlPipeline
+
+
+DEFAULT_ALBUMS_PER_ARTIST = 8
+
+
+class CrawlPlan:
+    """
+    The distinct pages a crawl job needs, along with the cache state of each one, as returned by CrawlPlanner.plan().
+    Pages behind pages not cached yet (e.g. the album pages of an artist whose page is not cached) can't be known before
+    crawling, so their amount is estimated.
+
+    Attributes
+    ----------
+    artists : list
+        The artists of the job, without duplicates.
+
+    songs : list
+        The (song, artist) tuples of the job, without duplicates.
+
+    urls : dict
+        The known URLs of the job (without duplicates, in crawling order), each one with its kind: 'artist', 'album' or 'search'.
+
+    cached_urls : set
+        The known URLs already cached.
+
+    estimated_unknown_urls : float
+        The estimated amount of pages not known yet.
+
+    estimated_seconds : float
+        The estimated time spent waiting for the rate limit, according to the current rate settings.
+
+    Methods
+    -------
+    get_estimated_requests(self)
+        Returns the estimated amount of requests to DarkLyrics.com.
+
+    get_report(self)
+        Returns a dict summarizing the plan.
+    """
+
+    def __init__(self, artists, songs, urls, cached_urls, estimated_unknown_urls, estimated_seconds):
+        self.artists = artists
+        self.songs = songs
+        self.urls = urls
+        self.cached_urls = cached_urls
+        self.estimated_unknown_urls = estimated_unknown_urls
+        self.estimated_seconds = estimated_seconds
+
+    def get_estimated_requests(self):
+        """
+        Returns the estimated amount of requests to DarkLyrics.com, i.e. the known URLs not cached and the pages not known yet.
+
+        Returns:
+            [int] -- The estimated amount of requests
+        """
+
+        return len(self.urls) - len(self.cached_urls) + round(self.estimated_unknown_urls)
+
+    def get_report(self):
+        """
+        Returns a dict summarizing the plan.
+
+        Returns:
+            [dict] -- A dict with the amount of artists, songs, known URLs (by kind), cached URLs and estimated unknown URLs,
+                      the estimated requests, the estimated seconds and the expected cache hit rate
+        """
+
+        total_urls = len(self.urls) + self.estimated_unknown_urls
+        urls_by_kind = {'artist': 0, 'album': 0, 'search': 0}
+        for kind in self.urls.values():
+            urls_by_kind[kind] += 1
+
+        return {
+            'artists': len(self.artists),
+            'songs': len(self.songs),
+            'known_urls': len(self.urls),
+            'urls_by_kind': urls_by_kind,
+            'cached_urls': len(self.cached_urls),
+            'estimated_unknown_urls': round(self.estimated_unknown_urls),
+            'estimated_requests': self.get_estimated_requests(),
+            'estimated_seconds': self.estimated_seconds,
+            'cache_hit_rate': len(self.cached_urls) / total_urls if total_urls else 1.0
+        }
+
+
+class CrawlPlanner:
+    """
+    Expands a crawl job (the songs of a list of artists, and single songs) into the distinct pages it needs, checking each
+    one against the cache without any request to DarkLyrics.com, so that the requests and the time of the job can be
+    estimated before launching it (a dry run). The plan can then be executed, fetching each page only once.
+
+    Parameters
+    ----------
+    api : DarkLyricsApi
+        The API object whose cache is checked, and used for executing the plans.
+
+    Methods
+    -------
+    plan(self, artists=(), songs=())
+        Returns the plan of a job.
+
+    execute(self, plan, processes=None, fetch_workers=2)
+        Executes a plan, yielding the songs info and lyrics of each artist and song.
+    """
+
+    def __init__(self, api):
+        self.api = api
+
+    def plan(self, artists=(), songs=()):
+        """
+        Returns the plan of a job: the pages of the artists (with their album pages, when the artist pages are cached)
+        and the searches of the songs (with their album pages, when the search pages are cached). The amount of album pages
+        of artists not cached yet is estimated with the mean of the cached ones.
+
+        Keyword Arguments:
+            artists {iterable} -- The artists whose songs info and lyrics are crawled (default: {()})
+            songs {iterable} -- The (song, artist) tuples whose info and lyrics are crawled (default: {()})
+
+        Returns:
+            [CrawlPlan] -- The plan of the job
+        """
+
+        helper = self.api.helper
+        scraping_agent = helper.scraping_agent
+        artists = list(dict.fromkeys(artists))
+        songs = list(dict.fromkeys(songs))
+        urls = {}
+        cached_urls = set()
+        # Album pages of the cached artists, used for estimating the ones of the artists not cached
+        cached_artists = 0
+        cached_artists_albums = 0
+        unknown_artists = 0
+        unknown_songs = 0
+
+        def add_url(url, kind):
+            """Adds an URL to the plan, returning whether it's new and its cached content (None if not cached)."""
+
+            url = url.split('#')[0]
+            if url in urls:
+                return False, None
+            urls[url] = kind
+            content = scraping_agent.get_cached_content(url)
+            if content is not None:
+                cached_urls.add(url)
+            return True, content
+
+        for artist in artists:
+            is_new_url, content = add_url(helper.get_artist_url(artist), 'artist')
+            if not is_new_url:
+                continue
+            if content is None:
+                unknown_artists += 1
+                continue
+            albums = [album for album in parse_artist_page(content) or [] if album['songs']]
+            cached_artists += 1
+            cached_artists_albums += len(albums)
+            for album in albums:
+                add_url(album['songs'][0][1].replace('../', helper.get_base_url()), 'album')
+
+        for song, artist in songs:
+            is_new_url, content = add_url(helper.get_search_url(song, artist), 'search')
+            if not is_new_url:
+                continue
+            if content is None:
+                # The album page of the song is known only after the search
+                unknown_songs += 1
+                continue
+            href = parse_search_page(content)
+            if href is not None:
+                add_url(helper.get_base_url() + href, 'album')
+
+        albums_per_artist = cached_artists_albums / cached_artists if cached_artists else DEFAULT_ALBUMS_PER_ARTIST
+        estimated_unknown_urls = unknown_artists * albums_per_artist + unknown_songs
+        estimated_requests = len(urls) - len(cached_urls) + round(estimated_unknown_urls)
+
+        return CrawlPlan(
+            artists, songs, urls, cached_urls, estimated_unknown_urls, self.__estimate_seconds(estimated_requests)
+        )
+
+    def execute(self, plan, processes=None, fetch_workers=2):
+        """
+        Executes a plan: the known URLs of the plan are fetched first (in crawling order, each one once, skipping the cached ones),
+        then the songs info and lyrics of each artist are yielded (with a CrawlPipeline, parsing the pages on worker processes
+        and fetching only the pages not known by the plan) and then of each song. Errors are added to the API failures.
+
+        Arguments:
+            plan {CrawlPlan} -- The plan to execute
+
+        Keyword Arguments:
+            processes {int} -- Amount of worker processes parsing the pages (default: {None}, meaning the amount of CPUs)
+            fetch_workers {int} -- Amount of threads fetching the pages (default: {2})
+
+        Returns:
+            [generator] -- A generator of (artist, list of dict) tuples, then of ((song, artist), dict) tuples
+        """
+
+        self.__fetch_urls(plan.urls, fetch_workers)
+
+        if plan.artists:
+            with CrawlPipeline(self.api, processes=processes, fetch_workers=fetch_workers) as pipeline:
+                yield from pipeline.get_albums_info_and_lyrics_by_artists(plan.artists)
+
+        scraping_agent = self.api.helper.scraping_agent
+        for song, artist in plan.songs:
+            try:
+                with scraping_agent.request_priority('bulk'):
+                    yield (song, artist), self.api.get_song_info_and_lyrics(song, artist)
+            except Exception as e:
+                self.api.add_failure(e, artist=artist, song=song)
+
+    def __fetch_urls(self, urls, fetch_workers):
+        """
+        Fetches URLs with the bulk priority (unless cached), so that they're read from the cache afterwards.
+        Failed pages are fetched again, and reported, when they're read.
+        """
+
+        scraping_agent = self.api.helper.scraping_agent
+
+        def fetch(url):
+            with scraping_agent.request_priority('bulk'):
+                scraping_agent.get_content_from_url(url)
+
+        with ThreadPoolExecutor(max_workers=fetch_workers) as executor:
+            futures = [(url, executor.submit(fetch, url)) for url in urls]
+            for url, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    self.api.logger.debug('Fetch of planned URL "{}" failed: {}'.format(url, str(e)))
+
+    def __estimate_seconds(self, requests):
+        """
+        Returns the seconds the rate controller makes the requests last, starting from its current rate and increasing it
+        after each request, as done after healthy responses.
+        """
+
+        rate_controller = self.api.helper.scraping_agent.rate_controller
+        rate = rate_controller.get_rate()
+        seconds = 0.0
+        for _ in range(requests):
+            seconds += 60 / rate
+            rate = min(rate + rate_controller.increase, rate_controller.max_rate)
+
+        return seconds
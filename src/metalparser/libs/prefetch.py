@@ -0,0 +1,183 @@
+import queue
+import threading
+
+from collections import Counter
+from metalparser.libs.darklyrics_utils import parse_artist_page
+
+
+class Prefetcher:
+    """
+    Warms the cache with the artist and album pages of a list of artists in a background thread, so that the first
+    requests for popular artists don't pay a cold, rate-limited fetch. Pages are fetched with the low-priority rate budget
+    of the scraping agent (see ScrapingAgent.prefetch_url()), so foreground requests always come first.
+    Artists can be listed explicitly, or derived from hit counters (e.g. fed with the artists found in access logs).
+
+    Parameters
+    ----------
+    api : DarkLyricsApi
+        The API object whose cache is warmed.
+
+    Methods
+    -------
+    record_hit(self, artist, hits=1)
+        Counts the requests for an artist.
+
+    get_popular_artists(self, limit=100)
+        Returns the most requested artists, according to the hit counters.
+
+    prefetch(self, artists)
+        Queues artists whose pages are fetched in the background.
+
+    prefetch_popular(self, limit=100)
+        Queues the most requested artists whose pages are fetched in the background.
+
+    wait(self)
+        Blocks until all the queued artists have been prefetched.
+
+    get_stats(self)
+        Returns a dict with the counters of the prefetched artists and pages.
+    """
+
+    def __init__(self, api):
+        self.api = api
+        self.__hits = Counter()
+        self.__queue = queue.Queue()
+        self.__queued_artists = set()
+        self.__thread = None
+        self.__lock = threading.Lock()
+        self.__stats = {'prefetched_artists': 0, 'fetched_pages': 0, 'cached_pages': 0, 'failed_pages': 0}
+
+    def record_hit(self, artist, hits=1):
+        """
+        Counts the requests for an artist.
+
+        Arguments:
+            artist {str} -- The artist's name
+
+        Keyword Arguments:
+            hits {int} -- Amount of requests to be counted (default: {1})
+        """
+
+        with self.__lock:
+            self.__hits[artist.lower()] += hits
+
+    def get_popular_artists(self, limit=100):
+        """
+        Returns the most requested artists, according to the hit counters.
+
+        Keyword Arguments:
+            limit {int} -- Maximum amount of artists (default: {100})
+
+        Returns:
+            [list] -- A list of str containing the artists, the most requested first
+        """
+
+        with self.__lock:
+            return [artist for artist, _ in self.__hits.most_common(limit)]
+
+    def prefetch(self, artists):
+        """
+        Queues artists whose artist and album pages are fetched in the background.
+        Artists already queued and not prefetched yet are skipped.
+
+        Arguments:
+            artists {iterable} -- The artists' names
+
+        Raises:
+            ValueError: Exception raised when the API object doesn't use the cache
+        """
+
+        if not self.api.helper.scraping_agent.use_cache:
+            raise ValueError('Prefetching requires an API object using the cache')
+
+        with self.__lock:
+            for artist in artists:
+                if artist.lower() not in self.__queued_artists:
+                    self.__queued_artists.add(artist.lower())
+                    self.__queue.put(artist)
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__work, daemon=True)
+                self.__thread.start()
+
+    def prefetch_popular(self, limit=100):
+        """
+        Queues the most requested artists whose artist and album pages are fetched in the background.
+
+        Keyword Arguments:
+            limit {int} -- Maximum amount of artists (default: {100})
+        """
+
+        self.prefetch(self.get_popular_artists(limit))
+
+    def wait(self):
+        """Blocks until all the queued artists have been prefetched."""
+
+        self.__queue.join()
+
+    def get_stats(self):
+        """
+        Returns a dict with the counters of the prefetched artists and pages.
+
+        Returns:
+            [dict] -- A dict with queued_artists, prefetched_artists, fetched_pages, cached_pages (pages found already
+                      cached) and failed_pages
+        """
+
+        with self.__lock:
+            stats = {'queued_artists': self.__queue.unfinished_tasks}
+            stats.update(self.__stats)
+
+        return stats
+
+    def __work(self):
+        """Prefetch the queued artists, one at a time."""
+
+        while True:
+            artist = self.__queue.get()
+            try:
+                self.__prefetch_artist(artist)
+            finally:
+                with self.__lock:
+                    self.__queued_artists.discard(artist.lower())
+                    self.__stats['prefetched_artists'] += 1
+                self.__queue.task_done()
+
+    def __prefetch_artist(self, artist):
+        """Prefetch the artist page, then the pages of all the albums found in it."""
+
+        helper = self.api.helper
+        artist_url = helper.get_artist_url(artist)
+        if not self.__prefetch_url(artist_url):
+            return
+
+        # Read the artist page from the cache only: a miss (e.g. a page not stored, as block pages) must not be fetched
+        # again with the foreground priority
+        content = helper.scraping_agent.get_cached_content(artist_url)
+        if content is None:
+            return
+
+        try:
+            albums = parse_artist_page(content) or []
+        except Exception as e:
+            self.api.logger.debug('Prefetch of "{}" failed: {}'.format(artist_url, str(e)))
+            return
+
+        for album in albums:
+            if album['songs']:
+                self.__prefetch_url(album['songs'][0][1].replace('../', helper.get_base_url()).split('#')[0])
+
+    def __prefetch_url(self, url):
+        """Prefetch a page, updating the counters. Returns False if the page can't be fetched."""
+
+        try:
+            fetched = self.api.helper.scraping_agent.prefetch_url(url)
+        except Exception as e:
+            self.api.logger.debug('Prefetch of "{}" failed: {}'.format(url, str(e)))
+            counter = 'failed_pages'
+        else:
+            counter = 'fetched_pages' if fetched else 'cached_pages'
+
+        with self.__lock:
+            self.__stats[counter] += 1
+
+        return counter != 'failed_pages'
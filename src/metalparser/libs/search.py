@@ -0,0 +1,543 @@
+import bisect
+import heapq
+import itertools
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import unicodedata
+
+from array import array
+from metalparser.common.arrays import from_little_endian, to_little_endian
+
+
+MAGIC = b'MPLI'
+VERSION = 2
+HEADER = struct.Struct('<4sIIIQQQQ')  # magic, version, docs, terms, lexicon offset, lengths offset, docs (offset, length)
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.idx'
+
+_APOSTROPHES_REGEX = re.compile(r"['’`´]")
+_WORDS_REGEX = re.compile(r'\w+')
+_PHRASES_REGEX = re.compile(r'"([^"]*)"')
+
+
+def tokenize(text):
+    """
+    Splits lyrics (or a query) into normalized terms: lowercase, without diacritics and apostrophes
+    (so that "Don't" and "dont", or "Berželis" and "berzelis", are the same term).
+
+    Arguments:
+        text {str} -- The text to tokenize
+
+    Returns:
+        [list] -- A list of str containing the terms, in the same order as in the text
+    """
+
+    text = text.casefold()
+    try:
+        text.encode('ascii')
+    except UnicodeEncodeError:
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(char for char in text if not unicodedata.combining(char))
+    text = _APOSTROPHES_REGEX.sub('', text)
+
+    return _WORDS_REGEX.findall(text)
+
+
+class _MemorySegment:
+    """A segment holding the documents added since the last commit."""
+
+    def __init__(self):
+        self.docs = []
+        self.lengths = []
+        self.total_length = 0
+        self.postings = {}
+        self.norms = None
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, doc, terms):
+        doc_id = len(self.docs)
+        self.docs.append(doc)
+        self.lengths.append(len(terms))
+        self.total_length += len(terms)
+        doc_postings = {}
+        for position, term in enumerate(terms):
+            doc_postings.setdefault(term, []).append(position)
+        for term, positions in doc_postings.items():
+            self.postings.setdefault(term, {})[doc_id] = positions
+
+    def get_doc(self, doc_id):
+        return self.docs[doc_id]
+
+    def get_length(self, doc_id):
+        return self.lengths[doc_id]
+
+    def get_document_frequency(self, term):
+        return len(self.postings.get(term, ()))
+
+    def get_postings(self, term):
+        """Returns the ids of the documents containing the term and the term frequencies."""
+
+        term_postings = self.postings.get(term, {})
+
+        return list(term_postings), [len(positions) for positions in term_postings.values()]
+
+    def get_positions(self, term, doc_ids):
+        """Returns a dict doc id -> positions of the term, for the specified documents."""
+
+        term_postings = self.postings.get(term, {})
+
+        return {doc_id: term_postings[doc_id] for doc_id in doc_ids if doc_id in term_postings}
+
+    def get_doc_bytes(self, doc_id):
+        return json.dumps(self.docs[doc_id], ensure_ascii=False).encode('utf-8')
+
+    def iter_terms(self):
+        """Yields the terms in sorted order, each one with its document ids, term frequencies and positions."""
+
+        for term in sorted(self.postings):
+            term_postings = self.postings[term]
+            doc_ids = sorted(term_postings)
+            yield (
+                term, doc_ids, [len(term_postings[doc_id]) for doc_id in doc_ids],
+                [position for doc_id in doc_ids for position in term_postings[doc_id]]
+            )
+
+
+class _MappedSegment:
+    """
+    A read-only segment memory-mapped from a file. The lexicon is a sorted block of fixed-size entries, searched with
+    a binary search in the mapped file, and postings and documents are decoded only when accessed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, docs_count, terms_count, lexicon_offset, lengths_offset, docs_offset, docs_length = \
+            HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.mm.close()
+            raise ValueError('Invalid lyrics index segment (or written by another version): {}'.format(path))
+
+        self.buffer = memoryview(self.mm)
+        self.docs_count = docs_count
+        self.terms_count = terms_count
+        self.postings = from_little_endian(self.buffer[HEADER.size:lexicon_offset], 'I')
+        terms_offsets_offset = lexicon_offset + 16 * terms_count
+        self.entries = from_little_endian(self.buffer[lexicon_offset:terms_offsets_offset], 'Q')
+        self.terms_start = terms_offsets_offset + 8 * (terms_count + 1)
+        self.terms_offsets = from_little_endian(self.buffer[terms_offsets_offset:self.terms_start], 'Q')
+        self.lengths = from_little_endian(self.buffer[lengths_offset:lengths_offset + 4 * docs_count], 'I')
+        self.total_length = sum(self.lengths)
+        self.norms = None
+        docs_offsets_length = 8 * (docs_count + 1)
+        self.docs_offsets = from_little_endian(self.buffer[docs_offset:docs_offset + docs_offsets_length], 'Q')
+        self.docs_start = docs_offset + docs_offsets_length
+
+    def __len__(self):
+        return self.docs_count
+
+    def get_doc(self, doc_id):
+        return json.loads(self.get_doc_bytes(doc_id).decode('utf-8'))
+
+    def get_doc_bytes(self, doc_id):
+        start = self.docs_start + self.docs_offsets[doc_id]
+        end = self.docs_start + self.docs_offsets[doc_id + 1]
+
+        return bytes(self.buffer[start:end])
+
+    def get_length(self, doc_id):
+        return self.lengths[doc_id]
+
+    def get_document_frequency(self, term):
+        entry = self.__get_entry(term)
+
+        return entry[1] if entry else 0
+
+    def get_postings(self, term):
+        """Returns the ids of the documents containing the term and the term frequencies (zero-copy views)."""
+
+        entry = self.__get_entry(term)
+        if entry is None:
+            return (), ()
+
+        offset, document_frequency = entry
+
+        return (
+            self.postings[offset:offset + document_frequency],
+            self.postings[offset + document_frequency:offset + 2 * document_frequency]
+        )
+
+    def get_positions(self, term, doc_ids):
+        """Returns a dict doc id -> positions of the term, for the specified documents."""
+
+        entry = self.__get_entry(term)
+        if entry is None:
+            return {}
+
+        offset, document_frequency = entry
+        term_doc_ids, frequencies = self.get_postings(term)
+        starts = [0] + list(itertools.accumulate(frequencies))
+        positions_offset = offset + 2 * document_frequency
+        positions = {}
+        for doc_id in doc_ids:
+            index = bisect.bisect_left(term_doc_ids, doc_id)
+            if index < document_frequency and term_doc_ids[index] == doc_id:
+                positions[doc_id] = self.postings[positions_offset + starts[index]:positions_offset + starts[index + 1]]
+
+        return positions
+
+    def iter_terms(self):
+        """Yields the terms in sorted order, each one with its document ids, term frequencies and positions."""
+
+        for term_no in range(self.terms_count):
+            offset, document_frequency = self.entries[2 * term_no], self.entries[2 * term_no + 1]
+            frequencies = self.postings[offset + document_frequency:offset + 2 * document_frequency]
+            positions_offset = offset + 2 * document_frequency
+            yield (
+                self.__get_term(term_no).decode('utf-8'), self.postings[offset:offset + document_frequency], frequencies,
+                self.postings[positions_offset:positions_offset + sum(frequencies)]
+            )
+
+    def close(self):
+        for view in (self.postings, self.entries, self.terms_offsets, self.lengths, self.docs_offsets, self.buffer):
+            view.release()
+        self.mm.close()
+
+    def __get_entry(self, term):
+        """Returns the (postings offset, document frequency) entry of a term, binary searching the lexicon, or None."""
+
+        key = term.encode('utf-8')
+        low, high = 0, self.terms_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.__get_term(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.terms_count or self.__get_term(low) != key:
+            return None
+
+        return self.entries[2 * low], self.entries[2 * low + 1]
+
+    def __get_term(self, term_no):
+        """Returns the UTF-8 bytes of the term at the given position of the lexicon."""
+
+        return bytes(self.buffer[self.terms_start + self.terms_offsets[term_no]:self.terms_start + self.terms_offsets[term_no + 1]])
+
+
+def _write_segment(path, docs, lengths, terms):
+    """
+    Writes a segment file in the format read by _MappedSegment, atomically.
+    Terms are (term, document ids, term frequencies, positions) tuples sorted by term, documents are JSON bytes.
+    """
+
+    postings = array('I')
+    entries = array('Q')
+    terms_offsets = array('Q', [0])
+    terms_bytes = []
+    for term, doc_ids, frequencies, positions in terms:
+        term_bytes = term.encode('utf-8')
+        entries.extend((len(postings), len(doc_ids)))
+        postings.extend(doc_ids)
+        postings.extend(frequencies)
+        postings.extend(positions)
+        terms_bytes.append(term_bytes)
+        terms_offsets.append(terms_offsets[-1] + len(term_bytes))
+
+    docs_offsets = array('Q', [0])
+    for doc in docs:
+        docs_offsets.append(docs_offsets[-1] + len(doc))
+
+    # Each block is aligned to 8 bytes, so that the arrays can be cast from the mapped file
+    blocks = [
+        to_little_endian(postings),
+        to_little_endian(entries) + to_little_endian(terms_offsets) + b''.join(terms_bytes),
+        to_little_endian(array('I', lengths)),
+        to_little_endian(docs_offsets) + b''.join(docs)
+    ]
+    offsets = []
+    offset = HEADER.size
+    for block in blocks:
+        offset += -offset % 8
+        offsets.append(offset)
+        offset += len(block)
+
+    with open(path + '.tmp', 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(docs_offsets) - 1, len(entries) // 2, offsets[1], offsets[2], offsets[3], len(blocks[3])))
+        for offset, block in zip(offsets, blocks):
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(block)
+    os.replace(path + '.tmp', path)
+
+
+def _merge_terms(segments):
+    """Yields the sorted terms of several segments, merging their postings (with the document ids of the merged segment)."""
+
+    bases = list(itertools.accumulate([0] + [len(segment) for segment in segments[:-1]]))
+    segments_terms = [_iter_terms_with_base(segment, base) for segment, base in zip(segments, bases)]
+    for term, term_segments in itertools.groupby(heapq.merge(*segments_terms), key=lambda item: item[0]):
+        doc_ids, frequencies, positions = array('I'), array('I'), array('I')
+        for _, base, segment_doc_ids, segment_frequencies, segment_positions in term_segments:
+            doc_ids.extend(base + doc_id for doc_id in segment_doc_ids)
+            frequencies.extend(segment_frequencies)
+            positions.extend(segment_positions)
+        yield term, doc_ids, frequencies, positions
+
+
+def _iter_terms_with_base(segment, base):
+    """Yields the sorted terms of a segment, along with the first id of its documents in the merged segment."""
+
+    for term, doc_ids, frequencies, positions in segment.iter_terms():
+        yield term, base, doc_ids, frequencies, positions
+
+
+def _parse_segment_name(file_name):
+    """Returns the range (first, last) of segment numbers covered by a segment file, or None if it's not a segment file."""
+
+    if not file_name.startswith(SEGMENT_PREFIX) or not file_name.endswith(SEGMENT_SUFFIX):
+        return None
+    numbers = file_name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)].split('-')
+    if not 1 <= len(numbers) <= 2 or not all(number.isdigit() for number in numbers):
+        return None
+
+    return int(numbers[0]), int(numbers[-1])
+
+
+class LyricsIndex:
+    """
+    A full-text inverted index over songs lyrics, with positional postings for phrase queries and BM25 ranking.
+    Songs are added to an in-memory segment; committing writes it to a new memory-mapped segment file in the index directory,
+    so the index can be updated incrementally as new albums are crawled. Merging compacts the segments into a single one.
+
+    Parameters
+    ----------
+    path : str
+        The directory where the index segments are stored (optional, the index is in-memory only when not specified).
+
+    Methods
+    -------
+    add(self, records)
+        Adds songs to the index.
+
+    commit(self)
+        Writes the songs added since the last commit to a new segment in the index directory.
+
+    merge(self)
+        Merges all the segments of the index into a single one.
+
+    search(self, query, limit=10)
+        Returns the songs matching a query, sorted by relevance.
+
+    close(self)
+        Releases the memory-mapped segments.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, path=None):
+        self.path = path
+        self.segments = []
+        self.memory_segment = _MemorySegment()
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            for file_name, (first, last) in sorted(self.__get_segments_files().items(), key=lambda item: (item[1][0], -item[1][1])):
+                if self.segments and first <= self.segments[-1][1][1]:
+                    # Left over by a merge interrupted before removing the merged segments
+                    os.remove(os.path.join(path, file_name))
+                else:
+                    self.segments.append((os.path.join(path, file_name), (first, last)))
+            self.segments = [_MappedSegment(segment_path) for segment_path, _ in self.segments]
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.__get_segments())
+
+    def add(self, records):
+        """
+        Adds songs to the index.
+
+        Arguments:
+            records {list} -- A list of dict (or SongRecord) as returned by DarkLyricsApi.get_album_info_and_lyrics()
+
+        Returns:
+            [int] -- The amount of songs added
+        """
+
+        added = 0
+        for record in records:
+            doc = {key: record[key] for key in ('artist', 'album', 'title', 'track_no')}
+            self.memory_segment.add(doc, tokenize(record['title'] + '\n' + record['lyrics']))
+            added += 1
+
+        return added
+
+    def commit(self):
+        """
+        Writes the songs added since the last commit to a new segment in the index directory.
+
+        Raises:
+            ValueError: Exception raised when the index has no directory
+        """
+
+        if self.path is None:
+            raise ValueError('Cannot commit an in-memory index: specify a path when creating it')
+        if not len(self.memory_segment):
+            return
+
+        number = self.__get_next_segment_number()
+        self.segments.append(self.__write_segment('{}{:06d}{}'.format(SEGMENT_PREFIX, number, SEGMENT_SUFFIX), [self.memory_segment]))
+        self.memory_segment = _MemorySegment()
+
+    def merge(self):
+        """
+        Merges all the segments of the index into a single one (committing the songs added since the last commit), so that
+        searches don't get slower as segments are committed.
+
+        Raises:
+            ValueError: Exception raised when the index has no directory
+        """
+
+        self.commit()
+        if len(self.segments) <= 1:
+            return
+
+        numbers = sorted(self.__get_segments_files().values())
+        file_name = '{}{:06d}-{:06d}{}'.format(SEGMENT_PREFIX, numbers[0][0], numbers[-1][1], SEGMENT_SUFFIX)
+        merged_segment = self.__write_segment(file_name, self.segments)
+        for segment in self.segments:
+            segment.close()
+            os.remove(segment.path)
+        self.segments = [merged_segment]
+
+    def search(self, query, limit=10):
+        """
+        Returns the songs matching a query, sorted by relevance (BM25).
+        Quoted parts of the query are phrases, which must appear in the song; other terms are optional.
+
+        Arguments:
+            query {str} -- The query (e.g. 'destiny "fools scream out"')
+
+        Keyword Arguments:
+            limit {int} -- Maximum amount of results (default: {10})
+
+        Returns:
+            [list] -- A list of dict with artist, album, title, track number and score of the matching songs
+        """
+
+        phrases = [tokenize(phrase) for phrase in _PHRASES_REGEX.findall(query)]
+        phrases = [phrase for phrase in phrases if phrase]
+        terms = tokenize(_PHRASES_REGEX.sub(' ', query)) + [term for phrase in phrases for term in phrase]
+        if not terms:
+            return []
+
+        segments = self.__get_segments()
+        docs_count = sum(len(segment) for segment in segments)
+        if docs_count == 0:
+            return []
+        average_length = sum(segment.total_length for segment in segments) / docs_count
+        idfs = {}
+        for term in set(terms):
+            document_frequency = sum(segment.get_document_frequency(term) for segment in segments)
+            idfs[term] = math.log(1 + (docs_count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        results = []
+        for segment_no, segment in enumerate(segments):
+            scores = self.__search_segment(segment, set(terms), phrases, idfs, average_length)
+            results += [(score, segment_no, doc_id) for doc_id, score in scores.items()]
+        results = heapq.nlargest(limit, results, key=lambda result: result[0])
+
+        return [dict(segments[segment_no].get_doc(doc_id), score=score) for score, segment_no, doc_id in results]
+
+    def close(self):
+        """Releases the memory-mapped segments."""
+
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+    def __search_segment(self, segment, terms, phrases, idfs, average_length):
+        """Returns a dict doc id -> score of the segment documents matching the query."""
+
+        candidates = self.__get_phrases_matches(segment, phrases) if phrases else None
+        norms = self.__get_norms(segment, average_length)
+        scores = {}
+
+        for term in terms:
+            idf = idfs[term] * (self.K1 + 1)
+            doc_ids, frequencies = segment.get_postings(term)
+            for doc_id, frequency in zip(doc_ids, frequencies):
+                if candidates is None or doc_id in candidates:
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency / (frequency + norms[doc_id])
+
+        return scores
+
+    def __get_phrases_matches(self, segment, phrases):
+        """Returns the set of ids of the segment documents containing all the phrases."""
+
+        candidates = None
+        for term in {term for phrase in phrases for term in phrase}:
+            doc_ids = set(segment.get_postings(term)[0])
+            candidates = doc_ids if candidates is None else candidates & doc_ids
+            if not candidates:
+                return set()
+
+        for phrase in phrases:
+            positions = [segment.get_positions(term, candidates) for term in phrase]
+            candidates = {doc_id for doc_id in candidates if self.__has_phrase(positions, doc_id)}
+
+        return candidates
+
+    def __has_phrase(self, positions, doc_id):
+        """Check if the terms of a phrase, given their positions, appear consecutively in the document."""
+
+        starts = set(positions[0][doc_id])
+        for offset in range(1, len(positions)):
+            starts.intersection_update(position - offset for position in positions[offset][doc_id])
+            if not starts:
+                return False
+
+        return True
+
+    def __get_norms(self, segment, average_length):
+        """Returns the BM25 length normalization of the segment documents, computed once per average length."""
+
+        norms = segment.norms
+        if norms is None or norms[0] != (average_length, len(segment)):
+            lengths = segment.lengths
+            norms = ((average_length, len(segment)), [self.K1 * (1 - self.B + self.B * length / average_length) for length in lengths])
+            segment.norms = norms
+
+        return norms[1]
+
+    def __get_segments(self):
+        return self.segments + ([self.memory_segment] if len(self.memory_segment) else [])
+
+    def __write_segment(self, file_name, segments):
+        """Writes the documents of the segments to a new segment file in the index directory, and returns it mapped."""
+
+        segment_path = os.path.join(self.path, file_name)
+        docs = [segment.get_doc_bytes(doc_id) for segment in segments for doc_id in range(len(segment))]
+        lengths = [segment.get_length(doc_id) for segment in segments for doc_id in range(len(segment))]
+        _write_segment(segment_path, docs, lengths, _merge_terms(segments))
+
+        return _MappedSegment(segment_path)
+
+    def __get_segments_files(self):
+        """Returns a dict file name -> (first, last) segment numbers of the segment files in the index directory."""
+
+        segments_files = {file_name: _parse_segment_name(file_name) for file_name in os.listdir(self.path)}
+
+        return {file_name: numbers for file_name, numbers in segments_files.items() if numbers is not None}
+
+    def __get_next_segment_number(self):
+        return max((last for _, last in self.__get_segments_files().values()), default=0) + 1
+
@@ -0,0 +1,435 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+
+from array import array
+from metalparser.common.arrays import from_little_endian, to_little_endian
+
+
+MAGIC = b'MPLS'
+VERSION = 1
+HEADER = struct.Struct('<4sIQ')  # magic, version, table of contents length
+
+COLUMNS = {
+    'artists_name': 'I',
+    'artists_first_album': 'I',
+    'artists_albums_count': 'I',
+    'albums_artist': 'I',
+    'albums_title': 'I',
+    'albums_type': 'I',
+    'albums_release_year': 'I',
+    'albums_first_song': 'I',
+    'albums_songs_count': 'I',
+    'songs_album': 'I',
+    'songs_title': 'I',
+    'songs_track_no': 'I',
+    'songs_by_title': 'I',
+    'lyrics_offsets': 'Q'
+}
+
+
+def write_snapshot(records, path):
+    """
+    Writes songs info and lyrics to a compact, read-only snapshot file, to be read with LyricsSnapshot.
+    Strings (artists, albums, titles) are stored once in a string table and lyrics are concatenated in a single blob;
+    artists, albums and songs are sorted so that they can be looked up by binary search.
+
+    Arguments:
+        records {iterable} -- Dict (or SongRecord) as returned by DarkLyricsApi.get_albums_info_and_lyrics_by_artist()
+        path {str} -- The path of the snapshot file
+
+    Returns:
+        [int] -- The amount of songs written
+    """
+
+    artists = {}
+    for record in records:
+        albums = artists.setdefault(record['artist'], {})
+        album = albums.setdefault(record['album'], {'type': record['album_type'], 'release_year': record['release_year'], 'songs': []})
+        album['songs'].append((record['track_no'], record['title'], record['lyrics']))
+
+    strings = _StringTable()
+    columns = {name: array(typecode) for name, typecode in COLUMNS.items()}
+    lyrics = []
+    lyrics_offset = 0
+    columns['lyrics_offsets'].append(0)
+
+    for artist in sorted(artists, key=_get_key):
+        columns['artists_name'].append(strings.add(artist))
+        columns['artists_first_album'].append(len(columns['albums_title']))
+        columns['artists_albums_count'].append(len(artists[artist]))
+        for album_title in sorted(artists[artist], key=_get_key):
+            album = artists[artist][album_title]
+            columns['albums_artist'].append(len(columns['artists_name']) - 1)
+            columns['albums_title'].append(strings.add(album_title))
+            columns['albums_type'].append(strings.add(album['type']))
+            columns['albums_release_year'].append(strings.add(str(album['release_year'])))
+            columns['albums_first_song'].append(len(columns['songs_title']))
+            columns['albums_songs_count'].append(len(album['songs']))
+            for track_no, title, song_lyrics in sorted(album['songs'], key=lambda song: song[0]):
+                encoded_lyrics = song_lyrics.encode('utf-8')
+                lyrics.append(encoded_lyrics)
+                lyrics_offset += len(encoded_lyrics)
+                columns['songs_album'].append(len(columns['albums_title']) - 1)
+                columns['songs_title'].append(strings.add(title))
+                columns['songs_track_no'].append(track_no)
+                columns['lyrics_offsets'].append(lyrics_offset)
+
+    songs_keys = [
+        (columns['albums_artist'][columns['songs_album'][song_id]], _get_key(strings.get(columns['songs_title'][song_id])), song_id)
+        for song_id in range(len(columns['songs_title']))
+    ]
+    columns['songs_by_title'].extend(song_id for _, _, song_id in sorted(songs_keys))
+
+    sections = [(name, to_little_endian(column)) for name, column in columns.items()]
+    sections += [('strings_offsets', to_little_endian(strings.offsets)), ('strings', b''.join(strings.encoded))]
+    sections.append(('lyrics', b''.join(lyrics)))
+    _write_sections(path, sections)
+
+    return len(columns['songs_title'])
+
+
+def _write_sections(path, sections):
+    """Writes the sections to the file, each one aligned to 8 bytes, after a table of contents."""
+
+    table_of_contents = {}
+    offset = 0
+    for name, data in sections:
+        table_of_contents[name] = [offset, len(data)]
+        offset += len(data) + (-len(data) % 8)
+    encoded_table_of_contents = json.dumps(table_of_contents).encode('utf-8')
+    encoded_table_of_contents += b' ' * (-(HEADER.size + len(encoded_table_of_contents)) % 8)
+
+    with open(path + '.tmp', 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(encoded_table_of_contents)))
+        f.write(encoded_table_of_contents)
+        for _, data in sections:
+            f.write(data)
+            f.write(b'\0' * (-len(data) % 8))
+    os.replace(path + '.tmp', path)
+
+
+class LyricsSnapshot:
+    """
+    A read-only view over a snapshot file written by write_snapshot().
+    The file is memory-mapped and used in place, so processes forked after opening it (or opening the same file)
+    share a single copy in the page cache; artists, albums and songs are looked up by binary search (O(log n)).
+    Results have the same format returned by DarkLyricsApi.
+
+    Parameters
+    ----------
+    path : str
+        The path of the snapshot file.
+
+    Methods
+    -------
+    get_artists_list(self)
+        Returns an alphabetically ordered list with all the artists in the snapshot.
+
+    get_albums_info(self, artist, title_only=False)
+        Returns a list containing all the albums related to an artist.
+
+    get_album_info_and_lyrics(self, album, artist, lyrics_only=False)
+        Returns a list of dict containing info and lyrics of all the songs related to an album.
+
+    get_albums_info_and_lyrics_by_artist(self, artist)
+        Returns a list of dict containing info and lyrics of all the songs related to an artist.
+
+    get_song_info_and_lyrics(self, song, artist, lyrics_only=False)
+        Returns a dict containing info and lyrics of a song.
+
+    get_song_by_track(self, artist, album, track_no)
+        Returns a dict containing info and lyrics of the song with the specified track number.
+
+    get_string(self, string_id)
+        Returns a string of the string table, decoded from the memory-mapped file.
+
+    close(self)
+        Releases the memory-mapped file.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, table_of_contents_length = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Invalid lyrics snapshot: {}'.format(path))
+
+        self.buffer = memoryview(self.mm)
+        data_offset = HEADER.size + table_of_contents_length
+        table_of_contents = json.loads(bytes(self.buffer[HEADER.size:data_offset]).decode('utf-8'))
+        self.sections = {}
+        for name, (offset, length) in table_of_contents.items():
+            section = self.buffer[data_offset + offset:data_offset + offset + length]
+            typecode = COLUMNS.get(name, 'Q' if name == 'strings_offsets' else None)
+            self.sections[name] = from_little_endian(section, typecode) if typecode else section
+
+        self.__artists_keys = _KeysView(self, 'artists_name')
+        self.__albums_keys = _KeysView(self, 'albums_title')
+
+    def __len__(self):
+        return len(self.sections['songs_title'])
+
+    def get_artists_list(self):
+        """
+        Returns an alphabetically ordered list with all the artists in the snapshot.
+
+        Returns:
+            [list] -- A list of str containing the artists
+        """
+
+        return [self.get_string(string_id) for string_id in self.sections['artists_name']]
+
+    def get_albums_info(self, artist, title_only=False):
+        """
+        Returns a list containing all the albums related to an artist.
+
+        Arguments:
+            artist {str} -- The artist's name
+
+        Keyword Arguments:
+            title_only {bool} -- Flag to determinate if returning all albums info or title only (default: {False})
+
+        Returns:
+            [list] -- List of albums (str list or dict list, depending on title_only)
+        """
+
+        albums_list = []
+        for album_id in self.__get_albums_range(artist):
+            album_info = self.__get_album_info(album_id)
+            albums_list.append(album_info['title'] if title_only else album_info)
+
+        return albums_list
+
+    def get_album_info_and_lyrics(self, album, artist, lyrics_only=False):
+        """
+        Returns a list of dict containing info and lyrics of all the songs related to an album.
+
+        Arguments:
+            album {str} -- The title of the album
+            artist {str} -- The artist's name
+
+        Keyword Arguments:
+            lyrics_only {bool} -- Flag to determinate if returning the lyrics only (default: {False})
+
+        Returns:
+            [list] -- A list of dict containing info and lyrics of the songs or a list of str containing only the lyrics
+        """
+
+        album_id = self.__find_album(album, artist)
+        if album_id is None:
+            return []
+
+        first_song = self.sections['albums_first_song'][album_id]
+        songs = range(first_song, first_song + self.sections['albums_songs_count'][album_id])
+
+        return [self.__get_lyrics(song_id) if lyrics_only else self.__get_song(song_id) for song_id in songs]
+
+    def get_albums_info_and_lyrics_by_artist(self, artist):
+        """
+        Returns a list of dict containing info and lyrics of all the songs related to an artist.
+
+        Arguments:
+            artist {str} -- The artist's name
+
+        Returns:
+            [list] -- A list of dict containing info and lyrics of the songs
+        """
+
+        songs = []
+        for album_id in self.__get_albums_range(artist):
+            first_song = self.sections['albums_first_song'][album_id]
+            songs += [self.__get_song(song_id) for song_id in range(first_song, first_song + self.sections['albums_songs_count'][album_id])]
+
+        return songs
+
+    def get_song_info_and_lyrics(self, song, artist, lyrics_only=False):
+        """
+        Returns a dict containing info and lyrics of a song (the first one found, when several albums contain it).
+
+        Arguments:
+            song {str} -- The title of the song
+            artist {str} -- The artist's name
+
+        Keyword Arguments:
+            lyrics_only {bool} -- Flag to determinate if returning the lyrics only (default: {False})
+
+        Returns:
+            [dict or str or None] -- A dict containing info and lyrics of the song, or a str containing only the lyrics,
+                                     or None when the song is not in the snapshot
+        """
+
+        artist_id = self.__find(self.__artists_keys, artist, 0, len(self.__artists_keys))
+        if artist_id is None:
+            return None
+
+        songs_keys = _SongsKeysView(self)
+        index = bisect.bisect_left(songs_keys, (artist_id, _get_key(song)))
+        if index == len(songs_keys) or songs_keys[index] != (artist_id, _get_key(song)):
+            return None
+
+        song_id = self.sections['songs_by_title'][index]
+
+        return self.__get_lyrics(song_id) if lyrics_only else self.__get_song(song_id)
+
+    def get_song_by_track(self, artist, album, track_no):
+        """
+        Returns a dict containing info and lyrics of the song with the specified track number.
+
+        Arguments:
+            artist {str} -- The artist's name
+            album {str} -- The title of the album
+            track_no {int} -- The track number of the song
+
+        Returns:
+            [dict or None] -- A dict containing info and lyrics of the song, or None when the song is not in the snapshot
+        """
+
+        album_id = self.__find_album(album, artist)
+        if album_id is None:
+            return None
+
+        first_song = self.sections['albums_first_song'][album_id]
+        last_song = first_song + self.sections['albums_songs_count'][album_id]
+        song_id = bisect.bisect_left(self.sections['songs_track_no'], track_no, first_song, last_song)
+        if song_id == last_song or self.sections['songs_track_no'][song_id] != track_no:
+            return None
+
+        return self.__get_song(song_id)
+
+    def close(self):
+        """Releases the memory-mapped file."""
+
+        for section in self.sections.values():
+            section.release()
+        self.buffer.release()
+        self.mm.close()
+
+    def get_string(self, string_id):
+        """
+        Returns a string of the string table, decoded from the memory-mapped file.
+
+        Arguments:
+            string_id {int} -- The id of the string
+
+        Returns:
+            [str] -- The decoded string
+        """
+
+        offsets = self.sections['strings_offsets']
+
+        return bytes(self.sections['strings'][offsets[string_id]:offsets[string_id + 1]]).decode('utf-8')
+
+    def __get_lyrics(self, song_id):
+        offsets = self.sections['lyrics_offsets']
+
+        return bytes(self.sections['lyrics'][offsets[song_id]:offsets[song_id + 1]]).decode('utf-8')
+
+    def __get_album_info(self, album_id):
+        return {
+            'title': self.get_string(self.sections['albums_title'][album_id]),
+            'type': self.get_string(self.sections['albums_type'][album_id]),
+            'release_year': self.get_string(self.sections['albums_release_year'][album_id])
+        }
+
+    def __get_song(self, song_id):
+        album_id = self.sections['songs_album'][song_id]
+        album_info = self.__get_album_info(album_id)
+
+        return {
+            'artist': self.get_string(self.sections['artists_name'][self.sections['albums_artist'][album_id]]),
+            'album': album_info['title'],
+            'album_type': album_info['type'],
+            'release_year': album_info['release_year'],
+            'title': self.get_string(self.sections['songs_title'][song_id]),
+            'track_no': self.sections['songs_track_no'][song_id],
+            'lyrics': self.__get_lyrics(song_id)
+        }
+
+    def __get_albums_range(self, artist):
+        """Returns the range of album ids related to an artist (empty when the artist is not in the snapshot)."""
+
+        artist_id = self.__find(self.__artists_keys, artist, 0, len(self.__artists_keys))
+        if artist_id is None:
+            return range(0)
+
+        first_album = self.sections['artists_first_album'][artist_id]
+
+        return range(first_album, first_album + self.sections['artists_albums_count'][artist_id])
+
+    def __find_album(self, album, artist):
+        albums_range = self.__get_albums_range(artist)
+
+        return self.__find(self.__albums_keys, album, albums_range.start, albums_range.stop)
+
+    def __find(self, keys, value, start, stop):
+        """Binary search of a name in a sorted keys view, returning its index or None."""
+
+        key = _get_key(value)
+        index = bisect.bisect_left(keys, key, start, stop)
+
+        return index if index < stop and keys[index] == key else None
+
+
+class _StringTable:
+    """Collects distinct strings, assigning them sequential ids."""
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+        self.encoded = []
+        self.offsets = array('Q', [0])
+
+    def add(self, string):
+        string_id = self.ids.get(string)
+        if string_id is None:
+            string_id = self.ids[string] = len(self.strings)
+            encoded_string = string.encode('utf-8')
+            self.strings.append(string)
+            self.encoded.append(encoded_string)
+            self.offsets.append(self.offsets[-1] + len(encoded_string))
+
+        return string_id
+
+    def get(self, string_id):
+        return self.strings[string_id]
+
+
+class _KeysView:
+    """Sequence of the lookup keys of a column of string ids, to be used with bisect."""
+
+    def __init__(self, snapshot, column):
+        self.snapshot = snapshot
+        self.column = snapshot.sections[column]
+
+    def __len__(self):
+        return len(self.column)
+
+    def __getitem__(self, index):
+        return _get_key(self.snapshot.get_string(self.column[index]))
+
+
+class _SongsKeysView:
+    """Sequence of the (artist id, title key) lookup keys of the songs sorted by title, to be used with bisect."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.sections = snapshot.sections
+
+    def __len__(self):
+        return len(self.sections['songs_by_title'])
+
+    def __getitem__(self, index):
+        song_id = self.sections['songs_by_title'][index]
+        artist_id = self.sections['albums_artist'][self.sections['songs_album'][song_id]]
+
+        return artist_id, _get_key(self.snapshot.get_string(self.sections['songs_title'][song_id]))
+
+
+def _get_key(name):
+    """Returns the lookup key of an artist, album or song name."""
+
+    return name.casefold()
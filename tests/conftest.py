@@ -0,0 +1,64 @@
+import io
+import time
+
+import pytest
+
+
+@pytest.fixture
+def fake_site():
+    """Returns a function creating an in-memory cached session serving pages from a dict instead of darklyrics.com."""
+
+    import requests_cache
+
+    from requests.adapters import BaseAdapter
+    from requests.models import Response
+    from urllib3.response import HTTPResponse
+
+    class FakeSiteAdapter(BaseAdapter):
+        def __init__(self, pages, delay):
+            super().__init__()
+            self.pages = pages
+            self.delay = delay
+            self.requested_urls = []
+
+        def send(self, request, **kwargs):
+            self.requested_urls.append(request.url)
+            time.sleep(self.delay)
+            content = self.pages.get(request.url, b'<html></html>')
+            response = Response()
+            response.status_code = 200
+            response.url = request.url
+            response.request = request
+            response.headers['Content-Type'] = 'text/html; charset=utf-8'
+            response.encoding = 'utf-8'
+            response.raw = HTTPResponse(body=io.BytesIO(content), preload_content=False, status=200)
+            return response
+
+        def close(self):
+            pass
+
+    def create_cached_session(pages=None, delay=0):
+        cached_session = requests_cache.CachedSession(backend='memory', expire_after=7200)
+        cached_session.site = FakeSiteAdapter(pages or {}, delay)
+        cached_session.mount('http://', cached_session.site)
+        return cached_session
+
+    return create_cached_session
+
+
+@pytest.fixture
+def api():
+    """Returns a function creating a DarkLyricsApi which reads pages through a cached session, without rate limits."""
+
+    from metalparser.common.ratecontrol import AdaptiveRateController
+    from metalparser.darklyrics import DarkLyricsApi
+
+    def create_api(cached_session):
+        darklyrics_api = DarkLyricsApi()
+        scraping_agent = darklyrics_api.helper.scraping_agent
+        scraping_agent.cached_session = cached_session
+        scraping_agent.rate_controller = AdaptiveRateController(initial_rate=60000, max_rate=60000)
+        scraping_agent.prefetch_rate_controller = AdaptiveRateController(initial_rate=60000, max_rate=60000)
+        return darklyrics_api
+
+    return create_api
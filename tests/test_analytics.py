@@ -0,0 +1,63 @@
+import pytest
+
+pytest.importorskip('numpy')
+
+from metalparser.libs.analytics import LyricsCorpus  # noqa: E402
+
+
+SONGS = [
+    {'artist': 'Venom', 'album': 'Black Metal', 'title': 'Countess Bathory', 'track_no': 6,
+     'lyrics': 'In the dungeons of the castle\nThe countess bathes in blood'},
+    {'artist': 'Venom', 'album': 'Black Metal', 'title': 'Teacher\'s Pet', 'track_no': 7,
+     'lyrics': 'Teacher teacher\n\nTeacher in the blood'},
+    {'artist': 'Bathory', 'album': 'Blood Fire Death', 'title': 'Blood Fire Death', 'track_no': 9,
+     'lyrics': 'Blood fire death\nBlood fire death'}
+]
+
+
+def test_term_frequencies_and_aggregates():
+    corpus = LyricsCorpus()
+
+    assert corpus.add(SONGS) == 3
+    assert corpus.get_stats() == {'artists': 2, 'albums': 2, 'songs': 3, 'words': 23, 'lines': 6, 'vocabulary': 11}
+    # Ties are sorted by first occurrence
+    assert corpus.get_term_frequencies(limit=3) == [('the', 4, 2), ('blood', 4, 3), ('in', 3, 2)]
+    assert corpus.get_group_stats(by='artist') == [
+        {'artist': 'Venom', 'songs': 2, 'words': 17, 'lines': 4, 'distinct_terms': 9, 'words_per_song': 8.5},
+        {'artist': 'Bathory', 'songs': 1, 'words': 6, 'lines': 2, 'distinct_terms': 3, 'words_per_song': 6.0}
+    ]
+    assert corpus.get_group_stats()[1]['album'] == 'Blood Fire Death'
+    with pytest.raises(ValueError):
+        corpus.get_group_stats(by='song')
+
+
+def test_tf_idf_and_ngrams():
+    corpus = LyricsCorpus()
+    corpus.add(SONGS)
+
+    tf_idf = corpus.get_tf_idf(limit=1)
+    assert [terms[0][0] for terms in tf_idf] == ['the', 'teacher', 'fire']
+    # Terms found in every document are not relevant to any of them
+    assert dict(corpus.get_tf_idf(by='artist', limit=20)[1])['blood'] == 0.0
+    assert corpus.get_ngram_counts(n=3, limit=1) == [(('blood', 'fire', 'death'), 2)]
+    # N-grams don't cross the end of a song
+    assert (('blood', 'blood'), 1) not in corpus.get_ngram_counts(n=2, limit=None)
+
+
+def test_incremental_updates_saved_to_disk(tmpdir):
+    path = str(tmpdir.join('corpus.npz'))
+    corpus = LyricsCorpus(path)
+    corpus.add(SONGS[:2])
+    corpus.save()
+
+    corpus = LyricsCorpus(path)
+    assert corpus.add(SONGS) == 1
+    corpus.save()
+
+    corpus = LyricsCorpus(path)
+    assert len(corpus) == 3
+    assert corpus.get_term_frequencies(limit=2) == [('the', 4, 2), ('blood', 4, 3)]
+    fresh_corpus = LyricsCorpus()
+    fresh_corpus.add(SONGS)
+    assert corpus.get_term_frequencies() == fresh_corpus.get_term_frequencies()
+    assert corpus.get_tf_idf(by='album') == fresh_corpus.get_tf_idf(by='album')
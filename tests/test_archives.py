@@ -0,0 +1,108 @@
+import base64
+import gzip
+import json
+
+import requests_cache
+
+from metalparser.common.archives import read_archive
+from metalparser.darklyrics import DarkLyricsApi
+
+
+ARTIST_PAGE = b"""
+<html><head><title>IRON MAIDEN lyrics</title></head><body>
+<div class="album"><h2>album: <strong>"Killers"</strong> (1981)</h2>
+<a href="../lyrics/ironmaiden/killers.html#1">The Ides Of March</a><br/>
+<a href="../lyrics/ironmaiden/killers.html#2">Wrathchild</a><br/></div>
+<div class="album"><h2>album: <strong>"Piece Of Mind"</strong> (1983)</h2>
+<a href="../lyrics/ironmaiden/pieceofmind.html#1">Where Eagles Dare</a><br/></div>
+</body></html>
+"""
+
+KILLERS_PAGE = b"""
+<html><head><title>IRON MAIDEN - Killers</title></head><body>
+<div class="albumlyrics"><h2>album: "Killers" (1981)</h2></div>
+<div class="lyrics">
+<h3><a name="1">1. The Ides Of March</a></h3><br/>
+[Instrumental]<br/>
+<h3><a name="2">2. Wrathchild</a></h3><br/>
+I was born in a rock'n'roll world<br/>
+<br/>
+<br/>
+<div class="thanks">Thanks to the submitters</div>
+</div></body></html>
+"""
+
+ARTIST_URL = 'http://www.darklyrics.com/i/ironmaiden.html'
+KILLERS_URL = 'http://www.darklyrics.com/lyrics/ironmaiden/killers.html'
+
+
+def get_warc_record(warc_type, url, block):
+    headers = 'WARC/1.0\r\nWARC-Type: {}\r\nWARC-Target-URI: <{}>\r\nContent-Type: application/http; msgtype={}\r\n' \
+              'Content-Length: {}\r\n\r\n'.format(warc_type, url, warc_type, len(block))
+
+    return gzip.compress(headers.encode() + block + b'\r\n\r\n')
+
+
+def write_warc(path):
+    compressed_page = gzip.compress(KILLERS_PAGE)
+    chunked_body = '{:x}\r\n'.format(len(compressed_page)).encode() + compressed_page + b'\r\n0\r\n\r\n'
+    with open(path, 'wb') as f:
+        f.write(get_warc_record('request', KILLERS_URL, b'GET /lyrics/ironmaiden/killers.html HTTP/1.1\r\n\r\n'))
+        f.write(get_warc_record('response', KILLERS_URL, (
+            b'HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\nContent-Encoding: gzip\r\n'
+            b'Transfer-Encoding: chunked\r\n\r\n' + chunked_body
+        )))
+        f.write(get_warc_record('response', 'http://www.darklyrics.com/n/nobody.html', b'HTTP/1.1 404 Not Found\r\n\r\n'))
+
+
+def write_har(path):
+    entries = [{
+        'request': {'method': 'GET', 'url': ARTIST_URL},
+        'response': {
+            'status': 200,
+            'headers': [{'name': 'Content-Type', 'value': 'text/html; charset=iso-8859-1'}],
+            'content': {'mimeType': 'text/html; charset=iso-8859-1', 'text': ARTIST_PAGE.decode('utf-8')}
+        }
+    }, {
+        'request': {'method': 'GET', 'url': 'http://www.darklyrics.com/logo.png'},
+        'response': {'status': 200, 'headers': [], 'content': {'encoding': 'base64', 'text': base64.b64encode(b'PNG').decode()}}
+    }]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'log': {'entries': entries}}, f)
+
+
+def test_read_archives(tmp_path):
+    write_warc(str(tmp_path / 'capture.warc.gz'))
+    write_har(str(tmp_path / 'capture.har'))
+
+    warc_pages = list(read_archive(str(tmp_path / 'capture.warc.gz')))
+    har_pages = list(read_archive(str(tmp_path / 'capture.har')))
+
+    assert [(url, status_code) for url, status_code, _, _ in warc_pages] == [
+        (KILLERS_URL, 200), ('http://www.darklyrics.com/n/nobody.html', 404)
+    ]
+    assert warc_pages[0][2] == {'Content-Type': 'text/html; charset=utf-8'} and warc_pages[0][3] == KILLERS_PAGE
+    assert har_pages[0] == (ARTIST_URL, 200, {'Content-Type': 'text/html; charset=utf-8'}, ARTIST_PAGE)
+    assert har_pages[1][3] == b'PNG'
+
+
+def test_offline_api_reads_imported_pages(tmp_path):
+    write_warc(str(tmp_path / 'capture.warc.gz'))
+    write_har(str(tmp_path / 'capture.har'))
+    api = DarkLyricsApi(offline=True, memory_cache_size=10)
+    scraping_agent = api.helper.scraping_agent
+    scraping_agent.cached_session = requests_cache.CachedSession(str(tmp_path / 'cache'), backend='sqlite')
+
+    imported_pages = sum(
+        scraping_agent.import_pages(read_archive(str(tmp_path / name)), batch_size=1) for name in ['capture.warc.gz', 'capture.har']
+    )
+    songs = api.get_albums_info_and_lyrics_by_artist('iron maiden')
+
+    assert imported_pages == 3
+    assert [(song['album'], song['title'], song['lyrics']) for song in songs] == [
+        ('Killers', 'The Ides Of March', '[Instrumental]'),
+        ('Killers', 'Wrathchild', "I was born in a rock'n'roll world")
+    ]
+    # The album not captured is skipped, without requests to darklyrics.com
+    assert [failure['album'] for failure in api.get_failures()] == ['Piece Of Mind']
+    assert api.get_failures()[0]['error'] == 'CacheMissException'
@@ -0,0 +1,39 @@
+from metalparser.libs.autocomplete import ArtistAutocomplete
+
+
+def get_index_page(*artists):
+    links = ''.join('<a href="{0}.html">{0}</a><br/>'.format(artist) for artist in artists)
+
+    return '<html><body><div class="artists">{}</div></body></html>'.format(links).encode('utf-8')
+
+
+def test_complete(fake_site, api):
+    cached_session = fake_site({
+        'http://www.darklyrics.com/m.html': get_index_page('MÖTLEY CRÜE', 'MOTÖRHEAD', 'MORBID ANGEL', 'MOTIONLESS IN WHITE'),
+        'http://www.darklyrics.com/19.html': get_index_page('1349', '3 INCHES OF BLOOD')
+    })
+    autocomplete = ArtistAutocomplete(api(cached_session))
+
+    assert autocomplete.complete('Mot') == ['Motionless In White', 'Mötley Crüe', 'Motörhead']
+    assert autocomplete.complete('mötley c') == ['Mötley Crüe']
+    assert autocomplete.complete('motor') == ['Motörhead']
+    assert autocomplete.complete('mo', limit=2) == ['Morbid Angel', 'Motionless In White']
+    assert autocomplete.complete('13') == ['1349']
+    assert autocomplete.complete('xyz') == [] and autocomplete.complete('!') == []
+    # The index pages are fetched only once
+    assert len(cached_session.site.requested_urls) == 27
+    assert autocomplete.get_stats()['artists'] == 6
+
+
+def test_background_refresh(fake_site, api):
+    pages = {'http://www.darklyrics.com/v.html': get_index_page('VENOM')}
+    cached_session = fake_site(pages)
+    autocomplete = ArtistAutocomplete(api(cached_session))
+    assert autocomplete.complete('ven') == ['Venom']
+
+    cached_session.cache.clear()
+    pages['http://www.darklyrics.com/v.html'] = get_index_page('VENOM', 'VENOM PRISON')
+    autocomplete.start_refresh(interval=60)
+    autocomplete.stop_refresh()
+
+    assert autocomplete.complete('ven') == ['Venom', 'Venom Prison']
@@ -0,0 +1,186 @@
+import time
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from metalparser.common import scraping
+from metalparser.common.exceptions import CacheMissException
+from metalparser.common.ratecontrol import AdaptiveRateController
+from metalparser.common.scraping import ScrapingAgent, decode_content, get_declared_encoding
+from metalparser.darklyrics import DarkLyricsApi
+
+
+URL = 'http://www.darklyrics.com/lyrics/ironmaiden/killers.html'
+
+
+class CountingDict(dict):
+    lookups = 0
+
+    def __getitem__(self, key):
+        self.lookups += 1
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        self.lookups += 1
+        return super().__contains__(key)
+
+
+def get_agent(cached_session, memory_cache_size=0):
+    agent = ScrapingAgent(memory_cache_size=memory_cache_size)
+    agent.cached_session = cached_session
+    cached_session.get(URL)
+    cached_session.cache.responses = CountingDict(cached_session.cache.responses)
+
+    return agent
+
+
+def test_cached_page_is_read_with_a_single_lookup(fake_site):
+    cached_session = fake_site({URL: b'<html>Killers</html>'})
+    agent = get_agent(cached_session)
+
+    assert agent.get_content_from_url(URL) == b'<html>Killers</html>'
+    assert cached_session.cache.responses.lookups == 1 and len(cached_session.site.requested_urls) == 1
+    assert agent.get_last_response().from_cache is True
+    assert agent.get_cached_content('http://www.darklyrics.com/n/nothing.html') is None
+
+
+def test_memory_tier(fake_site):
+    cached_session = fake_site({URL: b'<html>Killers</html>'})
+    agent = get_agent(cached_session, memory_cache_size=1)
+
+    for _ in range(3):
+        assert agent.get_content_from_url(URL) == b'<html>Killers</html>'
+
+    assert cached_session.cache.responses.lookups == 1
+    assert agent.get_metrics()['memory_cache'] == {'entries': 1, 'hits': 2, 'misses': 1}
+
+
+def test_expired_page_is_fetched_again(fake_site):
+    cached_session = fake_site({URL: b'<html>Killers</html>'})
+    agent = get_agent(cached_session, memory_cache_size=1)
+    responses = cached_session.cache.responses
+    for key, (cached_response, timestamp) in list(responses.items()):
+        responses[key] = (cached_response, timestamp - timedelta(seconds=agent.cache_validity + 1))
+
+    assert agent.get_content_from_url(URL) == b'<html>Killers</html>'
+    assert len(cached_session.site.requested_urls) == 2
+    assert all(datetime.utcnow() - timestamp < timedelta(seconds=60) for _, timestamp in responses.values())
+
+
+def test_get_declared_encoding():
+    page = '<html><head><meta charset="ISO-8859-1"><title>Vhäldemar</title></head></html>'.encode('latin-1')
+
+    assert get_declared_encoding(page, {'Content-Type': 'text/html; charset=UTF-8'}) == 'utf-8'
+    assert get_declared_encoding(page, {'Content-Type': 'text/html'}) == 'iso8859-1'
+    assert get_declared_encoding(b'<html></html>', {'Content-Type': 'text/html; charset=whatever'}) is None
+    # Wrong or missing declarations fall back to the encoding detection
+    assert decode_content(page, {'Content-Type': 'text/html; charset=utf-8'}).endswith('<title>Vhäldemar</title></head></html>')
+
+
+def test_cached_page_is_decoded_once(fake_site, monkeypatch):
+    decoded_pages = []
+
+    def count_decode_content(content, headers):
+        decoded_pages.append(content)
+        return decode_content(content, headers)
+
+    monkeypatch.setattr(scraping, 'decode_content', count_decode_content)
+    cached_session = fake_site({URL: 'Pär Johansson'.encode('utf-8')})
+    agent = get_agent(cached_session, memory_cache_size=1)
+
+    assert [agent.get_text_from_url(URL) for _ in range(3)] == ['Pär Johansson'] * 3
+    assert len(decoded_pages) == 1
+    assert agent.get_page_from_url(URL).text == 'Pär Johansson'
+
+
+def test_cache_only_policy(fake_site):
+    missing_url = 'http://www.darklyrics.com/lyrics/ironmaiden/powerslave.html'
+    cached_session = fake_site({URL: b'<html>Killers</html>', missing_url: b'<html>Powerslave</html>'})
+    agent = get_agent(cached_session)
+    agent.prefetch_rate_controller = AdaptiveRateController(initial_rate=60000, max_rate=60000)
+    responses = cached_session.cache.responses
+    for key, (cached_response, timestamp) in list(responses.items()):
+        responses[key] = (cached_response, timestamp - timedelta(seconds=agent.cache_validity + 1))
+
+    with agent.cache_policy():
+        with pytest.raises(CacheMissException):
+            agent.get_content_from_url(URL)
+        with pytest.raises(CacheMissException):
+            agent.get_content_from_url(missing_url)
+    with agent.cache_policy(serve_stale=True, fetch_misses=True):
+        assert agent.get_content_from_url(URL) == b'<html>Killers</html>'
+        with pytest.raises(CacheMissException):
+            agent.get_content_from_url(missing_url)
+
+    # The missing and the stale pages are fetched in the background, so later lookups are served from the cache
+    for _ in range(100):
+        if len(cached_session.site.requested_urls) == 3:
+            break
+        time.sleep(0.05)
+    with agent.cache_policy():
+        assert agent.get_content_from_url(missing_url) == b'<html>Powerslave</html>'
+        assert agent.get_content_from_url(URL) == b'<html>Killers</html>'
+    assert sorted(cached_session.site.requested_urls) == sorted([URL, URL, missing_url])
+    assert agent.get_metrics()['cache_policy'] == {'cache_misses': 3, 'stale_pages': 1, 'queued_misses': 2}
+
+
+def test_stale_page_is_kept_when_it_cannot_be_fetched(fake_site, monkeypatch):
+    import requests
+
+    def send(request, **kwargs):
+        raise requests.exceptions.ConnectionError('Connection refused')
+
+    cached_session = fake_site({URL: b'<html>Killers</html>'})
+    agent = get_agent(cached_session)
+    agent.max_retries = 0
+    agent.rate_controller = AdaptiveRateController(initial_rate=60000, max_rate=60000)
+    responses = cached_session.cache.responses
+    for key, (cached_response, timestamp) in list(responses.items()):
+        responses[key] = (cached_response, timestamp - timedelta(seconds=agent.cache_validity + 1))
+    monkeypatch.setattr(cached_session.site, 'send', send)
+
+    with agent.cache_policy(cache_only=False, serve_stale=True):
+        assert agent.get_content_from_url(URL) == b'<html>Killers</html>'
+        assert agent.get_content_from_url(URL) == b'<html>Killers</html>'
+    assert agent.get_metrics()['cache_policy']['stale_pages'] == 2
+
+
+def test_deadline_policy(fake_site):
+    cached_session = fake_site({URL: b'<html>Killers</html>'})
+    agent = ScrapingAgent()
+    agent.cached_session = cached_session
+    agent.rate_controller = AdaptiveRateController(initial_rate=1, min_rate=1, max_rate=1)
+    agent.rate_controller.acquire()
+
+    start = time.monotonic()
+    with agent.cache_policy(cache_only=False, deadline=0.2):
+        with pytest.raises(CacheMissException):
+            agent.get_content_from_url(URL)
+    assert time.monotonic() - start < 0.5
+    assert cached_session.site.requested_urls == []
+
+
+def test_deadline_policy_bounds_the_whole_block(fake_site):
+    urls = [URL, URL + '?page=2', URL + '?page=3']
+    cached_session = fake_site(delay=0.15)
+    agent = ScrapingAgent()
+    agent.cached_session = cached_session
+    agent.rate_controller = AdaptiveRateController(initial_rate=60000, max_rate=60000)
+
+    with agent.cache_policy(cache_only=False, deadline=0.2):
+        agent.get_content_from_url(urls[0])
+        agent.get_content_from_url(urls[1])
+        with pytest.raises(CacheMissException):
+            agent.get_content_from_url(urls[2])
+
+    assert cached_session.site.requested_urls == urls[:2]
+
+
+def test_cache_path_and_base_url(tmpdir):
+    cache_path = str(tmpdir.join('stand_in_cache'))
+    api = DarkLyricsApi(cache_path=cache_path, base_url='http://127.0.0.1:8080/')
+
+    assert api.helper.get_artist_url('iron maiden') == 'http://127.0.0.1:8080/i/ironmaiden.html'
+    assert api.helper.scraping_agent.get_cached_session() is not None
+    assert tmpdir.join('stand_in_cache.sqlite').check()
@@ -0,0 +1,105 @@
+import io
+import json
+import logging
+
+import pytest
+
+from metalparser.cli import export_artists, read_artists, read_checkpoint
+from metalparser.libs.exporters import JsonLinesExporter, RecordsExporter, get_exporter
+
+
+class FakeApi:
+    logger = logging.getLogger('metalparser_test')
+
+    def get_albums_info(self, artist, title_only=False):
+        return ['First', 'Second']
+
+    def get_album_info_and_lyrics(self, album, artist):
+        return [{'artist': artist, 'album': album, 'title': 'Song {}'.format(no), 'track_no': no} for no in range(1, 4)]
+
+
+def test_read_artists_skips_blank_and_comment_lines():
+    source = io.StringIO('iron maiden\n\n# a comment\n  pantera  \n')
+
+    assert list(read_artists(source)) == ['iron maiden', 'pantera']
+
+
+def test_export_artists_to_jsonl_with_checkpoint(tmpdir):
+    output = str(tmpdir.join('out.jsonl'))
+    checkpoint = str(tmpdir.join('out.checkpoint'))
+    exporter = get_exporter('jsonl', output, chunk_size=4)
+
+    exported_artists = export_artists(FakeApi(), iter(['kamelot', 'venom']), exporter, workers=2, checkpoint=checkpoint)
+    exporter.close()
+
+    with open(output) as f:
+        records = [json.loads(line) for line in f]
+
+    assert exported_artists == 2 and len(records) == 12
+    assert read_checkpoint(checkpoint) == {'kamelot', 'venom'}
+
+
+class Interrupted(Exception):
+    pass
+
+
+class InterruptedExporter(JsonLinesExporter):
+    """Exporter interrupted when receiving the records of an artist."""
+
+    def __init__(self, path, interrupted_artist, chunk_size=1000):
+        super().__init__(path, chunk_size)
+        self.interrupted_artist = interrupted_artist
+
+    def write(self, records):
+        if any(record['artist'] == self.interrupted_artist for record in records):
+            raise Interrupted()
+        return super().write(records)
+
+
+def test_resumed_export_does_not_duplicate_records(tmpdir):
+    output = str(tmpdir.join('out.jsonl'))
+    checkpoint = str(tmpdir.join('out.checkpoint'))
+    # The chunk size doesn't match the albums, a flush would otherwise write part of an artist
+    exporter = InterruptedExporter(output, 'venom', chunk_size=2)
+    try:
+        export_artists(FakeApi(), iter(['kamelot', 'venom', 'emperor']), exporter, checkpoint=checkpoint)
+    except Interrupted:
+        pass
+    exporter.close()
+    assert read_checkpoint(checkpoint) == {'kamelot'}
+
+    exporter = get_exporter('jsonl', output, chunk_size=2, append=True)
+    artists = (artist for artist in ['kamelot', 'venom', 'emperor'] if artist not in read_checkpoint(checkpoint))
+    export_artists(FakeApi(), artists, exporter, checkpoint=checkpoint)
+    exporter.close()
+
+    with open(output) as f:
+        records = [json.loads(line) for line in f]
+
+    assert len(records) == 18
+    assert len({(record['artist'], record['album'], record['track_no']) for record in records}) == 18
+    assert read_checkpoint(checkpoint) == {'kamelot', 'venom', 'emperor'}
+
+
+def test_csv_exporter_writes_header_once_when_appending(tmpdir):
+    output = str(tmpdir.join('out.csv'))
+    record = {'artist': 'Venom', 'album': 'Black Metal', 'title': 'Countess Bathory', 'track_no': 6}
+
+    for append in (False, True):
+        exporter = get_exporter('csv', output, append=append)
+        exporter.write([record])
+        exporter.close()
+
+    with open(output) as f:
+        lines = f.read().splitlines()
+
+    assert len(lines) == 3 and lines[0].startswith('artist,album')
+
+
+def test_incomplete_exporter_fails_when_created(tmpdir):
+    class IncompleteExporter(RecordsExporter):
+        def _close(self):
+            pass
+
+    with pytest.raises(TypeError):
+        IncompleteExporter(str(tmpdir.join('out.jsonl')))
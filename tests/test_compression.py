@@ -0,0 +1,65 @@
+import sqlite3
+import sys
+
+import pytest
+
+from requests_cache.backends.storage.dbdict import DbDict, DbPickleDict
+
+from metalparser.common.compression import ZSTD_CODEC, CompressedPickleDict, migrate_cache
+
+
+TEMPLATE = '<html><head><title>{} LYRICS</title></head>\n<body>\n<div class="lyrics">\n{}\n</div>\n' \
+           '<div class="thanks">Thanks to the submitters for sending these lyrics.</div>\n</body></html>\n'
+
+
+def get_entry(number):
+    lyrics = '<br />\n'.join('Line {} of the song number {}'.format(line, number) for line in range(40))
+
+    return {'_content': TEMPLATE.format(number, lyrics).encode('utf-8'), 'status_code': 200}, number
+
+
+def get_raw_values(path):
+    with sqlite3.connect(path) as connection:
+        return [bytes(value) for value, in connection.execute('select value from responses order by rowid')]
+
+
+def test_entries_are_compressed(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    DbPickleDict(path, 'responses')['legacy'] = get_entry(0)
+    responses = CompressedPickleDict(path, 'responses')
+    responses['compressed'] = get_entry(1)
+
+    assert responses['legacy'] == get_entry(0) and responses['compressed'] == get_entry(1)
+    legacy_value, compressed_value = get_raw_values(path)
+    assert len(compressed_value) < len(legacy_value) / 2
+
+
+def test_zstd_entries_are_missing_without_zstandard(tmp_path, monkeypatch):
+    path = str(tmp_path / 'cache.sqlite')
+    monkeypatch.setitem(sys.modules, 'zstandard', None)
+    responses = CompressedPickleDict(path, 'responses')
+    DbDict(path, 'responses')['zstd'] = sqlite3.Binary(ZSTD_CODEC + b'\x00\x00' + b'compressed data')
+    responses['zlib'] = get_entry(1)
+
+    with pytest.raises(KeyError):
+        responses['zstd']
+    assert responses.get('zstd') is None and responses['zlib'] == get_entry(1)
+
+
+def test_migrate_cache(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    legacy_responses = DbPickleDict(path, 'responses')
+    with legacy_responses.bulk_commit():
+        for number in range(50):
+            legacy_responses[str(number)] = get_entry(number)
+
+    result = migrate_cache(path, samples=20, batch_size=7)
+    responses = CompressedPickleDict(path, 'responses')
+
+    assert result['entries'] == 50 and result['size_after'] < result['size_before']
+    assert all(responses[str(number)] == get_entry(number) for number in range(50))
+    # Migrating again replaces the dictionary, which is the only one kept
+    migrate_cache(path, samples=20)
+    responses = CompressedPickleDict(path, 'responses')
+    assert sorted(responses.dictionaries) == ['2', 'current']
+    assert all(responses[str(number)] == get_entry(number) for number in range(50))
@@ -278,6 +278,31 @@ def test_get_albums_info_and_lyrics_by_artist_negative():
     assert 'Artist page for "{}" not found'.format(artist.title()) in str(e.value)
 
 
+def test_get_albums_info_and_lyrics_by_artist_with_workers(monkeypatch):
+    import time
+
+    api = DarkLyricsApi()
+    albums = ['First', 'Second', 'Broken', 'Third']
+
+    def get_album_info_and_lyrics(album, artist):
+        if album == 'Broken':
+            raise SongsNotFoundException('Songs not found')
+        time.sleep(0.01 * (len(albums) - albums.index(album)))  # the first albums finish last
+        return [{'album': album, 'track_no': track_no} for track_no in (1, 2)]
+
+    monkeypatch.setattr(api, 'get_albums_info', lambda artist, title_only: albums)
+    monkeypatch.setattr(api, 'get_album_info_and_lyrics', get_album_info_and_lyrics)
+    lyrics_list = api.get_albums_info_and_lyrics_by_artist('blind guardian', max_workers=4)
+
+    assert [(lyrics['album'], lyrics['track_no']) for lyrics in lyrics_list] == [
+        ('First', 1), ('First', 2), ('Second', 1), ('Second', 2), ('Third', 1), ('Third', 2)
+    ]
+    assert api.get_failures() == [{
+        'artist': 'blind guardian', 'album': 'Broken', 'song': None, 'url': None,
+        'error': 'SongsNotFoundException', 'message': 'Songs not found'
+    }]
+
+
 # -------------------- get_song_info_and_lyrics() API ---------------------- #
 
 
@@ -321,3 +346,202 @@ def test_get_song_info_and_lyrics_negative():
         api.get_song_info_and_lyrics(song=song, artist=artist)
 
     assert 'Lyrics for "{}" not found'.format(song) in str(e.value)
+
+
+# ------------------ sync_albums_info_and_lyrics_by_artist() API ------------------- #
+
+
+ARTIST_PAGE = """
+<html><head><title>IRON MAIDEN lyrics</title></head><body>
+<div class="album"><h2>album: <strong>"Killers"</strong> (1981)</h2>
+<a href="../lyrics/ironmaiden/killers.html#1">The Ides Of March</a><br/>
+<a href="../lyrics/ironmaiden/killers.html#2">Wrathchild</a><br/></div>
+<div class="album"><h2>album: <strong>"Piece Of Mind"</strong> (1983)</h2>
+<a href="../lyrics/ironmaiden/pieceofmind.html#1">Where Eagles Dare</a><br/></div>
+<div class="album"><h2>album: <strong>"Senjutsu"</strong> (2021)</h2>
+<a href="../lyrics/ironmaiden/senjutsu.html#1">Senjutsu</a><br/></div>
+</body></html>
+"""
+
+
+def test_get_discography_from_artist_page():
+    from bs4 import BeautifulSoup
+
+    api = DarkLyricsApi()
+    discography = api.helper.get_discography_from_artist_page(BeautifulSoup(ARTIST_PAGE, 'html.parser'))
+
+    assert [album['title'] for album in discography] == ['Killers', 'Piece Of Mind', 'Senjutsu']
+    assert discography[0] == {'title': 'Killers', 'type': 'album', 'release_year': '1981', 'tracks': ['The Ides Of March', 'Wrathchild']}
+
+
+def test_sync_albums_info_and_lyrics_by_artist(monkeypatch):
+    from bs4 import BeautifulSoup
+
+    api = DarkLyricsApi()
+    fetched_albums = []
+
+    def get_album_info_and_lyrics(album, artist):
+        fetched_albums.append(album)
+        return [{'album': album, 'title': 'Song', 'track_no': 1}]
+
+    monkeypatch.setattr(api.helper, 'get_artist_page', lambda artist: BeautifulSoup(ARTIST_PAGE, 'html.parser'))
+    monkeypatch.setattr(api, 'get_album_info_and_lyrics', get_album_info_and_lyrics)
+    stored_discography = [
+        {'title': 'Killers', 'type': 'album', 'release_year': '1981', 'tracks': ['The Ides Of March', 'Wrathchild']},
+        {'title': 'Piece Of Mind', 'type': 'album', 'release_year': '1983', 'tracks': []},
+        {'title': 'Somewhere In Time', 'type': 'album', 'release_year': '1986', 'tracks': ['Caught Somewhere In Time']}
+    ]
+    changeset = api.sync_albums_info_and_lyrics_by_artist('iron maiden', stored_discography)
+
+    assert fetched_albums == ['Piece Of Mind', 'Senjutsu']
+    assert changeset['unchanged'] == ['Killers'] and changeset['removed'] == ['Somewhere In Time']
+    assert changeset['changed'][0]['album'] == 'Piece Of Mind' and changeset['added'][0]['album'] == 'Senjutsu'
+    assert [album['title'] for album in changeset['discography']] == ['Killers', 'Piece Of Mind', 'Senjutsu']
+
+
+def test_sync_retries_albums_with_failed_songs(monkeypatch):
+    from bs4 import BeautifulSoup
+
+    api = DarkLyricsApi()
+
+    def get_album_info_and_lyrics(album, artist):
+        if album == 'Piece Of Mind':
+            api.add_failure(Exception('Timeout'), artist=artist, album=album, song='Where Eagles Dare')
+            return []
+        return [{'album': album, 'title': 'Song', 'track_no': 1}]
+
+    monkeypatch.setattr(api.helper, 'get_artist_page', lambda artist: BeautifulSoup(ARTIST_PAGE, 'html.parser'))
+    monkeypatch.setattr(api, 'get_album_info_and_lyrics', get_album_info_and_lyrics)
+    stored_discography = [
+        {'title': 'Killers', 'type': 'album', 'release_year': '1981', 'tracks': ['The Ides Of March', 'Wrathchild']}
+    ]
+    changeset = api.sync_albums_info_and_lyrics_by_artist('iron maiden', stored_discography)
+
+    assert changeset['failed'] == ['Piece Of Mind'] and changeset['added'][0]['album'] == 'Senjutsu'
+    assert [album['title'] for album in changeset['discography']] == ['Killers', 'Senjutsu']
+
+    # The next sync fetches the failed album again
+    changeset = api.sync_albums_info_and_lyrics_by_artist('iron maiden', changeset['discography'])
+    assert changeset['failed'] == ['Piece Of Mind'] and changeset['unchanged'] == ['Killers', 'Senjutsu']
+
+
+# ------------------------- skipping duplicate songs ------------------------- #
+
+
+DUPLICATES_ARTIST_PAGE = b"""
+<html><head><title>IRON MAIDEN lyrics</title></head><body>
+<div class="album"><h2>album: <strong>"Killers"</strong> (1981)</h2>
+<a href="../lyrics/ironmaiden/killers.html#1">Intro</a><br/>
+<a href="../lyrics/ironmaiden/killers.html#2">Wrathchild</a><br/></div>
+<div class="album"><h2>live album: <strong>"Live After Death"</strong> (1985)</h2>
+<a href="../lyrics/ironmaiden/liveafterdeath.html#1">Intro</a><br/>
+<a href="../lyrics/ironmaiden/liveafterdeath.html#2">Wrathchild (Live)</a><br/>
+<a href="../lyrics/ironmaiden/liveafterdeath.html#3">Sanctuary</a><br/></div>
+<div class="album"><h2>compilation album: <strong>"Best Of"</strong> (1990)</h2>
+<a href="../lyrics/ironmaiden/bestof.html#1">Sanctuary [Remastered]</a><br/>
+<a href="../lyrics/ironmaiden/bestof.html#2">Wrathchild - 1998 Remaster</a><br/></div>
+</body></html>
+"""
+
+KILLERS_PAGE = b"""
+<html><head><title>IRON MAIDEN - Killers</title></head><body>
+<div class="albumlyrics"><h2>album: "Killers" (1981)</h2></div>
+<div class="lyrics">
+<h3><a name="1">1. Intro</a></h3><br/>
+[Instrumental]<br/>
+<h3><a name="2">2. Wrathchild</a></h3><br/>
+I was born in a rock'n'roll world<br/>
+<br/>
+<div class="thanks">Thanks to the submitters</div>
+</div></body></html>
+"""
+
+LIVE_AFTER_DEATH_PAGE = b"""
+<html><head><title>IRON MAIDEN - Live After Death</title></head><body>
+<div class="albumlyrics"><h2>live album: "Live After Death" (1985)</h2></div>
+<div class="lyrics">
+<h3><a name="1">1. Intro</a></h3><br/>
+Scream for me Long Beach<br/>
+<h3><a name="2">2. Wrathchild (Live)</a></h3><br/>
+I was born in a rock'n'roll world<br/>
+<h3><a name="3">3. Sanctuary</a></h3><br/>
+I'm on the run<br/>
+<br/>
+<div class="thanks">Thanks to the submitters</div>
+</div></body></html>
+"""
+
+
+def test_get_albums_info_and_lyrics_by_artist_skipping_duplicates(fake_site, api):
+    base_url = 'http://www.darklyrics.com/'
+    cached_session = fake_site({
+        base_url + 'i/ironmaiden.html': DUPLICATES_ARTIST_PAGE,
+        base_url + 'lyrics/ironmaiden/killers.html': KILLERS_PAGE,
+        base_url + 'lyrics/ironmaiden/liveafterdeath.html': LIVE_AFTER_DEATH_PAGE
+    })
+    darklyrics_api = api(cached_session)
+
+    songs = darklyrics_api.get_albums_info_and_lyrics_by_artist('iron maiden', skip_duplicates=True)
+
+    # The compilation only has duplicates, so its page is never requested
+    assert base_url + 'lyrics/ironmaiden/bestof.html' not in cached_session.site.requested_urls
+    # Generic titles are not duplicates
+    assert [(song['album'], song['title'], 'duplicate_of' in song) for song in songs] == [
+        ('Killers', 'Intro', False), ('Killers', 'Wrathchild', False),
+        ('Live After Death', 'Intro', False), ('Live After Death', 'Wrathchild (Live)', True),
+        ('Live After Death', 'Sanctuary', False),
+        ('Best Of', 'Sanctuary [Remastered]', True), ('Best Of', 'Wrathchild - 1998 Remaster', True)
+    ]
+    assert songs[3]['lyrics'] == songs[1]['lyrics'] == "I was born in a rock'n'roll world"
+    assert songs[3]['duplicate_of'] == {'album': 'Killers', 'title': 'Wrathchild', 'track_no': 2}
+    assert (songs[5]['album_type'], songs[5]['track_no'], songs[5]['duplicate_of']['album']) == ('compilation album', 1, 'Live After Death')
+    assert darklyrics_api.get_duplicates_stats() == {'duplicate_tracks': 3, 'skipped_albums': 1, 'saved_fetches': 4}
+    assert darklyrics_api.get_failures() == []
+
+
+BEST_OF_PAGE = b"""
+<html><head><title>IRON MAIDEN - Best Of</title></head><body>
+<div class="albumlyrics"><h2>compilation album: "Best Of" (1990)</h2></div>
+<div class="lyrics">
+<h3><a name="1">1. Sanctuary [Remastered]</a></h3><br/>
+I'm on the run<br/>
+<h3><a name="2">2. Wrathchild - 1998 Remaster</a></h3><br/>
+I was born in a rock'n'roll world<br/>
+<br/>
+<div class="thanks">Thanks to the submitters</div>
+</div></body></html>
+"""
+
+
+def test_duplicates_of_songs_which_failed_are_fetched(fake_site, api):
+    base_url = 'http://www.darklyrics.com/'
+    # The page of the original album is missing
+    cached_session = fake_site({
+        base_url + 'i/ironmaiden.html': DUPLICATES_ARTIST_PAGE,
+        base_url + 'lyrics/ironmaiden/liveafterdeath.html': LIVE_AFTER_DEATH_PAGE,
+        base_url + 'lyrics/ironmaiden/bestof.html': BEST_OF_PAGE
+    })
+    darklyrics_api = api(cached_session)
+
+    songs = darklyrics_api.get_albums_info_and_lyrics_by_artist('iron maiden', skip_duplicates=True)
+
+    # The same songs as without skipping duplicates, only Sanctuary is shared
+    assert [(song['album'], song['title'], 'duplicate_of' in song) for song in songs] == [
+        ('Live After Death', 'Intro', False), ('Live After Death', 'Wrathchild (Live)', False),
+        ('Live After Death', 'Sanctuary', False),
+        ('Best Of', 'Sanctuary [Remastered]', True), ('Best Of', 'Wrathchild - 1998 Remaster', False)
+    ]
+    assert songs[4]['lyrics'] == "I was born in a rock'n'roll world"
+    assert [(song['album'], song['title']) for song in darklyrics_api.get_albums_info_and_lyrics_by_artist('iron maiden')] == [
+        (song['album'], song['title']) for song in songs
+    ]
+    assert darklyrics_api.get_duplicates_stats() == {'duplicate_tracks': 1, 'skipped_albums': 0, 'saved_fetches': 1}
+
+
+def test_normalize_song_title():
+    from metalparser.libs.darklyrics_utils import normalize_song_title
+
+    assert normalize_song_title('Wrathchild (Live at Donington 1992)') == 'wrathchild'
+    assert normalize_song_title('Wrathchild [2015 Remaster] (Demo)') == 'wrathchild'
+    assert normalize_song_title('Mötley Crüe - Live') == 'motley crue'
+    assert normalize_song_title('Part II (The Return)') == 'part ii the return'
@@ -0,0 +1,29 @@
+import logging
+import logging.handlers
+
+from metalparser.common.logger import MetalParserLogger
+
+
+def test_logger_setup_is_idempotent():
+    loggers = [MetalParserLogger(False).get_logger() for _ in range(5)]
+
+    assert all(logger is loggers[0] for logger in loggers)
+    assert len(loggers[0].handlers) == 1
+    assert isinstance(loggers[0].handlers[0], logging.handlers.QueueHandler)
+
+
+def test_debug_mode_does_not_configure_root_logger(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root_handlers = list(logging.getLogger().handlers)
+    loggers = [MetalParserLogger(True).get_logger() for _ in range(3)]
+
+    assert logging.getLogger().handlers == root_handlers
+    assert len(loggers[0].handlers) == 1
+    assert loggers[0].isEnabledFor(logging.DEBUG)
+
+
+def test_error_mode_skips_debug_records():
+    logger = MetalParserLogger(False).get_logger()
+
+    assert not logger.isEnabledFor(logging.DEBUG)
+    assert logger.handlers[0].level == logging.ERROR
@@ -0,0 +1,73 @@
+from metalparser.darklyrics import DarkLyricsApi
+from metalparser.libs.darklyrics_utils import parse_album_page, parse_artist_page
+from metalparser.libs.pipeline import CrawlPipeline
+
+
+ARTIST_PAGE = b"""
+<html><head><title>IRON MAIDEN lyrics</title></head><body>
+<div class="album"><h2>album: <strong>"Killers"</strong> (1981)</h2>
+<a href="../lyrics/ironmaiden/killers.html#1">The Ides Of March</a><br/>
+<a href="../lyrics/ironmaiden/killers.html#2">Wrathchild</a><br/></div>
+<div class="album"><h2>album: <strong>"Piece Of Mind"</strong> (1983)</h2>
+<a href="../lyrics/ironmaiden/pieceofmind.html#1">Where Eagles Dare</a><br/></div>
+</body></html>
+"""
+
+KILLERS_PAGE = b"""
+<html><head><title>IRON MAIDEN - Killers</title></head><body>
+<div class="albumlyrics"><h2>album: "Killers" (1981)</h2></div>
+<div class="lyrics">
+<h3><a name="1">1. The Ides Of March</a></h3><br/>
+[Instrumental]<br/>
+<h3><a name="2">2. Wrathchild</a></h3><br/>
+I was born in a rock'n'roll world<br/>
+<br/>
+<br/>
+<div class="thanks">Thanks to the submitters</div>
+</div></body></html>
+"""
+
+NOT_FOUND_PAGE = b'<html><head><title>Page not Found</title></head><body></body></html>'
+
+PAGES = {
+    'http://www.darklyrics.com/i/ironmaiden.html': ARTIST_PAGE,
+    'http://www.darklyrics.com/lyrics/ironmaiden/killers.html': KILLERS_PAGE,
+    'http://www.darklyrics.com/lyrics/ironmaiden/pieceofmind.html': b'<html><body></body></html>',
+    'http://www.darklyrics.com/n/nobody.html': NOT_FOUND_PAGE
+}
+
+
+def test_parse_artist_page():
+    albums = parse_artist_page(ARTIST_PAGE)
+
+    assert [album['title'] for album in albums] == ['Killers', 'Piece Of Mind']
+    assert albums[0]['songs'] == [
+        ('The Ides Of March', '../lyrics/ironmaiden/killers.html#1'),
+        ('Wrathchild', '../lyrics/ironmaiden/killers.html#2')
+    ]
+    assert parse_artist_page(NOT_FOUND_PAGE) is None
+
+
+def test_parse_album_page():
+    album = parse_album_page(KILLERS_PAGE)
+
+    assert (album['title'], album['type'], album['release_year']) == ('Killers', 'album', '1981')
+    assert album['lyrics'] == {1: '[Instrumental]', 2: "I was born in a rock'n'roll world"}
+
+
+def test_crawl_pipeline(monkeypatch):
+    api = DarkLyricsApi(use_cache=False)
+    monkeypatch.setattr(api.helper.scraping_agent, 'get_text_from_url', lambda url: PAGES[url].decode('utf-8'))
+
+    with CrawlPipeline(api, processes=2, batch_size=2) as pipeline:
+        results = list(pipeline.get_albums_info_and_lyrics_by_artists(['nobody', 'iron maiden']))
+
+    assert [artist for artist, _ in results] == ['nobody', 'iron maiden']
+    assert results[0][1] == []
+    # The songs of the album without lyrics are skipped, the others are kept
+    assert results[1][1] == [
+        {'artist': 'Iron Maiden', 'album': 'Killers', 'album_type': 'album', 'release_year': '1981',
+         'title': 'The Ides Of March', 'track_no': 1, 'lyrics': '[Instrumental]'},
+        {'artist': 'Iron Maiden', 'album': 'Killers', 'album_type': 'album', 'release_year': '1981',
+         'title': 'Wrathchild', 'track_no': 2, 'lyrics': "I was born in a rock'n'roll world"}
+    ]
@@ -0,0 +1,94 @@
+from metalparser.common.ratecontrol import AdaptiveRateController
+from metalparser.libs.planner import CrawlPlanner
+
+
+ARTIST_PAGE = b"""
+<html><head><title>IRON MAIDEN lyrics</title></head><body>
+<div class="album"><h2>album: <strong>"Killers"</strong> (1981)</h2>
+<a href="../lyrics/ironmaiden/killers.html#1">The Ides Of March</a><br/>
+<a href="../lyrics/ironmaiden/killers.html#2">Wrathchild</a><br/></div>
+<div class="album"><h2>album: <strong>"Piece Of Mind"</strong> (1983)</h2>
+<a href="../lyrics/ironmaiden/pieceofmind.html#1">Where Eagles Dare</a><br/></div>
+</body></html>
+"""
+
+KILLERS_PAGE = b"""
+<html><head><title>IRON MAIDEN - Killers</title></head><body>
+<div class="albumlyrics"><h2>album: "Killers" (1981)</h2></div>
+<div class="lyrics">
+<h3><a name="1">1. The Ides Of March</a></h3><br/>
+[Instrumental]<br/>
+<h3><a name="2">2. Wrathchild</a></h3><br/>
+I was born in a rock'n'roll world<br/>
+<br/>
+<br/>
+<div class="thanks">Thanks to the submitters</div>
+</div></body></html>
+"""
+
+SEARCH_PAGE = b"""
+<html><head><title>Search results</title></head><body>
+<div class="sen"><h2>Songs:</h2>
+<a href="lyrics/ironmaiden/killers.html#2">IRON MAIDEN - Wrathchild</a></div>
+</body></html>
+"""
+
+BASE_URL = 'http://www.darklyrics.com/'
+
+PAGES = {
+    BASE_URL + 'i/ironmaiden.html': ARTIST_PAGE,
+    BASE_URL + 'lyrics/ironmaiden/killers.html': KILLERS_PAGE,
+    BASE_URL + 'lyrics/ironmaiden/pieceofmind.html': b'<html><body></body></html>',
+    BASE_URL + 'search?q=iron+maiden+wrathchild': SEARCH_PAGE
+}
+
+
+def test_plan_checks_the_cache_without_requests(fake_site, api):
+    cached_session = fake_site(PAGES)
+    for path in ['i/ironmaiden.html', 'lyrics/ironmaiden/killers.html', 'search?q=iron+maiden+wrathchild']:
+        cached_session.get(BASE_URL + path)
+
+    plan = CrawlPlanner(api(cached_session)).plan(artists=['iron maiden', 'Iron Maiden', 'venom'], songs=[('wrathchild', 'iron maiden')])
+
+    assert len(cached_session.site.requested_urls) == 3
+    assert plan.artists == ['iron maiden', 'Iron Maiden', 'venom']
+    # The album found by the search is already part of the plan
+    assert list(plan.urls) == [
+        BASE_URL + 'i/ironmaiden.html',
+        BASE_URL + 'lyrics/ironmaiden/killers.html',
+        BASE_URL + 'lyrics/ironmaiden/pieceofmind.html',
+        BASE_URL + 'v/venom.html',
+        BASE_URL + 'search?q=iron+maiden+wrathchild'
+    ]
+    # The albums of Venom are estimated with the mean of the cached artists
+    report = plan.get_report()
+    assert report['urls_by_kind'] == {'artist': 2, 'album': 2, 'search': 1}
+    assert (report['cached_urls'], report['estimated_unknown_urls'], report['estimated_requests']) == (3, 2, 4)
+    assert report['cache_hit_rate'] == 3 / 7
+    assert abs(report['estimated_seconds'] - 4 * 60 / 60000) < 1e-9
+
+
+def test_plan_estimates_seconds_with_the_rate_increase(fake_site, api):
+    darklyrics_api = api(fake_site())
+    darklyrics_api.helper.scraping_agent.rate_controller = AdaptiveRateController(initial_rate=10, max_rate=30, increase=10)
+
+    plan = CrawlPlanner(darklyrics_api).plan(songs=[('wrathchild', 'iron maiden'), ('killers', 'iron maiden')])
+
+    # Two searches and the two album pages behind them
+    assert plan.get_estimated_requests() == 4
+    assert abs(plan.estimated_seconds - (6 + 3 + 2 + 2)) < 1e-9
+
+
+def test_execute_fetches_each_page_once(fake_site, api):
+    cached_session = fake_site(PAGES)
+    planner = CrawlPlanner(api(cached_session))
+
+    plan = planner.plan(artists=['iron maiden', 'Iron Maiden'], songs=[('wrathchild', 'iron maiden')])
+    results = list(planner.execute(plan, processes=1, fetch_workers=1))
+
+    assert [key for key, _ in results] == ['iron maiden', 'Iron Maiden', ('wrathchild', 'iron maiden')]
+    assert [song['title'] for song in results[0][1]] == ['The Ides Of March', 'Wrathchild']
+    assert results[2][1]['lyrics'] == "I was born in a rock'n'roll world"
+    assert sorted(cached_session.site.requested_urls) == sorted(PAGES)
+    # The URLs known by the plan are fetched first, the album pages of the artist are known only after them
+    assert cached_session.site.requested_urls[:2] == list(plan.urls)
@@ -0,0 +1,61 @@
+import threading
+import time
+
+from metalparser.libs.prefetch import Prefetcher
+
+
+ARTIST_PAGE = b"""
+<html><head><title>IRON MAIDEN lyrics</title></head><body>
+<div class="album"><h2>album: <strong>"Killers"</strong> (1981)</h2>
+<a href="../lyrics/ironmaiden/killers.html#1">The Ides Of March</a><br/></div>
+<div class="album"><h2>album: <strong>"Piece Of Mind"</strong> (1983)</h2>
+<a href="../lyrics/ironmaiden/pieceofmind.html#1">Where Eagles Dare</a><br/></div>
+</body></html>
+"""
+
+
+def test_prefetch_popular_artists(fake_site, api):
+    cached_session = fake_site({'http://www.darklyrics.com/i/ironmaiden.html': ARTIST_PAGE})
+    cached_session.get('http://www.darklyrics.com/lyrics/ironmaiden/killers.html')
+    prefetcher = Prefetcher(api(cached_session))
+    for artist in ['Iron Maiden', 'iron maiden', 'venom']:
+        prefetcher.record_hit(artist)
+
+    assert prefetcher.get_popular_artists(limit=1) == ['iron maiden']
+    prefetcher.prefetch_popular(limit=1)
+    prefetcher.wait()
+
+    assert cached_session.site.requested_urls == [
+        'http://www.darklyrics.com/lyrics/ironmaiden/killers.html',
+        'http://www.darklyrics.com/i/ironmaiden.html',
+        'http://www.darklyrics.com/lyrics/ironmaiden/pieceofmind.html'
+    ]
+    assert prefetcher.get_stats() == {
+        'queued_artists': 0, 'prefetched_artists': 1, 'fetched_pages': 2, 'cached_pages': 1, 'failed_pages': 0
+    }
+
+
+def test_prefetch_never_fetches_in_foreground(fake_site, api, monkeypatch):
+    cached_session = fake_site({'http://www.darklyrics.com/i/ironmaiden.html': ARTIST_PAGE})
+    # Pages are fetched but not stored, as block pages
+    monkeypatch.setattr(cached_session.cache, 'save_response', lambda *args, **kwargs: None)
+    prefetcher = Prefetcher(api(cached_session))
+    prefetcher.prefetch(['iron maiden'])
+    prefetcher.wait()
+
+    assert cached_session.site.requested_urls == ['http://www.darklyrics.com/i/ironmaiden.html']
+    assert prefetcher.get_stats()['fetched_pages'] == 1
+
+
+def test_foreground_requests_preempt_prefetch(fake_site, api):
+    cached_session = fake_site(delay=0.2)
+    scraping_agent = api(cached_session).helper.scraping_agent
+
+    foreground = threading.Thread(target=scraping_agent.get_content_from_url, args=('http://www.darklyrics.com/a.html',))
+    foreground.start()
+    time.sleep(0.05)
+    assert scraping_agent.prefetch_url('http://www.darklyrics.com/b.html') is True
+    foreground.join()
+
+    assert cached_session.site.requested_urls == ['http://www.darklyrics.com/a.html', 'http://www.darklyrics.com/b.html']
+    assert scraping_agent.prefetch_url('http://www.darklyrics.com/b.html') is False
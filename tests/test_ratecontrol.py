@@ -0,0 +1,68 @@
+import time
+
+from types import SimpleNamespace
+
+from metalparser.common.ratecontrol import AdaptiveRateController, is_block_page, parse_retry_after
+
+
+def make_response(status_code=200, content=b'<html><head><title>Lyrics</title></head></html>', headers=None):
+    return SimpleNamespace(status_code=status_code, content=content, headers=headers or {})
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('120') == 120
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+
+def test_rate_increases_while_healthy():
+    controller = AdaptiveRateController(initial_rate=20, max_rate=22, increase=1)
+    for _ in range(5):
+        controller.on_response(make_response(), latency=0.1)
+
+    assert controller.get_rate() == 22
+    assert controller.get_metrics()['healthy_responses'] == 5
+
+
+def test_rate_decreases_on_unhealthy_responses():
+    controller = AdaptiveRateController(initial_rate=40, min_rate=4, max_rate=40, decrease_factor=0.5, max_latency=5)
+    controller.on_response(make_response(status_code=429), latency=0.1)
+    assert controller.get_rate() == 20
+    controller.on_response(make_response(content=b'<html><body><div class="g-recaptcha" data-sitekey="x"></div></body></html>'), latency=0.1)
+    assert controller.get_rate() == 10
+    controller.on_response(make_response(), latency=10)
+    assert controller.get_rate() == 5
+    controller.on_failure()
+    assert controller.get_rate() == 4
+
+    metrics = controller.get_metrics()
+    assert (metrics['throttled_responses'], metrics['slow_responses'], metrics['failed_requests']) == (2, 1, 1)
+
+
+def test_block_pages_are_recognized_by_their_structure():
+    assert is_block_page(make_response(status_code=403))
+    assert is_block_page(make_response(content=b'<html><head><title>Access Denied</title></head></html>'))
+    assert is_block_page(make_response(content=b'<script src="/cdn-cgi/challenge-platform/h/b/orchestrate"></script>'))
+    # The same words in artist, album or song names are not a block page
+    assert not is_block_page(make_response(content=b'<html><head><title>ACCESS DENIED lyrics</title></head></html>'))
+    assert not is_block_page(make_response(content=b'<h3><a name="1">1. Too Many Requests (Captcha Remix)</a></h3>'))
+
+
+def test_retry_after_is_honored():
+    controller = AdaptiveRateController(initial_rate=6000, max_rate=6000)
+    controller.acquire()
+    controller.on_response(make_response(status_code=503, headers={'Retry-After': '1'}), latency=0.1)
+
+    start = time.monotonic()
+    controller.acquire()
+    assert time.monotonic() - start >= 0.9
+
+
+def test_acquire_gives_up_after_timeout():
+    controller = AdaptiveRateController(initial_rate=1, min_rate=1, max_rate=1)
+    assert controller.acquire(timeout=0) is True
+
+    start = time.monotonic()
+    assert controller.acquire(timeout=0.2) is False
+    assert time.monotonic() - start < 0.1
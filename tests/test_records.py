@@ -0,0 +1,79 @@
+import tracemalloc
+
+from metalparser.common.records import RecordsFactory
+
+
+ALBUMS = 500
+TRACKS_PER_ALBUM = 20
+
+
+def build_dict_records():
+    return [{
+        "artist": "Iron Maiden",
+        "album": "Album {}".format(album_no),
+        "album_type": "album",
+        "release_year": str(1980 + album_no % 40),
+        "title": "Song {}".format(track_no),
+        "track_no": track_no,
+        "lyrics": ""
+    } for album_no in range(ALBUMS) for track_no in range(1, TRACKS_PER_ALBUM + 1)]
+
+
+def build_compact_records():
+    factory = RecordsFactory()
+    records = []
+    for album_no in range(ALBUMS):
+        album_record = factory.get_album_record("Iron Maiden", "Album {}".format(album_no), "album", str(1980 + album_no % 40))
+        for track_no in range(1, TRACKS_PER_ALBUM + 1):
+            records.append(factory.get_song_record(album_record, "Song {}".format(track_no), track_no, ""))
+
+    return records
+
+
+def measure_memory(build_records):
+    tracemalloc.start()
+    records = build_records()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+
+    return size
+
+
+def test_song_record_is_dict_compatible():
+    factory = RecordsFactory()
+    album_record = factory.get_album_record('Venom', 'Eine Kleine Nachtmusik (Live)', 'album', '1986')
+    record = factory.get_song_record(album_record, 'Nightmare', 5, 'Fools scream out destiny')
+
+    assert record['release_year'] == '1986' and record.release_year == 1986
+    assert record.to_dict() == dict(record) == {
+        'artist': 'Venom',
+        'album': 'Eine Kleine Nachtmusik (Live)',
+        'album_type': 'album',
+        'release_year': '1986',
+        'title': 'Nightmare',
+        'track_no': 5,
+        'lyrics': 'Fools scream out destiny'
+    }
+    assert not hasattr(record, '__dict__')
+    assert 'duplicate_of' not in record
+
+    duplicate_of = {'album': 'Eine Kleine Nachtmusik (Live)', 'title': 'Nightmare', 'track_no': 5}
+    duplicate = factory.get_song_record(album_record, 'Nightmare (Live)', 6, record.lyrics, duplicate_of=duplicate_of)
+    assert duplicate['duplicate_of'] == duplicate_of and duplicate.to_dict()['duplicate_of'] == duplicate_of
+
+
+def test_album_records_are_shared():
+    factory = RecordsFactory()
+    first = factory.get_album_record('Kamelot', 'Haven', 'album', '2015')
+    second = factory.get_album_record('Kamelot', 'Haven', 'album', '2015')
+    unknown_year = factory.get_album_record('Kamelot', '', 'non-album songs', '')
+
+    assert first is second and unknown_year.release_year is None
+
+
+def test_compact_records_memory_benchmark():
+    dict_records_size = measure_memory(build_dict_records)
+    compact_records_size = measure_memory(build_compact_records)
+
+    assert compact_records_size < dict_records_size / 2
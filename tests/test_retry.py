@@ -0,0 +1,115 @@
+import pytest
+import requests
+
+from types import SimpleNamespace
+
+from metalparser.common import scraping
+from metalparser.common.exceptions import CacheMissException, CircuitOpenException, FetchException
+from metalparser.common.ratecontrol import AdaptiveRateController
+from metalparser.common.retry import CircuitBreaker, get_backoff_delay
+from metalparser.common.scraping import ScrapingAgent
+
+
+class FlakySession:
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self.calls = 0
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls += 1
+        if self.failures:
+            failure = self.failures.pop(0)
+            if isinstance(failure, Exception):
+                raise failure
+            return SimpleNamespace(status_code=failure, content=b'', headers={})
+        return SimpleNamespace(status_code=200, content=b'<html>ok</html>', headers={})
+
+
+def get_agent(monkeypatch, session, max_retries=3):
+    agent = ScrapingAgent(use_cache=False, max_retries=max_retries)
+    agent.session = session
+    agent.rate_controller = AdaptiveRateController(initial_rate=60000, max_rate=60000)
+    monkeypatch.setattr(scraping, 'get_backoff_delay', lambda attempt: 0)
+
+    return agent
+
+
+def test_get_backoff_delay_is_jittered_and_capped():
+    delays = [get_backoff_delay(3, backoff_factor=1) for _ in range(100)]
+
+    assert all(4 <= delay <= 8 for delay in delays) and len(set(delays)) > 1
+    assert get_backoff_delay(20, max_delay=60) <= 60
+
+
+def test_transient_failures_are_retried(monkeypatch):
+    session = FlakySession([requests.exceptions.ReadTimeout(), 503])
+    agent = get_agent(monkeypatch, session)
+
+    assert agent.get_content_from_url('http://www.darklyrics.com/a.html') == b'<html>ok</html>'
+    assert session.calls == 3
+
+
+def test_fetch_exception_after_max_retries(monkeypatch):
+    session = FlakySession([requests.exceptions.ConnectionError()] * 3)
+    agent = get_agent(monkeypatch, session, max_retries=2)
+
+    with pytest.raises(FetchException) as e:
+        agent.get_content_from_url('http://www.darklyrics.com/a.html')
+
+    assert e.value.url == 'http://www.darklyrics.com/a.html' and session.calls == 3
+
+
+def test_circuit_breaker_fails_fast(monkeypatch):
+    session = FlakySession([500] * 5)
+    agent = get_agent(monkeypatch, session, max_retries=10)
+
+    with pytest.raises(CircuitOpenException):
+        agent.get_content_from_url('http://www.darklyrics.com/a.html')
+
+    assert session.calls == 5 and agent.get_metrics()['circuit_state'] == 'open'
+
+
+def test_circuit_breaker_trial_request():
+    circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+    circuit_breaker.on_failure()
+    circuit_breaker.check()
+    circuit_breaker.on_failure()
+
+    assert circuit_breaker.get_state() == 'half-open'
+    circuit_breaker.check()
+    with pytest.raises(CircuitOpenException):
+        circuit_breaker.check()  # only one trial request at a time
+    circuit_breaker.on_success()
+    assert circuit_breaker.get_state() == 'closed'
+
+
+def test_circuit_breaker_trial_released_when_deadline_exceeded(monkeypatch):
+    session = FlakySession([])
+    agent = get_agent(monkeypatch, session)
+    agent.circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    agent.circuit_breaker.on_failure()
+    agent.rate_controller = AdaptiveRateController(initial_rate=1, min_rate=1, max_rate=1)
+    agent.rate_controller.acquire()
+
+    # The trial request is let through the circuit, then gives up waiting for the rate limit
+    with agent.cache_policy(cache_only=False, deadline=0.05):
+        with pytest.raises(CacheMissException):
+            agent.get_content_from_url('http://www.darklyrics.com/a.html')
+    assert session.calls == 0 and agent.get_metrics()['circuit_state'] == 'half-open'
+
+    agent.rate_controller = AdaptiveRateController(initial_rate=60000, max_rate=60000)
+    assert agent.get_content_from_url('http://www.darklyrics.com/a.html') == b'<html>ok</html>'
+    assert agent.get_metrics()['circuit_state'] == 'closed'
+
+
+def test_block_pages_are_retried_and_never_cached(monkeypatch, fake_site):
+    url = 'http://www.darklyrics.com/a.html'
+    cached_session = fake_site({url: b'<html><head><title>Access Denied</title></head></html>'})
+    agent = get_agent(monkeypatch, None, max_retries=1)
+    agent.cached_session = cached_session
+
+    with pytest.raises(FetchException):
+        agent.get_content_from_url(url)
+
+    assert len(cached_session.site.requested_urls) == 2
+    assert agent.get_cached_content(url) is None
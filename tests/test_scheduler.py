@@ -0,0 +1,57 @@
+import threading
+import time
+
+import pytest
+
+from metalparser.common.exceptions import DeadlineExceededException
+from metalparser.common.scheduler import RequestScheduler
+
+
+def run_requests(scheduler, requests, hold_time=0.01):
+    """Queue the requests while the turn is held, then returns the order in which they are served."""
+
+    served = []
+    threads = []
+    with scheduler.turn('bulk'):
+        for name, priority, deadline in requests:
+            def request(name=name, priority=priority, deadline=deadline):
+                try:
+                    with scheduler.turn(priority, deadline=deadline):
+                        served.append(name)
+                        time.sleep(hold_time)
+                except DeadlineExceededException:
+                    served.append(name + ' expired')
+            threads.append(threading.Thread(target=request))
+            threads[-1].start()
+            time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+    return served
+
+
+def test_weighted_fair_queuing():
+    scheduler = RequestScheduler(weights={'interactive': 3, 'bulk': 1})
+    requests = [('bulk {}'.format(i), 'bulk', None) for i in range(4)] + [('interactive {}'.format(i), 'interactive', None) for i in range(6)]
+    served = run_requests(scheduler, requests)
+
+    # Interactive requests get three turns for each bulk turn, even if queued later
+    assert [name.split()[0] for name in served[:8]].count('interactive') == 6
+    assert [name.split()[0] for name in served[8:]] == ['bulk', 'bulk']
+    assert scheduler.get_stats()['interactive']['requests'] == 6
+
+
+def test_deadlines():
+    scheduler = RequestScheduler(weights={'interactive': 1, 'bulk': 100}, urgency_window=0.5)
+    requests = [('expired', 'interactive', 0.01)] + [('bulk {}'.format(i), 'bulk', None) for i in range(5)] + [('urgent', 'interactive', 0.3)]
+    served = run_requests(scheduler, requests, hold_time=0.05)
+
+    # The request with a close deadline overtakes the bulk ones, the other one can't be served in time
+    assert [name for name in served if 'expired' not in name][0] == 'urgent' and 'expired expired' in served
+    assert scheduler.get_stats()['interactive']['expired_requests'] == 1
+
+
+def test_unknown_priority():
+    with pytest.raises(ValueError):
+        with RequestScheduler().turn('whatever'):
+            pass
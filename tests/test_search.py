@@ -0,0 +1,76 @@
+from metalparser.libs.search import LyricsIndex, tokenize
+
+
+SONGS = [
+    {'artist': 'Venom', 'album': 'Black Metal', 'title': 'Countess Bathory', 'track_no': 6,
+     'lyrics': 'In the dungeons of the castle\nThe countess bathes in blood'},
+    {'artist': 'Venom', 'album': 'Eine Kleine Nachtmusik (Live)', 'title': 'Nightmare', 'track_no': 5,
+     'lyrics': "Fools scream out destiny\nDon't you know the nightmare"},
+    {'artist': 'Žalvarinis', 'album': 'Žalvarinis', 'title': 'Stovi Stovi Berželis', 'track_no': 1,
+     'lyrics': 'Ir atjojo bernelis prie berželio'}
+]
+
+
+def test_tokenize_lyrics():
+    assert tokenize("Don't scream, FOOLS!") == ['dont', 'scream', 'fools']
+    assert tokenize('Stovi stovi berželis') == ['stovi', 'stovi', 'berzelis']
+
+
+def test_search_ranks_and_matches_phrases():
+    index = LyricsIndex()
+    index.add(SONGS)
+
+    assert index.search('nightmare')[0]['title'] == 'Nightmare'
+    assert [result['title'] for result in index.search('"the countess"')] == ['Countess Bathory']
+    assert index.search('"countess the"') == []
+    assert index.search('berzelis')[0]['artist'] == 'Žalvarinis'
+
+
+def test_search_empty_index(tmpdir):
+    assert LyricsIndex().search('nightmare') == []
+
+    index = LyricsIndex(str(tmpdir))
+    assert index.search('"the countess"') == []
+    index.close()
+
+
+def test_incremental_adds_to_memory_mapped_segments(tmpdir):
+    index = LyricsIndex(str(tmpdir))
+    index.add(SONGS[:2])
+    index.commit()
+    index.add(SONGS[2:])
+    index.commit()
+    index.close()
+
+    index = LyricsIndex(str(tmpdir))
+    index.add([dict(SONGS[0], title='Countess Bathory (Live)', album='Live')])
+
+    assert len(index) == 4 and len(index.segments) == 2
+    assert {result['album'] for result in index.search('"bathes in blood"')} == {'Black Metal', 'Live'}
+    assert index.search('"fools scream out destiny"')[0]['track_no'] == 5
+    index.close()
+
+
+def test_merge_compacts_segments(tmpdir):
+    index = LyricsIndex(str(tmpdir))
+    for song in SONGS:
+        index.add([song])
+        index.commit()
+    index.add([dict(SONGS[0], title='Countess Bathory (Live)', album='Live')])
+    results = index.search('"bathes in blood" nightmare berzelis')
+    index.merge()
+
+    assert len(index.segments) == 1 and tmpdir.listdir() == [tmpdir.join('segment-000001-000004.idx')]
+    assert index.search('"bathes in blood" nightmare berzelis') == results
+    assert index.search('nightmare')[0]['title'] == 'Nightmare'
+    index.close()
+
+    # Segments left over by an interrupted merge are removed when the index is opened
+    tmpdir.join('segment-000002.idx').write_binary(b'')
+    index = LyricsIndex(str(tmpdir))
+    index.add(SONGS[2:])
+    index.commit()
+
+    assert len(index) == 5 and len(tmpdir.listdir()) == 2
+    assert tmpdir.join('segment-000005.idx').check()
+    index.close()
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+from types import SimpleNamespace
+
+from metalparser.common.ratecontrol import AdaptiveRateController
+from metalparser.common.scraping import ScrapingAgent
+from metalparser.common.singleflight import SingleFlight
+
+
+class SlowSession:
+    def __init__(self):
+        self.requested_urls = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requested_urls.append(url)
+        time.sleep(0.1)
+        return SimpleNamespace(status_code=200, content=b'<html><title>' + url.encode() + b'</title></html>', headers={})
+
+
+def run_concurrently(function, args_list):
+    results = [None] * len(args_list)
+
+    def run(index):
+        results[index] = function(*args_list[index])
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(len(args_list))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+def test_concurrent_fetches_are_coalesced():
+    session = SlowSession()
+    agent = ScrapingAgent(use_cache=False)
+    agent.session = session
+    agent.rate_controller = AdaptiveRateController(initial_rate=60000, max_rate=60000)
+
+    urls = ['http://www.darklyrics.com/a.html'] * 4 + ['http://www.darklyrics.com/b.html'] * 2
+    pages = run_concurrently(agent.get_page_from_url, [(url,) for url in urls])
+
+    assert sorted(session.requested_urls) == ['http://www.darklyrics.com/a.html', 'http://www.darklyrics.com/b.html']
+    assert pages[0] is pages[3] and pages[0].title.string == 'http://www.darklyrics.com/a.html'
+    assert agent.get_metrics()['coalescing']['coalesced_calls'] == 4
+
+
+def test_errors_are_shared_and_not_stored():
+    single_flight = SingleFlight()
+    calls = []
+
+    def fail():
+        calls.append(1)
+        time.sleep(0.1)
+        raise KeyError('boom')
+
+    def call():
+        try:
+            single_flight.do('key', fail)
+        except KeyError as e:
+            return e
+
+    errors = run_concurrently(call, [()] * 3)
+    assert len(calls) == 1 and all(isinstance(error, KeyError) for error in errors)
+
+    with pytest.raises(KeyError):
+        single_flight.do('key', fail)
+    assert len(calls) == 2
+    assert single_flight.get_stats() == {'calls': 4, 'executions': 2, 'coalesced_calls': 2}
@@ -0,0 +1,31 @@
+from metalparser.libs.snapshot import LyricsSnapshot, write_snapshot
+
+
+SONGS = [
+    {'artist': 'Venom', 'album': 'Black Metal', 'album_type': 'album', 'release_year': '1982',
+     'title': 'Countess Bathory', 'track_no': 6, 'lyrics': 'The countess bathes in blood'},
+    {'artist': 'Venom', 'album': 'Black Metal', 'album_type': 'album', 'release_year': '1982',
+     'title': 'Black Metal', 'track_no': 1, 'lyrics': 'Lay down your soul to the gods rock n roll'},
+    {'artist': 'Kamelot', 'album': 'Haven', 'album_type': 'album', 'release_year': '2015',
+     'title': 'Under Grey Skies', 'track_no': 5, 'lyrics': 'In the age of confusion'},
+    {'artist': 'Žalvarinis', 'album': 'Žalvarinis', 'album_type': 'album', 'release_year': '2012',
+     'title': 'Stovi Stovi Berželis', 'track_no': 1, 'lyrics': 'Ir atjojo bernelis prie berželio'}
+]
+
+
+def test_snapshot_lookups(tmpdir):
+    path = str(tmpdir.join('lyrics.snapshot'))
+    assert write_snapshot(SONGS, path) == 4
+
+    snapshot = LyricsSnapshot(path)
+
+    assert snapshot.get_artists_list() == ['Kamelot', 'Venom', 'Žalvarinis']
+    assert snapshot.get_albums_info('venom') == [{'title': 'Black Metal', 'type': 'album', 'release_year': '1982'}]
+    assert [song['track_no'] for song in snapshot.get_album_info_and_lyrics('black metal', 'Venom')] == [1, 6]
+    assert snapshot.get_song_info_and_lyrics('under grey skies', 'kamelot') == SONGS[2]
+    assert snapshot.get_song_info_and_lyrics('stovi stovi berželis', 'žalvarinis', lyrics_only=True) == SONGS[3]['lyrics']
+    assert snapshot.get_song_by_track('Venom', 'Black Metal', 6)['title'] == 'Countess Bathory'
+    assert snapshot.get_song_by_track('Venom', 'Black Metal', 2) is None
+    assert snapshot.get_song_info_and_lyrics('under grey skies', 'venom') is None
+    assert snapshot.get_albums_info('dismember') == [] and len(snapshot) == 4
+    snapshot.close()
@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+
+HEAVY_MODULES = ['bs4', 'requests', 'requests_cache', 'sqlite3']
+
+STARTUP_SCRIPT = """
+import json, sys
+
+from metalparser.darklyrics import DarkLyricsApi
+api = DarkLyricsApi()
+
+print(json.dumps({
+    'loaded_modules': [module for module in HEAVY_MODULES if module in sys.modules],
+    'has_cached_session': api.helper.scraping_agent.cached_session is not None
+}))
+"""
+
+
+def run_startup_script():
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    script = 'HEAVY_MODULES = {!r}\n'.format(HEAVY_MODULES) + STARTUP_SCRIPT
+    output = subprocess.check_output([sys.executable, '-c', script], env=env)
+
+    return json.loads(output.decode())
+
+
+def test_import_does_not_load_heavy_modules():
+    result = run_startup_script()
+
+    assert result['loaded_modules'] == []
+    assert result['has_cached_session'] is False
+